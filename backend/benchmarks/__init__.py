@@ -0,0 +1,2 @@
+# backend/benchmarks/__init__.py
+# Benchmarks dos endpoints contra o backend em memória (ver run.py).
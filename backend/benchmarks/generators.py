@@ -0,0 +1,215 @@
+# backend/benchmarks/generators.py
+"""
+Geradores de dados sintéticos para os benchmarks.
+
+Os payloads têm o formato que o front envia; seed() passa cada um pelo
+mesmo normalizador da rota/modelo antes de gravar, então os documentos
+semeados têm o formato real do Firestore. Tudo é determinístico (seed fixo).
+"""
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from src.models.action import _normalize_for_storage as _normalize_action
+from src.routes.finance import _normalize_payload as _normalize_transaction
+from src.routes.fleet import _fuel_fields
+
+FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Felipe", "Gabriela", "Hugo",
+               "Isabela", "João", "Karina", "Lucas", "Marina", "Nicolas", "Olívia", "Paulo"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Costa", "Rodrigues", "Almeida"]
+COMPANIES = ["Supermercado Bom Preço", "Farmácia Vida", "Auto Peças Cuiabá", "Loja Estrela",
+             "Construtora Pantanal", "Clínica Sorriso", "Academia Forma", "Pizzaria Napoli"]
+ACTION_TYPES = ["PAP", "Sinaleiros/Pedestres", "Eventos Estratégicos", "Ações Promocionais",
+                "Panfletagem Residencial", "Carro de Som"]
+PERIODS = ["manhã", "tarde", "noite"]
+STATUSES = ["aguardando", "andamento", "concluido"]
+FIN_CATEGORIES = ["Combustível", "Material gráfico", "Salários", "Aluguel", "Serviços", "Impostos"]
+FIN_STATUSES = ["Pago", "Pendente", "Cancelado"]
+FIN_TYPES = ["entrada", "saida", "despesa"]
+FUELS = ["Gasolina", "gasolina", "Etanol", "Diesel", "DIESEL S10"]
+POSTOS = ["Posto Shell Centro", "Posto Ipiranga CPA", "Auto Posto Coxipó", "Posto BR Av. do CPA"]
+MODELS = ["Uno", "Strada", "Saveiro", "Gol", "Hilux", "Fiorino"]
+
+START = date(2023, 1, 1)
+DAYS = 3 * 365
+
+
+def _person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _day(rng):
+    return START + timedelta(days=rng.randrange(DAYS))
+
+
+def _ts(d):
+    return datetime(d.year, d.month, d.day, 12, tzinfo=timezone.utc)
+
+
+def sizes_for(n: int) -> dict:
+    """Quantidade de documentos por coleção para um tamanho nominal n."""
+    return {
+        "actions": n,
+        "finance_transactions": n,
+        "fleet_fuel_logs": n,
+        "commercial_orders": max(1, n // 2),
+        "users": max(10, n // 100),
+        "fleet_vehicles": max(5, min(500, n // 200)),
+        "clients": max(10, n // 20),
+    }
+
+
+# ---------------------------
+# Payloads (formato do front)
+# ---------------------------
+def action_payload(rng, supervisors):
+    d = _day(rng)
+    span = rng.choice([0, 0, 0, 1, 2, 6])
+    hour = rng.randrange(7, 18)
+    return {
+        "client_name": _person(rng),
+        "company_name": rng.choice(COMPANIES),
+        "types": rng.sample(ACTION_TYPES, rng.randint(1, 2)),
+        "day_periods": rng.sample(PERIODS, rng.randint(1, 2)),
+        "start_date": d.isoformat(),
+        "end_date": (d + timedelta(days=span)).isoformat(),
+        "start_datetime": f"{d.isoformat()}T{hour:02d}:00:00",
+        "end_datetime": f"{(d + timedelta(days=span)).isoformat()}T{hour + 3:02d}:00:00",
+        "material_qty": rng.choice([0, 500, 1000, 2500, 5000]),
+        "notes": rng.choice(["", "Levar coletes", "Confirmar horário com o cliente"]),
+        "status": rng.choice(STATUSES),
+        "supervisor": rng.choice(supervisors),
+        "team_members": [_person(rng) for _ in range(rng.randint(1, 5))],
+    }
+
+
+def transaction_payload(rng):
+    return {
+        "type": rng.choice(FIN_TYPES),
+        "date": _day(rng).strftime("%d/%m/%Y"),
+        "amount": f"{rng.uniform(10, 20000):.2f}".replace(".", ","),
+        "category": rng.choice(FIN_CATEGORIES),
+        "status": rng.choice(FIN_STATUSES),
+        "notes": rng.choice(["", "NF anexada", "Parcelado"]),
+        "client_text": rng.choice(["PIX", "Boleto", "Cartão", "Dinheiro"]),
+    }
+
+
+def vehicle_payload(rng, i):
+    return {
+        "placa": f"{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}C{i % 10}D{i % 100:02d}",
+        "modelo": rng.choice(MODELS),
+        "marca": "",
+        "ano": str(rng.randint(2012, 2024)),
+        "ativo": True,
+    }
+
+
+def fuel_payload(rng, vehicle):
+    litros = round(rng.uniform(20, 80), 2)
+    preco = round(rng.uniform(4.8, 7.2), 2)
+    return {
+        "placa": vehicle["placa"],
+        "carro": vehicle["modelo"],
+        "motorista": _person(rng),
+        "data": _day(rng).isoformat(),
+        "litros": litros,
+        "preco_litro": preco,
+        "valor_total": round(litros * preco, 2),
+        "odometro": rng.randint(10_000, 250_000),
+        "posto": rng.choice(POSTOS),
+        "combustivel": rng.choice(FUELS),
+    }
+
+
+def order_payload(rng):
+    items = [
+        {"descricao": rng.choice(ACTION_TYPES), "quantidade": rng.randint(1, 20),
+         "valor_unit": round(rng.uniform(50, 900), 2)}
+        for _ in range(rng.randint(1, 4))
+    ]
+    return {
+        "cliente": rng.choice(COMPANIES),
+        "titulo": "Ordem de Serviço",
+        "descricao": "",
+        "status": rng.choice(["Aberta", "Em andamento", "Fechada"]),
+        "data": _day(rng).isoformat(),
+        "itens": items,
+        "valor_total": round(sum(i["quantidade"] * i["valor_unit"] for i in items), 2),
+    }
+
+
+def client_payload(rng):
+    return {
+        "name": _person(rng),
+        "company": rng.choice(COMPANIES),
+        "segment": rng.choice(["Varejo", "Saúde", "Serviços", "Indústria"]),
+        "phone": f"65 9{rng.randrange(10**7, 10**8)}",
+        "email": f"contato{rng.randrange(10**6)}@example.com",
+    }
+
+
+# ---------------------------
+# Seed
+# ---------------------------
+def _stamped(doc, d):
+    doc = dict(doc)
+    doc.setdefault("created_at", _ts(d))
+    doc.setdefault("updated_at", _ts(d))
+    return doc
+
+
+def seed(db, n: int, password_hash: str, seed_value: int = 42) -> dict:
+    """
+    Semeia o banco (MemoryDB) para o tamanho n. Retorna um contexto com
+    ids/valores usados pelos cenários (placas, ids de exemplo etc.).
+    """
+    rng = random.Random(seed_value)
+    counts = sizes_for(n)
+
+    users = []
+    for i in range(counts["users"]):
+        users.append({
+            "username": f"user{i:05d}",
+            "password_hash": password_hash,
+            "role": "supervisor" if i % 10 else "admin",
+            "name": _person(rng),
+            "active": True,
+            "created_at": _ts(START),
+        })
+    user_ids = db.load("users", users)
+    supervisors = [u["name"] for u in users if u["role"] == "supervisor"] or ["Supervisor"]
+
+    vehicles = [vehicle_payload(rng, i) for i in range(counts["fleet_vehicles"])]
+    db.load("fleet_vehicles", [_stamped(v, START) for v in vehicles])
+
+    action_ids = db.load("actions", [
+        _stamped(_normalize_action(action_payload(rng, supervisors)), _day(rng))
+        for _ in range(counts["actions"])
+    ])
+    tx_ids = db.load("finance_transactions", [
+        _stamped(_normalize_transaction(transaction_payload(rng)), _day(rng))
+        for _ in range(counts["finance_transactions"])
+    ])
+    fuel_ids = db.load("fleet_fuel_logs", [
+        _stamped(_fuel_fields(fuel_payload(rng, rng.choice(vehicles))), _day(rng))
+        for _ in range(counts["fleet_fuel_logs"])
+    ])
+    order_ids = db.load("commercial_orders", [
+        _stamped(order_payload(rng), _day(rng)) for _ in range(counts["commercial_orders"])
+    ])
+    client_ids = db.load("clients", [
+        _stamped(client_payload(rng), _day(rng)) for _ in range(counts["clients"])
+    ])
+
+    return {
+        "counts": counts,
+        "rng": rng,
+        "supervisors": supervisors,
+        "user_ids": user_ids,
+        "placas": [v["placa"] for v in vehicles],
+        "action_ids": action_ids,
+        "transaction_ids": tx_ids,
+        "fuel_ids": fuel_ids,
+        "order_ids": order_ids,
+        "client_ids": client_ids,
+    }
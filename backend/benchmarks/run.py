@@ -0,0 +1,313 @@
+# backend/benchmarks/run.py
+"""
+Benchmark dos endpoints de listagem, filtro e escrita.
+
+Roda o app Flask real (test client) contra o backend em memória
+(FIRESTORE_BACKEND=memory), semeado por generators.seed() em cada tamanho,
+e reporta por endpoint: p50/p95/p99 (ms), leituras/escritas/chamadas ao
+Firestore por requisição (header X-Firestore-Ops) e o pico de RSS.
+
+    cd backend
+    python -m benchmarks.run                          # 1k e 10k
+    python -m benchmarks.run --sizes 1000,10000,100000
+    python -m benchmarks.run --only fuel --repeat 50
+    python -m benchmarks.run --compare benchmarks/baseline.json
+    python -m benchmarks.run --update-baseline        # regrava baseline.json
+
+As contagens de operações são exatas e comparáveis entre máquinas; as
+latências só são comparáveis na mesma máquina. MEMORY_DB_LATENCY_MS
+simula o round trip do Firestore.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+from collections import namedtuple
+from datetime import datetime, timezone
+
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+os.environ.setdefault("FIRESTORE_WARMUP", "false")
+
+import bcrypt  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from src.main import app  # noqa: E402
+from src.services import firestore_metrics  # noqa: E402
+from src.services.doc_cache import doc_cache  # noqa: E402
+from src.services.memory_db import memory_db  # noqa: E402
+from src.services.user_service import invalidate_auth_user, ensure_username_index  # noqa: E402
+from src.models.action import Action  # noqa: E402
+from src.services import action_metrics, fleet_stats  # noqa: E402
+from src.routes.fleet import ensure_fuel_keys  # noqa: E402
+from benchmarks import generators as gen  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+DEFAULT_SIZES = (1000, 10000)
+ADMIN_ID = "bench-admin"
+ADMIN_PASSWORD = "admin"
+
+# path/body: valor fixo ou função(ctx) -> valor
+# collect: chave de ctx onde o "id" da resposta é guardado (usado pelos DELETE)
+Scenario = namedtuple("Scenario", ["name", "method", "path", "body", "repeat", "collect"])
+
+
+def scenario(name, method, path, body=None, repeat=None, collect=None):
+    return Scenario(name, method, path, body, repeat, collect)
+
+
+def _pick(key):
+    return lambda ctx: ctx["rng"].choice(ctx[key])
+
+
+def _pop(key):
+    return lambda ctx: ctx[key].pop() if ctx[key] else "missing"
+
+
+def _fuel_period(ctx):
+    placa = ctx["rng"].choice(ctx["placas"])
+    return f"/api/fleet/fuel-logs?placa={placa}&de=2024-01-01&ate=2024-06-30"
+
+
+SCENARIOS = [
+    # --- leituras ---
+    scenario("actions.list", "GET", "/api/actions"),
+    scenario("actions.page", "GET", "/api/actions?limit=50"),
+    scenario("actions.window_month", "GET", "/api/actions?from=2024-03-01&to=2024-03-31"),
+    scenario("actions.get", "GET", lambda c: f"/api/actions/{_pick('action_ids')(c)}"),
+    scenario("transactions.list", "GET", "/api/transactions"),
+    scenario("transactions.page", "GET", "/api/transactions?limit=50"),
+    scenario("transactions.filter_page", "GET", "/api/transactions?status=Pago&from=2024-03-01&to=2024-05-31&limit=50"),
+    scenario("finance.summary_month", "GET", "/api/finance/summary?from=2024-01-01&to=2024-12-31&group_by=month"),
+    scenario("fuel.list", "GET", "/api/fleet/fuel-logs"),
+    scenario("fuel.page", "GET", "/api/fleet/fuel-logs?limit=50"),
+    scenario("fuel.filter_placa_period", "GET", _fuel_period),
+    scenario("fuel.filter_text", "GET", "/api/fleet/fuel-logs?motorista=ana&combustivel=gasolina"),
+    scenario("fuel.analytics", "GET", "/api/fleet/analytics"),
+    scenario("fuel.analytics_placa", "GET", lambda c: f"/api/fleet/analytics?placa={_pick('placas')(c)}&de=2024-01-01"),
+    scenario("vehicles.list", "GET", "/api/fleet/vehicles"),
+    scenario("vehicles.list_with_stats", "GET", "/api/fleet/vehicles?with_stats=1"),
+    scenario("orders.list", "GET", "/api/commercial/orders"),
+    scenario("orders.page", "GET", "/api/commercial/orders?limit=50"),
+    scenario("clients.page", "GET", "/api/clients?limit=50"),
+    scenario("users.list", "GET", "/api/users"),
+    scenario("auth.me", "GET", "/api/auth/me"),
+    scenario("metrics.services_distribution", "GET", "/api/metrics/services/distribution"),
+    scenario("metrics.monthly_campaigns", "GET", "/api/metrics/monthly-campaigns?months=12"),
+    # --- escritas ---
+    scenario("actions.create", "POST", "/api/actions",
+             body=lambda c: gen.action_payload(c["rng"], c["supervisors"]), collect="new_actions"),
+    scenario("actions.update", "PUT", lambda c: f"/api/actions/{_pick('action_ids')(c)}",
+             body=lambda c: gen.action_payload(c["rng"], c["supervisors"])),
+    scenario("actions.delete", "DELETE", lambda c: f"/api/actions/{_pop('new_actions')(c)}"),
+    scenario("transactions.create", "POST", "/api/transactions",
+             body=lambda c: gen.transaction_payload(c["rng"]), collect="new_transactions"),
+    scenario("transactions.update", "PUT", lambda c: f"/api/transactions/{_pick('transaction_ids')(c)}",
+             body=lambda c: gen.transaction_payload(c["rng"])),
+    scenario("transactions.delete", "DELETE", lambda c: f"/api/transactions/{_pop('new_transactions')(c)}"),
+    scenario("transactions.bulk_create_100", "POST", "/api/transactions/bulk",
+             body=lambda c: {"create": [gen.transaction_payload(c["rng"]) for _ in range(100)]}),
+    scenario("fuel.create", "POST", "/api/fleet/fuel-logs",
+             body=lambda c: gen.fuel_payload(c["rng"], {"placa": _pick("placas")(c), "modelo": ""})),
+    scenario("fuel.update", "PUT", lambda c: f"/api/fleet/fuel-logs/{_pick('fuel_ids')(c)}",
+             body=lambda c: {"litros": 40, "preco_litro": 6.19}),
+    scenario("orders.create", "POST", "/api/commercial/orders", body=lambda c: gen.order_payload(c["rng"])),
+    scenario("auth.login", "POST", "/api/auth/login",
+             body={"username": "admin", "password": ADMIN_PASSWORD}, repeat=5),
+]
+
+
+# ---------------------------
+# Medição
+# ---------------------------
+def _value(v, ctx):
+    return v(ctx) if callable(v) else v
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def _parse_ops(header):
+    out = {"reads": 0, "writes": 0, "calls": 0}
+    for part in (header or "").split(","):
+        key, _, val = part.strip().partition("=")
+        if key in out:
+            out[key] = int(val)
+    return out
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KiB; macOS: bytes
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def run_scenario(client, sc, ctx, headers, repeat, max_seconds):
+    """
+    Uma requisição de aquecimento (não medida) e depois até `repeat`.
+    Operações por requisição são a mediana, para um miss de cache isolado
+    não mexer no número.
+    """
+    def call():
+        path = _value(sc.path, ctx)
+        body = _value(sc.body, ctx)
+        start = time.perf_counter()
+        resp = client.open(path, method=sc.method, json=body, headers=headers)
+        ms = (time.perf_counter() - start) * 1000.0
+        if sc.collect and resp.status_code < 300:
+            ctx.setdefault(sc.collect, []).append((resp.get_json() or {}).get("id"))
+        return resp, ms
+
+    call()
+    n = sc.repeat or repeat
+    samples, ops, statuses = [], {"reads": [], "writes": [], "calls": []}, {}
+    deadline = time.perf_counter() + max_seconds
+    for i in range(n):
+        resp, ms = call()
+        samples.append(ms)
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        for k, v in _parse_ops(resp.headers.get("X-Firestore-Ops")).items():
+            ops[k].append(v)
+        if i >= 2 and time.perf_counter() > deadline:
+            break
+    samples.sort()
+    out = {
+        "n": len(samples),
+        "p50_ms": round(_percentile(samples, 0.50), 2),
+        "p95_ms": round(_percentile(samples, 0.95), 2),
+        "p99_ms": round(_percentile(samples, 0.99), 2),
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+    }
+    for k, values in ops.items():
+        out[k] = _percentile(sorted(values), 0.50)
+    return out
+
+
+def run_size(n, args, password_hash):
+    memory_db.reset()
+    doc_cache.clear()
+    invalidate_auth_user()
+    firestore_metrics.reset()
+
+    start = time.perf_counter()
+    ctx = gen.seed(memory_db, n, password_hash)
+    memory_db.load("users", [{
+        "id": ADMIN_ID, "username": "admin", "password_hash": password_hash,
+        "role": "admin", "name": "Administrador", "active": True,
+    }])
+    ensure_username_index()
+    Action.ensure_date_index()
+    action_metrics.ensure_built()
+    fleet_stats.ensure_built()
+    ensure_fuel_keys()
+    seed_s = time.perf_counter() - start
+
+    with app.app_context():
+        token = create_access_token(
+            identity=ADMIN_ID, additional_claims={"role": "admin", "username": "admin", "active": True})
+    headers = {"Authorization": f"Bearer {token}"}
+    client = app.test_client()
+
+    endpoints = {}
+    for sc in SCENARIOS:
+        if args.only and not any(o in sc.name for o in args.only):
+            continue
+        res = run_scenario(client, sc, ctx, headers, args.repeat, args.max_seconds)
+        endpoints[sc.name] = res
+        print(f"  {sc.name:<34} p50={res['p50_ms']:>9.2f}  p95={res['p95_ms']:>9.2f}  "
+              f"p99={res['p99_ms']:>9.2f}  reads={res['reads']:>9}  writes={res['writes']:>6}  n={res['n']}",
+              flush=True)
+
+    return {
+        "counts": ctx["counts"],
+        "seed_s": round(seed_s, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "endpoints": endpoints,
+    }
+
+
+# ---------------------------
+# Comparação com baseline
+# ---------------------------
+def compare(results, baseline, threshold):
+    """Lista de regressões: leituras/escritas a mais, ou p50/p95 acima do limiar."""
+    regressions = []
+    for size, res in results["sizes"].items():
+        base = baseline.get("sizes", {}).get(size)
+        if not base:
+            continue
+        for name, cur in res["endpoints"].items():
+            old = base["endpoints"].get(name)
+            if not old:
+                continue
+            for key in ("reads", "writes"):
+                if cur[key] > old[key]:
+                    regressions.append(f"{size} {name}: {key} {old[key]} -> {cur[key]}")
+            for key in ("p50_ms", "p95_ms"):
+                # ruído de sub-milissegundo não conta
+                if cur[key] > old[key] * (1 + threshold) and cur[key] - old[key] > 1.0:
+                    regressions.append(f"{size} {name}: {key} {old[key]} -> {cur[key]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="tamanhos separados por vírgula (ex.: 1000,10000,100000)")
+    parser.add_argument("--repeat", type=int, default=20, help="requisições por cenário")
+    parser.add_argument("--max-seconds", type=float, default=20.0,
+                        help="tempo máximo por cenário (mínimo de 3 requisições)")
+    parser.add_argument("--only", type=lambda s: [x for x in s.split(",") if x],
+                        help="só cenários cujo nome contém algum destes termos")
+    parser.add_argument("--out", help="grava o resultado em JSON")
+    parser.add_argument("--compare", help="compara com um JSON de baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="aumento relativo de latência tolerado na comparação")
+    parser.add_argument("--update-baseline", action="store_true", help=f"regrava {BASELINE_PATH}")
+    args = parser.parse_args(argv)
+
+    password_hash = bcrypt.hashpw(ADMIN_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    results = {
+        "meta": {
+            "date": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+            "python": platform.python_version(),
+            "platform": platform.platform(terse=True),
+            "repeat": args.repeat,
+            "memory_db_latency_ms": memory_db.latency_ms,
+        },
+        "sizes": {},
+    }
+    for n in sorted(int(s) for s in args.sizes.split(",") if s):
+        print(f"== {n} documentos", flush=True)
+        results["sizes"][str(n)] = run_size(n, args, password_hash)
+        print(f"  peak RSS: {results['sizes'][str(n)]['peak_rss_mb']} MB", flush=True)
+
+    targets = [args.out] if args.out else []
+    if args.update_baseline:
+        targets.append(BASELINE_PATH)
+    for path in targets:
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, ensure_ascii=False, sort_keys=True)
+            fh.write("\n")
+        print(f"resultado gravado em {path}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.threshold)
+        for r in regressions:
+            print(f"REGRESSÃO {r}")
+        if regressions:
+            return 1
+        print("sem regressões em relação ao baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+# backend/src/__main__.py
+"""Servidor de desenvolvimento: python -m src (em produção: gunicorn src.main:app)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import app  # noqa: E402
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)), debug=False)
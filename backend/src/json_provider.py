@@ -0,0 +1,86 @@
+# backend/src/json_provider.py
+"""
+Provider JSON do app (jsonify / request.get_json) sobre orjson.
+
+Datas saem em ISO 8601 direto na serialização, em todos os blueprints:
+- datetime / date (inclusive DatetimeWithNanoseconds do Firestore, com os
+  nanossegundos quando houver)
+- SERVER_TIMESTAMP ainda não resolvido (doc montado localmente antes de ir
+  ao banco): vira o horário UTC atual, aproximação do que o servidor grava
+- DELETE_FIELD e outras sentinelas: null
+Decimal/UUID viram string, dataclasses viram dict (como no provider padrão).
+
+Sem orjson instalado, usa o json da stdlib com as mesmas regras.
+"""
+import json
+import uuid
+import decimal
+import dataclasses
+from datetime import date, datetime, timezone
+
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson está no requirements.txt
+    orjson = None
+
+try:
+    from google.cloud.firestore_v1 import transforms as _transforms
+except Exception:  # pragma: no cover - vem com firebase-admin
+    _transforms = None
+
+
+def default(o):
+    """Tipos que o serializador não conhece (orjson já trata datetime/date/UUID exatos)."""
+    if isinstance(o, (datetime, date)):
+        # subclasses (DatetimeWithNanoseconds) têm isoformat próprio
+        return o.isoformat()
+    if _transforms is not None and isinstance(o, _transforms.Sentinel):
+        if o is _transforms.SERVER_TIMESTAMP:
+            return datetime.now(timezone.utc).isoformat()
+        return None
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _options(sort_keys, indent):
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return option
+
+
+class FastJSONProvider(JSONProvider):
+    """Instalado em main.create_app: app.json = FastJSONProvider(app)."""
+    sort_keys = False
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop("sort_keys", self.sort_keys)
+        if orjson is None:
+            kwargs.setdefault("ensure_ascii", False)
+            return json.dumps(obj, default=default, sort_keys=sort_keys, **kwargs)
+        return orjson.dumps(obj, default=default, option=_options(sort_keys, kwargs.get("indent"))).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if self._app.debug else None
+        if orjson is None:
+            body = self.dumps(obj, indent=indent, separators=None if indent else (",", ":"))
+        else:
+            # bytes direto, sem passar por str
+            body = orjson.dumps(obj, default=default, option=_options(self.sort_keys, indent))
+        return self._app.response_class(body, mimetype=self.mimetype)
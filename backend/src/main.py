@@ -2,6 +2,7 @@
 import os
 import sys
 import logging
+from datetime import timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -28,9 +29,15 @@ def create_app():
     # -----------------------
     app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", "asdf#FGSgvasgf$5$WGT")
     app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "jwt-secret-string-change-in-production")
-    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = False  # token sem expirar
+    # Access token curto (role/active nos claims, autorização sem leitura no banco)
+    # + refresh token para renovar em /api/auth/refresh
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(minutes=int(os.environ.get("JWT_ACCESS_MINUTES", 15)))
+    app.config["JWT_REFRESH_TOKEN_EXPIRES"] = timedelta(days=int(os.environ.get("JWT_REFRESH_DAYS", 7)))
     app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_CONTENT_LENGTH", 25 * 1024 * 1024))
     app.config["JSON_SORT_KEYS"] = False
+    # orjson + datas/Timestamps do Firestore em ISO (sem sanitizar doc a doc nas rotas)
+    from src.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
     app.config["PROPAGATE_EXCEPTIONS"] = True
 
     # Logging
@@ -53,10 +60,20 @@ def create_app():
         supports_credentials=False,
         methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         allow_headers=["Content-Type", "Authorization"],
-        expose_headers=["Content-Type", "Authorization"],
+        expose_headers=["Content-Type", "Authorization", "X-Next-Cursor", "X-Total-Count", "X-Firestore-Ops", "Server-Timing"],
         max_age=86400,
     )
-    JWTManager(app)
+    jwt = JWTManager(app)
+
+    from src.services import token_revocation
+    token_revocation.configure(app.config["JWT_REFRESH_TOKEN_EXPIRES"].total_seconds())
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return token_revocation.is_revoked(jwt_payload)
+
+    from src.services import firestore_metrics
+    firestore_metrics.init_app(app)
 
     # -----------------------
     # Imports tardios
@@ -71,6 +88,8 @@ def create_app():
     from src.routes.user import user_bp
     from src.routes.finance import finance_bp
     from src.services.user_service import ensure_admin_seed
+    from src.services.firestore_service import InvalidCursor
+    from src.services.password_hasher import PasswordHasherBusy, start as password_hasher_start
 
     # >>> ADIÇÕES: novos módulos (Frota e Comercial)
     from src.routes.fleet import fleet_bp
@@ -133,12 +152,37 @@ def create_app():
     def handle_file_too_large(e):
         return jsonify(error="file_too_large", max_bytes=app.config["MAX_CONTENT_LENGTH"]), 413
 
+    @app.errorhandler(InvalidCursor)
+    def handle_invalid_cursor(e):
+        return jsonify(error="invalid_cursor", cursor=str(e)), 400
+
+    @app.errorhandler(PasswordHasherBusy)
+    def handle_password_hasher_busy(e):
+        return jsonify(error="busy", detail=str(e)), 503, {"Retry-After": "1"}
+
     @app.errorhandler(500)
     def handle_500(e):
         return jsonify(error="internal_server_error"), 500
 
     # -----------------------
-    # Seed do admin (se não existir)
+    # Pool do bcrypt: sobe os processos antes de existir qualquer thread do gRPC
+    # -----------------------
+    try:
+        password_hasher_start()
+    except Exception as pe:
+        logging.getLogger(__name__).warning("pool do bcrypt não iniciou: %s", pe)
+
+    # -----------------------
+    # Firestore: cria o cliente do worker e aquece o canal gRPC em background
+    # -----------------------
+    if os.getenv("FIRESTORE_WARMUP", "true").lower() in ("1", "true", "yes"):
+        from src.services.firestore_service import warm_up_async
+        warm_up_async()
+
+    # -----------------------
+    # Seed do admin (se não existir). Backfills de índices/contadores rodam
+    # pela CLI (python -m src.migrations backfill); BOOT_BACKFILLS=true também
+    # roda no boot, sob o lock de cada backfill (um worker varre, os outros pulam).
     # -----------------------
     with app.app_context():
         try:
@@ -146,6 +190,14 @@ def create_app():
         except Exception as se:
             logging.getLogger(__name__).exception("ensure_admin_seed failed: %s", se)
 
+        if os.getenv("BOOT_BACKFILLS", "false").lower() in ("1", "true", "yes"):
+            from src.migrations import BACKFILLS, run_backfill
+            for name in BACKFILLS:
+                try:
+                    run_backfill(name)
+                except Exception as be:
+                    logging.getLogger(__name__).exception("backfill %s failed: %s", name, be)
+
     return app
 
 app = create_app()
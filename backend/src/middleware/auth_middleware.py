@@ -1,74 +1,103 @@
+import os
 from functools import wraps
 from flask import request, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
 
+# Modo "só claims" para leituras: em GET/HEAD com role no JWT, não consulta o
+# usuário (nem no cache). Desativar/rebaixar um usuário só vale para essas
+# rotas quando o token dele deixar de ser aceito.
+CLAIMS_ONLY_READS = os.getenv("AUTH_CLAIMS_ONLY_READS", "false").strip().lower() in ("1", "true", "yes")
+_SAFE_METHODS = ("GET", "HEAD")
+
 def _load_user(user_id):
     # Lazy import para evitar ciclos de importação
-    from src.services.user_service import get_user_by_id
-    return get_user_by_id(user_id)
+    # get_auth_user: cache por processo (TTL curto), invalidado em update/delete do usuário
+    from src.services.user_service import get_auth_user
+    return get_auth_user(user_id)
+
+def _use_claims_only(claims_only):
+    if claims_only is None:
+        return CLAIMS_ONLY_READS and request.method in _SAFE_METHODS
+    return claims_only
 
-def require_user(f=None):
+def _claims_user(user_id, claims):
+    return {
+        "id": user_id,
+        "role": claims.get("role"),
+        "username": claims.get("username"),
+        "active": bool(claims.get("active", True)),
+    }
+
+def _authenticate(claims_only=None):
+    """
+    Valida o JWT e preenche request.current_user.
+    Retorna (role, None) ou (None, resposta de erro).
+    """
+    verify_jwt_in_request()
+    claims = get_jwt()
+    role = claims.get('role')
+    user_id = get_jwt_identity()
+
+    # Tokens novos (curtos, com "active" nos claims e checados contra a lista
+    # de revogação em main.py) dispensam a leitura do usuário
+    if role and "active" in claims:
+        if not claims.get("active"):
+            return None, (jsonify({"message": "Usuário inativo"}), 403)
+        request.current_user = _claims_user(user_id, claims)
+        return role, None
+
+    # Tokens antigos (sem expiração): só confia no JWT em modo claims-only
+    if role and _use_claims_only(claims_only):
+        request.current_user = _claims_user(user_id, claims)
+        return role, None
+
+    # Mesmo com role no JWT, carrega o usuário para checar se ainda existe/está ativo
+    user = _load_user(user_id)
+    if not user:
+        return None, (jsonify({"message": "Usuário inválido"}), 401)
+    if not user.get('active', True):
+        return None, (jsonify({"message": "Usuário inativo"}), 403)
+    request.current_user = user
+    # Se não tiver role no JWT, usa a do banco
+    return role or user.get("role"), None
+
+def require_user(f=None, claims_only=None):
     """
     Pode usar como @require_user OU @require_user()
     """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            user = _load_user(user_id)
-            if not user:
-                return jsonify({"message": "Usuário inválido"}), 401
-            if not user.get('active', True):
-                return jsonify({"message": "Usuário inativo"}), 403
-            request.current_user = user
+            _, error = _authenticate(claims_only)
+            if error:
+                return error
             return fn(*args, **kwargs)
         return wrapper
     return decorator if f is None else decorator(f)
 
-def roles_allowed(*allowed_roles):
+def roles_allowed(*allowed_roles, claims_only=None):
     """
     Decorator flexível para controle de acesso baseado em roles.
     Uso: @roles_allowed('admin') ou @roles_allowed('admin', 'supervisor')
+    claims_only=True confia só no JWT (sem ler o usuário); o padrão (None)
+    segue AUTH_CLAIMS_ONLY_READS para GET/HEAD.
     """
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            
-            # Tentar obter role do JWT claims primeiro
-            claims = get_jwt()
-            role = claims.get('role')
-            
-            # Se não tiver no JWT, carregar do banco
-            if not role:
-                user_id = get_jwt_identity()
-                user = _load_user(user_id)
-                if not user:
-                    return jsonify({"message": "Usuário inválido"}), 401
-                if not user.get('active', True):
-                    return jsonify({"message": "Usuário inativo"}), 403
-                role = user.get("role")
-                request.current_user = user
-            else:
-                # Se tiver role no JWT, ainda precisamos carregar o usuário para outras verificações
-                user_id = get_jwt_identity()
-                user = _load_user(user_id)
-                if not user:
-                    return jsonify({"message": "Usuário inválido"}), 401
-                if not user.get('active', True):
-                    return jsonify({"message": "Usuário inativo"}), 403
-                request.current_user = user
-            
+            role, error = _authenticate(claims_only)
+            if error:
+                return error
+
             if role not in allowed_roles:
                 roles_str = ', '.join(allowed_roles)
                 return jsonify({"message": f"Acesso negado - Requer perfil: {roles_str}"}), 403
-            
+
             return fn(*args, **kwargs)
         return wrapper
     return decorator
 
-def require_admin(f=None):
+def require_admin(f=None, claims_only=None):
     """
     Pode usar como @require_admin OU @require_admin()
     Verifica role no JWT claims primeiro, fallback para DB
@@ -76,39 +105,17 @@ def require_admin(f=None):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            
-            # Tentar obter role do JWT claims primeiro
-            claims = get_jwt()
-            role = claims.get('role')
-            
-            # Se não tiver no JWT, carregar do banco
-            if not role:
-                user_id = get_jwt_identity()
-                user = _load_user(user_id)
-                if not user:
-                    return jsonify({"message": "Usuário inválido"}), 401
-                if not user.get('active', True):
-                    return jsonify({"message": "Usuário inativo"}), 403
-                role = user.get("role")
-                request.current_user = user
-            else:
-                # Se tiver role no JWT, ainda precisamos carregar o usuário para outras verificações
-                user_id = get_jwt_identity()
-                user = _load_user(user_id)
-                if not user:
-                    return jsonify({"message": "Usuário inválido"}), 401
-                if not user.get('active', True):
-                    return jsonify({"message": "Usuário inativo"}), 403
-                request.current_user = user
-            
+            role, error = _authenticate(claims_only)
+            if error:
+                return error
+
             if role != "admin":
                 return jsonify({"message": "Acesso negado - Apenas administradores"}), 403
             return fn(*args, **kwargs)
         return wrapper
     return decorator if f is None else decorator(f)
 
-def require_supervisor(f=None):
+def require_supervisor(f=None, claims_only=None):
     """
     Pode usar como @require_supervisor OU @require_supervisor()
     Verifica role no JWT claims primeiro, fallback para DB
@@ -116,32 +123,10 @@ def require_supervisor(f=None):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            
-            # Tentar obter role do JWT claims primeiro
-            claims = get_jwt()
-            role = claims.get('role')
-            
-            # Se não tiver no JWT, carregar do banco
-            if not role:
-                user_id = get_jwt_identity()
-                user = _load_user(user_id)
-                if not user:
-                    return jsonify({"message": "Usuário inválido"}), 401
-                if not user.get('active', True):
-                    return jsonify({"message": "Usuário inativo"}), 403
-                role = user.get("role")
-                request.current_user = user
-            else:
-                # Se tiver role no JWT, ainda precisamos carregar o usuário para outras verificações
-                user_id = get_jwt_identity()
-                user = _load_user(user_id)
-                if not user:
-                    return jsonify({"message": "Usuário inválido"}), 401
-                if not user.get('active', True):
-                    return jsonify({"message": "Usuário inativo"}), 403
-                request.current_user = user
-            
+            role, error = _authenticate(claims_only)
+            if error:
+                return error
+
             if role not in ("admin", "supervisor"):
                 return jsonify({"message": "Acesso negado - Supervisores ou administradores apenas"}), 403
             return fn(*args, **kwargs)
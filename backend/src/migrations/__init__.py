@@ -0,0 +1,229 @@
+# backend/src/migrations/__init__.py
+"""
+Migrações de dados (Firestore) versionadas e retomáveis.
+
+Cada migração percorre uma coleção em ordem de id, em lotes, e regrava
+os documentos que a função transform devolver. O progresso fica em
+_migrations/<nome>:
+  {"cursor": último id processado, "scanned", "migrated", "done",
+   "started_at", "updated_at", "finished_at"}
+Interrompida (deploy, erro, Ctrl+C), a próxima execução continua do
+cursor. As transformações devem ser idempotentes: um lote pode ser
+regravado se o processo cair entre o commit e o checkpoint.
+
+Uso:
+    cd backend
+    python -m src.migrations list
+    python -m src.migrations run actions_compact --batch 200 --pause 0.5
+    python -m src.migrations run actions_compact --dry-run
+    python -m src.migrations run actions_compact --restart
+
+--pause dá uma folga entre lotes para não disputar cota/latência com o
+tráfego do app.
+
+Backfills (índices e contadores derivados, recalculados a partir de uma
+coleção inteira) também rodam por aqui, e não no boot dos workers:
+    python -m src.migrations backfill                 # todos
+    python -m src.migrations backfill fleet_stats --force
+Cada um roda sob um lock com prazo em _migrations/backfill:<nome>: duas
+execuções ao mesmo tempo (dois deploys, BOOT_BACKFILLS em vários workers)
+não varrem a mesma coleção; a segunda pula.
+"""
+import os
+import time
+import socket
+import logging
+from collections import namedtuple
+
+from src.services.firestore_service import (
+    get_db,
+    get_document,
+    get_documents_page,
+    run_transaction,
+    tx_get,
+    invalidate_cache,
+    InvalidCursor,
+    _server_ts,
+)
+from src.services.firestore_service import BATCH_LIMIT
+from src.services.firestore_metrics import track, WRITE
+
+log = logging.getLogger(__name__)
+
+CHECKPOINTS = "_migrations"
+
+# transform(doc) -> dict para set merge, ou None se o doc já estiver migrado
+Migration = namedtuple("Migration", ["name", "collection", "description", "transform"])
+
+MIGRATIONS = {}
+
+# run(force) -> resultado (JSON); sem force, cada backfill pula o que já foi feito
+Backfill = namedtuple("Backfill", ["name", "description", "run"])
+
+BACKFILLS = {}
+# prazo do lock: um processo que morrer no meio libera o backfill depois disso
+BACKFILL_LEASE_S = 30 * 60
+
+
+def register(name: str, collection: str, description: str = ""):
+    """
+    @register("actions_compact", "actions", "...")
+    def transform(doc): ...
+    """
+    def decorator(fn):
+        MIGRATIONS[name] = Migration(name, collection, description, fn)
+        return fn
+    return decorator
+
+
+def checkpoint(name: str) -> dict:
+    """Estado salvo da migração ({} se nunca rodou)."""
+    return get_document(CHECKPOINTS, name) or {}
+
+
+def _save_checkpoint(db, name: str, data: dict):
+    with track(WRITE, CHECKPOINTS):
+        db.collection(CHECKPOINTS).document(name).set(data, merge=True)
+    invalidate_cache(CHECKPOINTS, name)
+
+
+def _commit(db, collection: str, patches):
+    """Um WriteBatch (patches <= BATCH_LIMIT). Não mexe em updated_at."""
+    batch = db.batch()
+    col = db.collection(collection)
+    for doc_id, data in patches:
+        batch.set(col.document(doc_id), data, merge=True)
+    with track(WRITE, collection, docs=len(patches)):
+        batch.commit()
+    invalidate_cache(collection)
+
+
+def run_migration(name: str, batch_size: int = 200, pause_s: float = 0.0,
+                  dry_run: bool = False, restart: bool = False, max_batches: int = None) -> dict:
+    """
+    Roda (ou continua) a migração. Retorna o checkpoint final.
+    dry_run: só conta o que seria regravado (não grava nada, nem checkpoint).
+    max_batches: para depois de N lotes (útil para migrar aos poucos).
+    """
+    migration = MIGRATIONS.get(name)
+    if migration is None:
+        raise KeyError(f"migração desconhecida: {name}")
+    batch_size = max(1, min(int(batch_size), BATCH_LIMIT))
+
+    db = get_db()
+    state = {} if restart or dry_run else checkpoint(name)
+    if state.get("done"):
+        log.info("%s: já concluída em %s", name, state.get("finished_at"))
+        return state
+
+    cursor = state.get("cursor")
+    scanned = int(state.get("scanned") or 0)
+    migrated = int(state.get("migrated") or 0)
+    if not dry_run and not state:
+        _save_checkpoint(db, name, {"started_at": _server_ts(), "done": False, "scanned": 0, "migrated": 0})
+
+    batches = 0
+    while True:
+        try:
+            docs, next_cursor = get_documents_page(migration.collection, batch_size, start_after=cursor)
+        except InvalidCursor:
+            # o doc do cursor foi apagado: recomeça (as transformações são idempotentes)
+            log.warning("%s: cursor %s não existe mais, recomeçando do início", name, cursor)
+            cursor, docs, next_cursor = None, *get_documents_page(migration.collection, batch_size)
+
+        patches = []
+        for doc in docs:
+            patch = migration.transform(dict(doc))
+            if patch:
+                patches.append((doc["id"], patch))
+        scanned += len(docs)
+        migrated += len(patches)
+        if docs:
+            cursor = docs[-1]["id"]
+
+        if not dry_run:
+            if patches:
+                _commit(db, migration.collection, patches)
+            progress = {"scanned": scanned, "migrated": migrated, "cursor": cursor, "updated_at": _server_ts()}
+            if next_cursor is None:
+                progress.update({"done": True, "finished_at": _server_ts()})
+            _save_checkpoint(db, name, progress)
+        log.info("%s: %d lidos, %d regravados%s", name, scanned, migrated, " (dry-run)" if dry_run else "")
+
+        batches += 1
+        if next_cursor is None:
+            break
+        if max_batches and batches >= max_batches:
+            break
+        if pause_s > 0:
+            time.sleep(pause_s)
+
+    return {"scanned": scanned, "migrated": migrated, "done": next_cursor is None, "cursor": cursor}
+
+
+# ---------------------------
+# Backfills
+# ---------------------------
+def register_backfill(name: str, description: str = ""):
+    """
+    @register_backfill("fleet_stats", "...")
+    def run(force): ...
+    """
+    def decorator(fn):
+        BACKFILLS[name] = Backfill(name, description, fn)
+        return fn
+    return decorator
+
+
+def _lock_ref(db, name):
+    return db.collection(CHECKPOINTS).document(f"backfill:{name}")
+
+
+def _acquire(name: str, owner: str) -> bool:
+    """Pega o lock do backfill se estiver livre ou vencido."""
+    def _take(tx, db):
+        ref = _lock_ref(db, name)
+        snap = tx_get(tx, ref, CHECKPOINTS)
+        cur = (snap.to_dict() or {}) if snap.exists else {}
+        if cur.get("owner") and float(cur.get("lock_until") or 0) > time.time():
+            return False
+        tx.set(ref, {"owner": owner, "lock_until": time.time() + BACKFILL_LEASE_S,
+                     "started_at": _server_ts()}, merge=True)
+        return True
+
+    with track(WRITE, CHECKPOINTS):
+        return run_transaction(_take)
+
+
+def run_backfill(name: str, force: bool = False) -> dict:
+    """
+    Roda um backfill sob o lock. Retorna {"name", "status": "done"|"skipped"|"failed", ...};
+    "skipped" quando outro processo está com o lock.
+    """
+    backfill = BACKFILLS.get(name)
+    if backfill is None:
+        raise KeyError(f"backfill desconhecido: {name}")
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    if not _acquire(name, owner):
+        log.info("%s: outro processo está rodando, pulando", name)
+        return {"name": name, "status": "skipped"}
+
+    db = get_db()
+    release = {"owner": None, "lock_until": 0, "finished_at": _server_ts()}
+    try:
+        result = backfill.run(force)
+    except Exception as e:
+        log.exception("backfill %s falhou", name)
+        _save_lock(db, name, dict(release, status="failed", error=str(e)[:500]))
+        return {"name": name, "status": "failed", "error": str(e)}
+    _save_lock(db, name, dict(release, status="done", error=None, result=result))
+    return {"name": name, "status": "done", "result": result}
+
+
+def _save_lock(db, name, data):
+    with track(WRITE, CHECKPOINTS):
+        _lock_ref(db, name).set(data, merge=True)
+
+
+# registra as migrações e os backfills (import por efeito colateral)
+from . import actions_compact, backfills  # noqa: E402,F401
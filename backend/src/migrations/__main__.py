@@ -0,0 +1,70 @@
+# backend/src/migrations/__main__.py
+"""CLI: python -m src.migrations {list|status|run|backfill} ... (ver src/migrations/__init__.py)."""
+import os
+import sys
+import json
+import logging
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+from src.migrations import MIGRATIONS, BACKFILLS, checkpoint, run_migration, run_backfill  # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.migrations")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="migrações registradas e o estado de cada uma")
+    st = sub.add_parser("status", help="checkpoint de uma migração")
+    st.add_argument("name")
+    run = sub.add_parser("run", help="roda ou continua uma migração")
+    run.add_argument("name")
+    run.add_argument("--batch", type=int, default=200, help="documentos por lote (máx. 500)")
+    run.add_argument("--pause", type=float, default=0.0, help="segundos de espera entre lotes")
+    run.add_argument("--max-batches", type=int, default=None, help="para depois de N lotes")
+    run.add_argument("--dry-run", action="store_true", help="só conta, não grava")
+    run.add_argument("--restart", action="store_true", help="ignora o checkpoint e começa do início")
+    bf = sub.add_parser("backfill", help="roda backfills de índices/contadores (todos, se nenhum nome)")
+    bf.add_argument("names", nargs="*")
+    bf.add_argument("--force", action="store_true", help="refaz mesmo se já tiver sido feito")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.cmd == "list":
+        for m in MIGRATIONS.values():
+            state = checkpoint(m.name)
+            status = "concluída" if state.get("done") else ("em andamento" if state else "pendente")
+            print(f"{m.name:24} {m.collection:16} {status:13} {m.description}")
+        for b in BACKFILLS.values():
+            state = checkpoint(f"backfill:{b.name}")
+            print(f"{b.name:24} {'(backfill)':16} {state.get('status') or 'pendente':13} {b.description}")
+        return 0
+    if args.cmd == "status":
+        print(json.dumps(checkpoint(args.name), indent=2, default=str, ensure_ascii=False))
+        return 0
+
+    if args.cmd == "backfill":
+        unknown = [n for n in args.names if n not in BACKFILLS]
+        if unknown:
+            parser.error(f"backfill desconhecido: {', '.join(unknown)}")
+        results = [run_backfill(n, force=args.force) for n in (args.names or list(BACKFILLS))]
+        print(json.dumps(results, indent=2, default=str, ensure_ascii=False))
+        return 0 if all(r["status"] != "failed" for r in results) else 1
+
+    if args.name not in MIGRATIONS:
+        parser.error(f"migração desconhecida: {args.name}")
+    result = run_migration(args.name, batch_size=args.batch, pause_s=args.pause, dry_run=args.dry_run,
+                           restart=args.restart, max_batches=args.max_batches)
+    print(json.dumps(result, indent=2, default=str, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
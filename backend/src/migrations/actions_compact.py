@@ -0,0 +1,19 @@
+# backend/src/migrations/actions_compact.py
+"""
+actions -> formato canônico (SCHEMA_VERSION 2).
+
+Regrava cada ação antiga só com as chaves novas (sem type/action_type,
+periods_of_day, material_quantity, observations), com start_date/end_date
+derivados quando faltarem e schema_version. Ações já nessa versão são
+puladas; depois disso _present_for_front não renormaliza mais nada.
+"""
+from . import register
+from src.models.action import SCHEMA_VERSION, _normalize_for_storage, _for_merge
+
+
+@register("actions_compact", "actions", "grava actions no formato canônico com schema_version")
+def transform(doc):
+    if doc.get("schema_version") == SCHEMA_VERSION:
+        return None
+    doc.pop("id", None)
+    return _for_merge(_normalize_for_storage(doc))
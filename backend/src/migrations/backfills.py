@@ -0,0 +1,40 @@
+# backend/src/migrations/backfills.py
+"""
+Backfills dos índices e contadores derivados (ver run_backfill). A ordem
+do registro é a ordem de "backfill" sem nomes.
+"""
+from . import register_backfill
+from src.models.action import Action
+from src.routes.fleet import ensure_fuel_keys
+from src.services import action_metrics, fleet_stats
+from src.services.user_service import ensure_username_index
+
+
+@register_backfill("username_index", "users_by_username a partir de users")
+def username_index(force):
+    return {"entries": ensure_username_index(force=force)}
+
+
+@register_backfill("actions_dates", "start_date/end_date derivados e max_span_days das ações")
+def actions_dates(force):
+    return {"fixed": Action.ensure_date_index(force=force)}
+
+
+@register_backfill("action_metrics", "distribuição por serviço e rollups mensais das ações")
+def action_metrics_rollups(force):
+    if force:
+        action_metrics.rebuild()
+        return {"rebuilt": True}
+    return {"rebuilt": action_metrics.ensure_built()}
+
+
+@register_backfill("fleet_stats", "totais de abastecimento por veículo")
+def fleet_vehicle_stats(force):
+    if force:
+        return {"rebuilt": True, "vehicles": fleet_stats.rebuild()}
+    return {"rebuilt": fleet_stats.ensure_built()}
+
+
+@register_backfill("fuel_logs_keys", "data ISO e combustivel_key dos abastecimentos antigos")
+def fuel_logs_keys(force):
+    return {"fixed": ensure_fuel_keys(force=force)}
@@ -1,4 +1,30 @@
-from src.services.firestore_service import firestore_service
+import re
+import logging
+from datetime import date, timedelta
+
+from google.cloud.firestore_v1 import DELETE_FIELD
+
+from src.services.firestore_service import firestore_service, _server_ts
+from src.services.schedule_index import schedule_index
+from src.services import action_metrics
+from src.services.firestore_metrics import track, WRITE
+
+log = logging.getLogger(__name__)
+
+ACTIONS = "actions"
+META = "_meta"
+# _meta/actions_dates: {"max_span_days": maior (end_date - start_date) já gravado}
+DATES_META = "actions_dates"
+_YMD_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+# maior duração conhecida por este processo (só evita transações repetidas)
+_known_span = 0
+
+# Formato canônico gravado (sem as chaves duplicadas). Documentos com esse
+# schema_version são apresentados sem renormalizar; os mais antigos passam
+# pela normalização completa até a migração actions_compact rodar.
+SCHEMA_VERSION = 2
+# aliases legados: só existem na resposta (_present_for_front), nunca no banco
+LEGACY_KEYS = ("type", "action_type", "periods_of_day", "material_quantity", "observations")
 
 def _as_list(v):
     if v is None:
@@ -18,6 +44,27 @@ def _to_int(v, default=0):
         except Exception:
             return default
 
+def _ymd(v):
+    """'YYYY-MM-DD' a partir de date ou datetime ISO; None se não reconhecer."""
+    if isinstance(v, str) and _YMD_RE.match(v):
+        return v[:10]
+    return None
+
+def _date_range(doc: dict):
+    """(início, fim) em 'YYYY-MM-DD' com os mesmos fallbacks do front (fim = início)."""
+    start = _ymd(doc.get("start_date")) or _ymd(doc.get("start_datetime"))
+    end = _ymd(doc.get("end_date")) or _ymd(doc.get("end_datetime")) or start
+    return start, end
+
+def _span_days(doc: dict) -> int:
+    start, end = _date_range(doc)
+    if not start or not end:
+        return 0
+    return max(0, (date.fromisoformat(end) - date.fromisoformat(start)).days)
+
+def _shift_ymd(ymd: str, days: int) -> str:
+    return (date.fromisoformat(ymd) + timedelta(days=days)).isoformat()
+
 def _status_default(status):
     s = (status or "aguardando").strip().lower()
     if s not in {"aguardando", "andamento", "concluido"}:
@@ -31,8 +78,9 @@ def _active_from_status(status):
 def _normalize_for_storage(data: dict) -> dict:
     """
     Recebe o JSON vindo do front (ou de payloads antigos) e
-    devolve um dicionário pronto para persistir no Firestore,
-    gravando chaves novas e mantendo compatibilidade com nomes legados.
+    devolve um dicionário pronto para persistir no Firestore, no formato
+    canônico (SCHEMA_VERSION): aceita os nomes legados na entrada, mas só
+    grava as chaves novas.
     """
     data = data or {}
 
@@ -43,16 +91,17 @@ def _normalize_for_storage(data: dict) -> dict:
     types_list = _as_list(data.get("types") if data.get("types") is not None else data.get("type"))
     if not types_list and isinstance(data.get("action_type"), str):
         types_list = _as_list(data.get("action_type"))
-    type_str = ", ".join(types_list)
 
     # períodos do dia: day_periods (novo) + periods_of_day (legado)
     day_periods = _as_list(data.get("day_periods") if data.get("day_periods") is not None else data.get("periods_of_day"))
 
     # datas: suportamos date e datetime
-    start_date = data.get("start_date") or None
-    end_date = data.get("end_date") or None
     start_datetime = data.get("start_datetime") or None  # 'YYYY-MM-DDTHH:MM:SS'
     end_datetime = data.get("end_datetime") or None
+    # start_date/end_date são os campos indexados da consulta por janela:
+    # sem eles, deriva do datetime
+    start_date = data.get("start_date") or _ymd(start_datetime)
+    end_date = data.get("end_date") or _ymd(end_datetime)
 
     # material: material_qty (novo) + material_quantity (legado)
     material_qty = data.get("material_qty")
@@ -75,21 +124,14 @@ def _normalize_for_storage(data: dict) -> dict:
     supervisor = (data.get("supervisor") or "").strip()
     team_members = _as_list(data.get("team_members"))
 
-    # Monta o documento final, incluindo chaves novas e legadas para compatibilidade
+    # Monta o documento final (só chaves novas; os aliases legados saem em _present_for_front)
     doc = {
+        "schema_version": SCHEMA_VERSION,
         "client_name": client_name,
         "company_name": company_name,
 
-        # novo
         "types": types_list,
-        "type": type_str,
-
-        # legado
-        "action_type": type_str,
-
-        # períodos
-        "day_periods": day_periods,          # novo
-        "periods_of_day": day_periods,       # legado
+        "day_periods": day_periods,
 
         # datas
         "start_date": start_date,
@@ -98,13 +140,11 @@ def _normalize_for_storage(data: dict) -> dict:
         "end_datetime": end_datetime,
 
         # material
-        "material_qty": material_qty,        # novo
-        "material_quantity": material_qty,   # legado
+        "material_qty": material_qty,
         "material_photo_url": material_photo_url,
 
         # observações
-        "notes": notes,                      # novo
-        "observations": notes,               # legado
+        "notes": notes,
 
         # status/ativo
         "status": status,
@@ -117,11 +157,32 @@ def _normalize_for_storage(data: dict) -> dict:
 
     # mantém quaisquer outros campos desconhecidos (não sobrescreve os oficiais)
     for k, v in data.items():
-        if k not in doc:
+        if k not in doc and k not in LEGACY_KEYS:
             doc[k] = v
 
     return doc
 
+def _for_merge(doc: dict) -> dict:
+    """Documento canônico para set merge: apaga os aliases que um doc antigo ainda tenha."""
+    out = dict(doc)
+    out.update({k: DELETE_FIELD for k in LEGACY_KEYS})
+    return out
+
+def _merged(old, doc: dict) -> dict:
+    """Estado do documento depois de um set merge de doc (sem os aliases apagados)."""
+    out = {k: v for k, v in (old or {}).items() if k not in LEGACY_KEYS}
+    out.update(doc)
+    return out
+
+def _with_aliases(d: dict) -> dict:
+    """Aliases legados de um documento canônico (in place)."""
+    d["type"] = ", ".join(d.get("types") or [])
+    d["action_type"] = d["type"]
+    d["periods_of_day"] = d.get("day_periods") or []
+    d["material_quantity"] = d.get("material_qty", 0)
+    d["observations"] = d.get("notes", "")
+    return d
+
 def _present_for_front(doc: dict) -> dict:
     """
     Garante que qualquer documento vindo do Firestore (mesmo legado)
@@ -129,6 +190,9 @@ def _present_for_front(doc: dict) -> dict:
     Mantém também as chaves antigas para não quebrar outras telas.
     """
     d = (doc or {}).copy()
+    if d.get("schema_version") == SCHEMA_VERSION:
+        # já canônico: só acrescenta os aliases
+        return _with_aliases(d)
 
     # types
     types_list = _as_list(d.get("types") if d.get("types") is not None else d.get("type"))
@@ -181,6 +245,52 @@ def _present_for_front(doc: dict) -> dict:
 
     return d
 
+def _max_span_days() -> int:
+    """Lê _meta/actions_dates (uma leitura; o valor pode ter subido em outro worker)."""
+    global _known_span
+    meta = firestore_service.get_document(META, DATES_META) or {}
+    span = _to_int(meta.get("max_span_days"), 0)
+    _known_span = max(_known_span, span)
+    return span
+
+def _note_spans(docs):
+    """
+    Mantém max_span_days >= duração de qualquer ação gravada. Só abre
+    transação quando a duração passa do maior valor já visto pelo processo
+    (na prática: quase nunca).
+    """
+    global _known_span
+    span = max((_span_days(d) for d in docs), default=0)
+    if span <= _known_span:
+        return
+
+    def _bump(tx, db):
+        ref = db.collection(META).document(DATES_META)
+        snap = firestore_service.tx_get(tx, ref, META)
+        current = _to_int((snap.to_dict() or {}).get("max_span_days"), 0) if snap.exists else 0
+        if span > current:
+            tx.set(ref, {"max_span_days": span}, merge=True)
+        return max(span, current)
+
+    _known_span = max(_known_span, firestore_service.run_transaction(_bump))
+    firestore_service.invalidate_cache(META, DATES_META)
+
+def _window_filters(date_from: str, date_to: str, status=None, max_span=0):
+    """
+    Uma ação [start_date, end_date] cruza [date_from, date_to] se
+    start_date <= date_to e end_date >= date_from. O Firestore só aceita
+    intervalo em um campo, então a consulta vai em start_date, recuando o
+    limite inferior pela maior duração gravada (max_span_days); o teste em
+    end_date é feito em memória sobre esse conjunto já pequeno.
+    """
+    filters = [
+        ("start_date", ">=", _shift_ymd(date_from, -max_span)),
+        ("start_date", "<=", date_to),
+    ]
+    if status:
+        filters.insert(0, ("status", "==", status))
+    return filters
+
 class Action:
     """
     Modelo fino que normaliza payloads e apresenta documentos num formato
@@ -191,7 +301,21 @@ class Action:
     @staticmethod
     def create(action_data):
         doc = _normalize_for_storage(action_data)
-        doc_id, _ = firestore_service.add_document("actions", doc)
+        _note_spans([doc])
+        payload = dict(doc, created_at=_server_ts(), updated_at=_server_ts())
+
+        # ação + contadores (distribuição por serviço, rollup do mês) na mesma transação
+        def _create(tx, db):
+            ref = db.collection(ACTIONS).document()
+            tx.set(ref, payload)
+            for counter_ref, counters in action_metrics.counter_writes(db, None, doc):
+                tx.set(counter_ref, counters, merge=True)
+            return ref.id
+
+        with track(WRITE, ACTIONS, docs=2):
+            doc_id = firestore_service.run_transaction(_create)
+        firestore_service.invalidate_cache(ACTIONS, doc_id)
+        schedule_index.upsert(doc_id, doc)
         return doc_id
 
     # ==== READ ALL ====
@@ -201,6 +325,65 @@ class Action:
         # alguns serviços já retornam com 'id' dentro; se retornar separado, assumimos que já vem pronto
         return [_present_for_front(r) for r in rows]
 
+    # ==== READ PAGE ====
+    @staticmethod
+    def get_page(limit, cursor=None):
+        rows, next_cursor = firestore_service.get_documents_page("actions", limit, start_after=cursor)
+        return [_present_for_front(r) for r in rows], next_cursor
+
+    # ==== READ WINDOW (calendário) ====
+    @staticmethod
+    def get_window(date_from, date_to, status=None):
+        """
+        Ações que cruzam o período [date_from, date_to] ('YYYY-MM-DD', inclusive),
+        opcionalmente só de um status. Lê só as ações que começam dentro da
+        janela recuada por max_span_days, não o histórico inteiro.
+        """
+        filters = _window_filters(date_from, date_to, status, _max_span_days())
+        rows = firestore_service.query_documents(ACTIONS, filters, order_by="start_date") or []
+        out = []
+        for r in rows:
+            _, end = _date_range(r)
+            if end and end >= date_from:
+                out.append(_present_for_front(r))
+        return out
+
+    @staticmethod
+    def ensure_date_index(force=False):
+        """
+        Backfill único para bases anteriores à consulta por janela: grava
+        start_date/end_date derivados de start_datetime/end_datetime onde
+        faltarem e calcula max_span_days. Marca _meta/actions_dates ao
+        terminar; nas próximas chamadas custa uma leitura (force=True refaz).
+        Retorna quantas ações foram corrigidas.
+        """
+        meta = firestore_service.get_document(META, DATES_META) or {}
+        if meta.get("backfilled_at") and not force:
+            return 0
+
+        rows = firestore_service.get_all_documents(ACTIONS) or []
+        fixes = []
+        for r in rows:
+            start, end = _ymd(r.get("start_date")), _ymd(r.get("end_date"))
+            derived_start, derived_end = _ymd(r.get("start_datetime")), _ymd(r.get("end_datetime"))
+            patch = {}
+            if not start and derived_start:
+                patch["start_date"] = derived_start
+            if not end and derived_end:
+                patch["end_date"] = derived_end
+            if patch and r.get("id"):
+                fixes.append((r["id"], patch))
+        written = firestore_service.update_documents(ACTIONS, fixes) if fixes else 0
+
+        span = max((_span_days(r) for r in rows), default=0)
+        firestore_service.update_document(META, DATES_META, {
+            "max_span_days": max(span, _to_int(meta.get("max_span_days"), 0)),
+            "backfilled_at": _server_ts(),
+        })
+        firestore_service.invalidate_cache(META, DATES_META)
+        log.info("actions: %d ações com datas derivadas (max_span_days=%d)", written, span)
+        return written
+
     # ==== READ ONE ====
     @staticmethod
     def get_by_id(action_id):
@@ -214,10 +397,91 @@ class Action:
     # ==== UPDATE ====
     @staticmethod
     def update(action_id, action_data):
+        if not action_id:
+            return False
         doc = _normalize_for_storage(action_data)
-        return firestore_service.update_document("actions", action_id, doc)
+        _note_spans([doc])
+        payload = dict(_for_merge(doc), updated_at=_server_ts())
+
+        def _update(tx, db):
+            ref = db.collection(ACTIONS).document(action_id)
+            snap = firestore_service.tx_get(tx, ref, ACTIONS)
+            old = (snap.to_dict() or {}) if snap.exists else None
+            tx.set(ref, payload, merge=True)
+            for counter_ref, counters in action_metrics.counter_writes(db, old, _merged(old, doc)):
+                tx.set(counter_ref, counters, merge=True)
+            return True
+
+        with track(WRITE, ACTIONS, docs=2):
+            ok = firestore_service.run_transaction(_update)
+        firestore_service.invalidate_cache(ACTIONS, action_id)
+        schedule_index.upsert(action_id, doc)
+        return ok
 
     # ==== DELETE ====
     @staticmethod
     def delete(action_id):
-        return firestore_service.delete_document("actions", action_id)
+        if not action_id:
+            return False
+
+        def _delete(tx, db):
+            ref = db.collection(ACTIONS).document(action_id)
+            snap = firestore_service.tx_get(tx, ref, ACTIONS)
+            if not snap.exists:
+                return True
+            tx.delete(ref)
+            for counter_ref, counters in action_metrics.counter_writes(db, snap.to_dict() or {}, None):
+                tx.set(counter_ref, counters, merge=True)
+            return True
+
+        with track(WRITE, ACTIONS, docs=2):
+            ok = firestore_service.run_transaction(_delete)
+        firestore_service.invalidate_cache(ACTIONS, action_id)
+        schedule_index.remove(action_id)
+        return ok
+
+    # ==== CONFLITOS DE AGENDA ====
+    @staticmethod
+    def conflicts_for(action_data, exclude_id=None):
+        """Ações que colidem com o payload (mesma pessoa, horário sobreposto)."""
+        return schedule_index.conflicts_for(_normalize_for_storage(action_data), exclude_id=exclude_id)
+
+    @staticmethod
+    def conflicts(date_from=None, date_to=None, person=None):
+        return schedule_index.all_conflicts(date_from, date_to, person)
+
+    # ==== BULK ====
+    @staticmethod
+    def existing_ids(action_ids):
+        return set(firestore_service.get_documents("actions", action_ids))
+
+    @staticmethod
+    def create_many(items):
+        docs = [_normalize_for_storage(i) for i in items]
+        _note_spans(docs)
+        ids = firestore_service.add_documents("actions", docs)
+        for doc_id, doc in zip(ids, docs):
+            schedule_index.upsert(doc_id, doc)
+        action_metrics.apply_changes([(None, doc) for doc in docs])
+        return ids
+
+    @staticmethod
+    def update_many(updates):
+        """updates: [(id, dados)]"""
+        pairs = [(action_id, _normalize_for_storage(data)) for action_id, data in updates]
+        _note_spans([doc for _, doc in pairs])
+        previous = firestore_service.get_documents("actions", [action_id for action_id, _ in pairs])
+        written = firestore_service.update_documents("actions", [(action_id, _for_merge(doc)) for action_id, doc in pairs])
+        for action_id, doc in pairs:
+            schedule_index.upsert(action_id, doc)
+        action_metrics.apply_changes([(previous.get(i), _merged(previous.get(i), doc)) for i, doc in pairs])
+        return written
+
+    @staticmethod
+    def delete_many(action_ids):
+        previous = firestore_service.get_documents("actions", action_ids)
+        deleted = firestore_service.delete_documents("actions", action_ids)
+        for action_id in action_ids or []:
+            schedule_index.remove(action_id)
+        action_metrics.apply_changes([(old, None) for old in previous.values()])
+        return deleted
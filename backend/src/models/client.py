@@ -42,6 +42,10 @@ class Client:
     def get_all():
         return firestore_service.get_all_documents("clients")
 
+    @staticmethod
+    def get_page(limit, cursor=None):
+        return firestore_service.get_documents_page("clients", limit, start_after=cursor)
+
     @staticmethod
     def get_by_id(client_id):
         client = firestore_service.get_document("clients", client_id)
@@ -58,4 +62,20 @@ class Client:
     def delete(client_id):
         return firestore_service.delete_document("clients", client_id)
 
+    @staticmethod
+    def existing_ids(client_ids):
+        return set(firestore_service.get_documents("clients", client_ids))
+
+    @staticmethod
+    def create_many(items):
+        return firestore_service.add_documents("clients", items)
+
+    @staticmethod
+    def update_many(updates):
+        return firestore_service.update_documents("clients", updates)
+
+    @staticmethod
+    def delete_many(client_ids):
+        return firestore_service.delete_documents("clients", client_ids)
+
 
@@ -32,6 +32,11 @@ class JobVacancy:
         docs = firestore_service.get_all_documents(cls.COLLECTION) or []
         return [cls._normalize(d) for d in docs]
 
+    @classmethod
+    def get_page(cls, limit: int, cursor: Optional[str] = None):
+        docs, next_cursor = firestore_service.get_documents_page(cls.COLLECTION, limit, start_after=cursor)
+        return [cls._normalize(d) for d in docs], next_cursor
+
     @classmethod
     def get_by_id(cls, job_vacancy_id: str) -> Optional[Dict[str, Any]]:
         doc = firestore_service.get_document(cls.COLLECTION, job_vacancy_id)
@@ -1,22 +1,126 @@
+from datetime import date
 from flask import Blueprint, request, jsonify
 from src.models import Action
 from src.middleware.auth_middleware import require_admin, require_supervisor, roles_allowed
+from src.routes.pagination import page_args, page_response
+from src.routes.bulk import BulkResult, parse_bulk_body, split_creates, split_existing
 
 action_bp = Blueprint("action_bp", __name__)
 
+_STATUSES = ("aguardando", "andamento", "concluido")
+
+def _window_args(args):
+    """
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD&status= -> (from, to, status, erro).
+    Sem from/to retorna (None, None, None, None): listagem antiga.
+    """
+    raw_from, raw_to = args.get("from"), args.get("to")
+    if not raw_from and not raw_to:
+        return None, None, None, None
+    try:
+        date_from = date.fromisoformat(raw_from or raw_to)
+        date_to = date.fromisoformat(raw_to or raw_from)
+    except ValueError:
+        return None, None, None, (jsonify({"message": "from/to devem estar no formato YYYY-MM-DD"}), 400)
+    if date_from > date_to:
+        return None, None, None, (jsonify({"message": "from deve ser anterior ou igual a to"}), 400)
+    status = (args.get("status") or "").strip().lower() or None
+    if status and status not in _STATUSES:
+        return None, None, None, (jsonify({"message": f"status inválido: {status}"}), 400)
+    return date_from.isoformat(), date_to.isoformat(), status, None
+
+def _window_cache_key(date_from, date_to, status):
+    """actions:<status|all>:<YYYY-MM>[,<YYYY-MM>...] com os meses cobertos pela janela."""
+    months = []
+    y, m = int(date_from[:4]), int(date_from[5:7])
+    end = (int(date_to[:4]), int(date_to[5:7]))
+    while (y, m) <= end:
+        months.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return f"actions:{status or 'all'}:{','.join(months)}"
+
+def _wants_validation(args):
+    """?validate=1: recusa (409) ação que colide com a agenda de alguém."""
+    return (args.get("validate") or "").strip().lower() in ("1", "true", "yes", "conflicts")
+
+def _conflict_response(conflicts):
+    return jsonify({"message": "Conflito de agenda", "conflicts": conflicts}), 409
+
 @action_bp.route("/actions", methods=["POST"])
 @roles_allowed('admin', 'supervisor')
 def create_action():
     data = request.json
+    if _wants_validation(request.args):
+        conflicts = Action.conflicts_for(data)
+        if conflicts:
+            return _conflict_response(conflicts)
     action_id = Action.create(data)
     return jsonify({"id": action_id}), 201
 
+@action_bp.route("/actions/conflicts", methods=["GET"])
+@roles_allowed('admin', 'supervisor')
+def get_action_conflicts():
+    """
+    Sem start: pares de ações sobrepostas por pessoa (?from=&to=&person=).
+    Com start (e end, supervisor, team_members, exclude): o que colidiria
+    com essa ação, para validar enquanto o calendário é editado.
+    """
+    args = request.args
+    if args.get("start"):
+        candidate = {
+            "start_datetime": args.get("start"),
+            "end_datetime": args.get("end") or None,
+            "supervisor": args.get("supervisor") or "",
+            "team_members": args.get("team_members") or "",
+        }
+        return jsonify({"conflicts": Action.conflicts_for(candidate, exclude_id=args.get("exclude"))}), 200
+
+    date_from, date_to = args.get("from"), args.get("to")
+    try:
+        for value in (date_from, date_to):
+            if value:
+                date.fromisoformat(value)
+    except ValueError:
+        return jsonify({"message": "from/to devem estar no formato YYYY-MM-DD"}), 400
+    return jsonify({"conflicts": Action.conflicts(date_from, date_to, args.get("person"))}), 200
+
 @action_bp.route("/actions", methods=["GET"])
 @roles_allowed('admin', 'supervisor')
 def get_all_actions():
+    date_from, date_to, status, err = _window_args(request.args)
+    if err:
+        return err
+    if date_from:
+        resp = jsonify(Action.get_window(date_from, date_to, status))
+        resp.headers["X-Cache-Key"] = _window_cache_key(date_from, date_to, status)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        # ETag do conteúdo: mês sem alteração volta 304 sem corpo
+        resp.add_etag()
+        return resp.make_conditional(request)
+
+    limit, cursor = page_args(request.args)
+    if limit:
+        return page_response(*Action.get_page(limit, cursor))
     actions = Action.get_all()
     return jsonify(actions), 200
 
+@action_bp.route("/actions/bulk", methods=["POST"])
+@roles_allowed('admin', 'supervisor')
+def bulk_actions():
+    creates, updates, deletes, err = parse_bulk_body(request.get_json(silent=True))
+    if err:
+        return err
+    if deletes and request.current_user.get("role") != "admin":
+        return jsonify({"message": "Acesso negado - Requer perfil: admin"}), 403
+
+    result = BulkResult()
+    result.created = Action.create_many([data for _, data in split_creates(creates, result)])
+    existing = Action.existing_ids([action_id for action_id, _ in updates])
+    valid = split_existing(updates, existing, result)
+    result.updated = Action.update_many([(action_id, data) for _, action_id, data in valid])
+    result.deleted = Action.delete_many(deletes)
+    return result.response()
+
 @action_bp.route("/actions/<action_id>", methods=["GET"])
 @roles_allowed('admin', 'supervisor')
 def get_action_by_id(action_id):
@@ -29,6 +133,10 @@ def get_action_by_id(action_id):
 @roles_allowed('admin', 'supervisor')
 def update_action(action_id):
     data = request.json
+    if _wants_validation(request.args):
+        conflicts = Action.conflicts_for(data, exclude_id=action_id)
+        if conflicts:
+            return _conflict_response(conflicts)
     Action.update(action_id, data)
     return jsonify({"message": "Action updated successfully"}), 200
 
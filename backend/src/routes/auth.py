@@ -1,7 +1,15 @@
 # backend/src/routes/auth.py
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from src.services.user_service import authenticate_user, get_user_by_id
+from flask_jwt_extended import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    jwt_required,
+    get_jwt,
+    get_jwt_identity,
+)
+from src.services.user_service import authenticate_user, get_user_by_id, PasswordHasherBusy
+from src.services import token_revocation
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -31,27 +39,74 @@ def auth_login():
     if not username or not password:
         return jsonify({"message": "Username/email e password são obrigatórios"}), 400
 
-    # Autenticação delegada ao serviço
-    user = authenticate_user(username, password)
+    # Autenticação delegada ao serviço (bcrypt num pool limitado)
+    try:
+        user = authenticate_user(username, password)
+    except PasswordHasherBusy:
+        return jsonify({"message": "Muitos logins simultâneos, tente novamente"}), 503, {"Retry-After": "1"}
     if not user:
         return jsonify({"message": "Credenciais inválidas"}), 401
 
-    # Cria JWT (em main.py JWT_ACCESS_TOKEN_EXPIRES=False -> sem expirar)
-    additional_claims = {
+    body = _issue_tokens(user)
+    body["user"] = _public_user(user)
+    # Também retorna o token no header Authorization, para clientes que leem de lá
+    return (jsonify(body), 200, {"Authorization": f"Bearer {body['access_token']}"})
+
+
+def _access_claims(user: dict) -> dict:
+    """
+    Claims do access token. Com role/active no token (curto, revogável),
+    o auth_middleware autoriza sem ler o usuário no banco.
+    """
+    return {
         "role": user.get("role"),
         "username": user.get("username") or user.get("name") or user.get("email") or "",
+        "active": bool(user.get("active", True)),
+        **token_revocation.issued_claims(),
     }
-    access_token = create_access_token(
-        identity=str(user.get("id")),
-        additional_claims=additional_claims,
-    )
-
-    body = {
-        "access_token": access_token,
-        "user": _public_user(user),
-    }
-    # Também retorna o token no header Authorization, para clientes que leem de lá
-    return (jsonify(body), 200, {"Authorization": f"Bearer {access_token}"})
+
+
+def _issue_tokens(user: dict, refresh: bool = True) -> dict:
+    identity = str(user.get("id"))
+    out = {"access_token": create_access_token(identity=identity, additional_claims=_access_claims(user))}
+    if refresh:
+        out["refresh_token"] = create_refresh_token(
+            identity=identity, additional_claims=token_revocation.issued_claims())
+    return out
+
+
+# -------- REFRESH --------
+# Troca um refresh token válido por um access token novo (e um refresh novo:
+# o anterior é revogado). Relê o usuário para pegar role/active atuais.
+@auth_bp.route("/auth/refresh", methods=["POST"])
+@jwt_required(refresh=True)
+def auth_refresh():
+    user = get_user_by_id(get_jwt_identity())
+    if not user:
+        return jsonify({"message": "Usuário inválido"}), 401
+    if not user.get("active", True):
+        return jsonify({"message": "Usuário inativo"}), 401
+
+    token_revocation.revoke_token(get_jwt())
+    body = _issue_tokens(user)
+    return (jsonify(body), 200, {"Authorization": f"Bearer {body['access_token']}"})
+
+
+# -------- LOGOUT --------
+# Revoga o token do header e, se enviado no corpo, o refresh token.
+@auth_bp.route("/auth/logout", methods=["POST"])
+@jwt_required(verify_type=False)
+def auth_logout():
+    token_revocation.revoke_token(get_jwt())
+    refresh_token = (request.get_json(silent=True) or {}).get("refresh_token")
+    if refresh_token:
+        try:
+            payload = decode_token(refresh_token)
+            if payload.get("sub") == get_jwt_identity():
+                token_revocation.revoke_token(payload)
+        except Exception:
+            pass  # refresh inválido/expirado: nada a revogar
+    return jsonify({"ok": True}), 200
 
 
 # -------- ME --------
@@ -0,0 +1,94 @@
+# backend/src/routes/bulk.py
+# Helpers dos endpoints POST /api/<recurso>/bulk.
+#
+# Corpo aceito:
+#   {"create": [{...}, ...],
+#    "update": [{"id": "...", ...campos}, ...],
+#    "delete": ["id", ...]}
+# Resposta:
+#   {"created": [ids], "updated": n, "deleted": n, "errors": [{"op", "index", "id"?, "error"}]}
+
+from flask import jsonify
+
+MAX_BULK_OPS = 5000
+
+
+class BulkResult:
+    def __init__(self):
+        self.created = []
+        self.updated = 0
+        self.deleted = 0
+        self.errors = []
+
+    def error(self, op: str, index: int, message: str, doc_id: str = None):
+        err = {"op": op, "index": index, "error": message}
+        if doc_id:
+            err["id"] = doc_id
+        self.errors.append(err)
+
+    def response(self):
+        body = {
+            "created": self.created,
+            "updated": self.updated,
+            "deleted": self.deleted,
+            "errors": self.errors,
+        }
+        return jsonify(body), 200
+
+
+def parse_bulk_body(body):
+    """
+    Retorna (creates, updates, deletes, erro). updates vira [(id, dados)];
+    creates vem como enviado (validar com split_creates).
+    erro é uma resposta pronta (jsonify, status) ou None.
+    """
+    body = body if isinstance(body, dict) else {}
+    creates = body.get("create") or []
+    raw_updates = body.get("update") or []
+    deletes = body.get("delete") or []
+    if not all(isinstance(x, list) for x in (creates, raw_updates, deletes)):
+        return [], [], [], (jsonify({"error": "create/update/delete devem ser listas"}), 400)
+
+    total = len(creates) + len(raw_updates) + len(deletes)
+    if total == 0:
+        return [], [], [], (jsonify({"error": "Nenhuma operação enviada"}), 400)
+    if total > MAX_BULK_OPS:
+        return [], [], [], (jsonify({"error": "Operações demais", "max_ops": MAX_BULK_OPS}), 413)
+
+    updates = []
+    for item in raw_updates:
+        item = dict(item or {}) if isinstance(item, dict) else {}
+        doc_id = str(item.pop("id", "") or "").strip()
+        updates.append((doc_id, item))
+    deletes = [str(d).strip() for d in deletes if str(d or "").strip()]
+    return creates, updates, deletes, None
+
+
+def split_creates(creates, result: BulkResult):
+    """
+    Mantém os creates que são objetos, como [(índice, dados)];
+    os demais viram erro em result (nada de documento vazio).
+    """
+    ok = []
+    for i, data in enumerate(creates):
+        if isinstance(data, dict):
+            ok.append((i, data))
+        else:
+            result.error("create", i, "item deve ser um objeto")
+    return ok
+
+
+def split_existing(updates, existing_ids, result: BulkResult):
+    """
+    Mantém os updates cujo id existe, como [(índice, id, dados)];
+    os demais viram erro em result.
+    """
+    ok = []
+    for i, (doc_id, data) in enumerate(updates):
+        if not doc_id:
+            result.error("update", i, "id obrigatório")
+        elif doc_id not in existing_ids:
+            result.error("update", i, "não encontrado", doc_id)
+        else:
+            ok.append((i, doc_id, data))
+    return ok
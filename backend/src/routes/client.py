@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify
 from src.models import Client
 from src.middleware.auth_middleware import require_admin, require_supervisor, roles_allowed
+from src.routes.pagination import page_args, page_response
+from src.routes.bulk import BulkResult, parse_bulk_body, split_creates, split_existing
 
 client_bp = Blueprint('client_bp', __name__)
 
@@ -14,9 +16,27 @@ def create_client():
 @client_bp.route('/clients', methods=['GET'])
 @roles_allowed('admin')
 def get_all_clients():
+    limit, cursor = page_args(request.args)
+    if limit:
+        return page_response(*Client.get_page(limit, cursor))
     clients = Client.get_all()
     return jsonify(clients), 200
 
+@client_bp.route('/clients/bulk', methods=['POST'])
+@roles_allowed('admin')
+def bulk_clients():
+    creates, updates, deletes, err = parse_bulk_body(request.get_json(silent=True))
+    if err:
+        return err
+
+    result = BulkResult()
+    result.created = Client.create_many([data for _, data in split_creates(creates, result)])
+    existing = Client.existing_ids([client_id for client_id, _ in updates])
+    valid = split_existing(updates, existing, result)
+    result.updated = Client.update_many([(client_id, data) for _, client_id, data in valid])
+    result.deleted = Client.delete_many(deletes)
+    return result.response()
+
 @client_bp.route('/clients/<client_id>', methods=['GET'])
 @roles_allowed('admin')
 def get_client_by_id(client_id):
@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify
 from datetime import datetime
 from typing import Any, Dict
 from src.services.firestore_service import firestore_service as fs
+from src.routes.pagination import page_args, page_response
 
 commercial_bp = Blueprint("commercial", __name__)
 
@@ -59,6 +60,10 @@ def clients_delete(id):
 # ---------- Records (Leads/CRM) ----------
 @commercial_bp.get("/commercial/records")
 def records_list():
+    limit, cursor = page_args(request.args)
+    if limit:
+        return page_response(*fs.get_documents_page(
+            COL_RECORDS, limit, order_by="created_at", descending=True, start_after=cursor))
     items = fs.get_all_documents(COL_RECORDS) or []
     items.sort(key=lambda x: x.get("created_at",""), reverse=True)
     return jsonify(items)
@@ -97,6 +102,10 @@ def records_delete(id):
 # ---------- Orders ----------
 @commercial_bp.get("/commercial/orders")
 def orders_list():
+    limit, cursor = page_args(request.args)
+    if limit:
+        return page_response(*fs.get_documents_page(
+            COL_ORDERS, limit, order_by="data", descending=True, start_after=cursor))
     items = fs.get_all_documents(COL_ORDERS) or []
     items.sort(key=lambda x: (x.get("date") or x.get("data") or "", x.get("created_at","")), reverse=True)
     return jsonify(items)
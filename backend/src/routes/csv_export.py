@@ -0,0 +1,58 @@
+# backend/src/routes/csv_export.py
+# Resposta CSV em streaming dos endpoints .../export.csv.
+# As linhas vêm de um gerador (firestore_service.iter_query) e saem em blocos:
+# o worker nunca monta a lista inteira nem o arquivo inteiro em memória.
+# Formato de planilha pt-BR: separador ';', decimal com vírgula e UTF-8 com BOM
+# (o Excel abre direto; POST /api/transactions/import lê de volta).
+
+import io
+import csv
+from datetime import datetime, date
+
+from flask import Response, stream_with_context
+
+FLUSH_ROWS = 200
+# células de texto começando com estes caracteres viram fórmula na planilha
+_FORMULA_PREFIX = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(v):
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "sim" if v else "não"
+    if isinstance(v, float):
+        return ("%.6f" % v).rstrip("0").rstrip(".").replace(".", ",")
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, (list, tuple)):
+        v = ", ".join(str(i) for i in v)
+    s = str(v)
+    return "'" + s if s.startswith(_FORMULA_PREFIX) else s
+
+
+def csv_response(rows, columns, filename: str):
+    """
+    rows: iterável de dicts; columns: [(cabeçalho, campo)].
+    Erros de leitura no meio do streaming só podem truncar o arquivo (o
+    status 200 já foi enviado): valide os parâmetros antes de chamar.
+    """
+    def generate():
+        buf = io.StringIO()
+        writer = csv.writer(buf, delimiter=";", lineterminator="\r\n")
+        buf.write("\ufeff")
+        writer.writerow([header for header, _ in columns])
+        for n, row in enumerate(rows, start=1):
+            writer.writerow([_cell(row.get(field)) for _, field in columns])
+            if n % FLUSH_ROWS == 0:
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        yield buf.getvalue()
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",  # nginx: não bufferizar o streaming
+    }
+    return Response(stream_with_context(generate()), mimetype="text/csv", headers=headers)
@@ -1,14 +1,26 @@
 # backend/src/routes/finance.py
 # Persistência em Firebase Firestore (sem JSON local)
 # Endpoints: /api/transactions[/:id]
-# Correções: sanitização de datetimes/Timestamp e ordenação segura.
+#   GET /api/transactions?from=&to=&status=&type=&category=&q=&limit=&cursor=&count=1
+#   GET /api/transactions/export.csv (mesmos filtros da listagem)
+#   POST /api/transactions/import (CSV/OFX) e GET /api/transactions/import/:job_id
+# Datetimes/Timestamps do Firestore saem em ISO pelo provider JSON do app
+# (src/json_provider.py); a ordenação da lista completa é segura para tipos misturados.
 
 from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 from typing import Any, Dict, List, Tuple
+import os
 import math
+import shutil
+import tempfile
 
-from src.services.firestore_service import firestore_service as fs
+from src.services.firestore_service import firestore_service as fs, InvalidCursor
+from src.routes.pagination import page_args, page_response
+from src.routes.bulk import BulkResult, parse_bulk_body, split_creates, split_existing
+from src.routes.csv_export import csv_response
+from src.services.finance_summary import finance_columns, GROUP_BY
+from src.services import finance_import
 
 finance_bp = Blueprint("finance", __name__)
 COLLECTION = "finance_transactions"
@@ -61,21 +73,6 @@ def _to_iso_if_datetime(x: Any) -> Any:
         return x.isoformat()
     return x
 
-def _sanitize_doc(d: Dict[str, Any]) -> Dict[str, Any]:
-    out: Dict[str, Any] = {}
-    for k, v in (d or {}).items():
-        if isinstance(v, dict):
-            out[k] = _sanitize_doc(v)
-        elif isinstance(v, list):
-            out[k] = [
-                _sanitize_doc(i) if isinstance(i, dict)
-                else _to_iso_if_datetime(i)
-                for i in v
-            ]
-        else:
-            out[k] = _to_iso_if_datetime(v)
-    return out
-
 ALLOWED_STATUS = {"Pago", "Pendente", "Cancelado"}
 ALLOWED_TYPES = {"entrada", "saida", "despesa", "pagar", "receber"}
 
@@ -144,16 +141,91 @@ def _json_error(e: Exception, status: int = 500):
 
 # ----------------------- Endpoints -----------------------
 
+# ordem da listagem: vencimento e, no mesmo dia, a alteração mais recente
+ORDER = ["-date", "-updated_at"]
+_TEXT_FIELDS = ("notes", "category", "client_text", "material_text")
+
+def _list_filters(args) -> Tuple[List[tuple], str]:
+    """
+    ?from=&to= (YYYY-MM-DD, inclusive, sobre date), ?status=, ?type=,
+    ?category= (exata) e ?q= (texto em notes/category/client_text/material_text).
+    Retorna (filtros para o Firestore, termo de busca); ValueError se inválido.
+    """
+    filters: List[tuple] = []
+    for key, op in (("from", ">="), ("to", "<=")):
+        v = (args.get(key) or "").strip()
+        if v:
+            if not _is_ymd(v):
+                raise ValueError(f"'{key}' deve ser YYYY-MM-DD.")
+            filters.append(("date", op, v))
+    status = (args.get("status") or "").strip()
+    if status:
+        status = status.capitalize()
+        if status not in ALLOWED_STATUS:
+            raise ValueError("'status' deve ser Pago, Pendente ou Cancelado.")
+        filters.append(("status", "==", status))
+    t = (args.get("type") or "").strip().lower()
+    if t:
+        t = {"pagar": "saida", "receber": "entrada"}.get(t, t)
+        if t not in ALLOWED_TYPES:
+            raise ValueError("'type' deve ser entrada, saida ou despesa.")
+        filters.append(("type", "==", t))
+    category = (args.get("category") or "").strip()
+    if category:
+        filters.append(("category", "==", category))
+    return filters, (args.get("q") or "").strip().casefold()
+
+def _text_match(term: str):
+    def match(doc: Dict[str, Any]) -> bool:
+        return any(term in str(doc.get(f) or "").casefold() for f in _TEXT_FIELDS)
+    return match
+
 @finance_bp.get("/transactions")
 def list_transactions():
     try:
+        limit, cursor = page_args(request.args)
+        try:
+            filters, term = _list_filters(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        match = _text_match(term) if term else None
+        if limit:
+            raw, next_cursor = fs.query_page(
+                COLLECTION, filters, ORDER, limit, start_after=cursor, match=match)
+            total = None
+            if not term and (not cursor or request.args.get("count") == "1"):
+                total = fs.count_documents(COLLECTION, filters, ORDER)
+            return page_response(raw, next_cursor, total=total)
+        if filters or term:
+            # sem ?limit/?cursor mantém a lista simples, agora filtrada e ordenada
+            return jsonify(list(fs.iter_query(COLLECTION, filters, ORDER, match=match))), 200
         raw = fs.get_all_documents(COLLECTION) or []
-        items = [_sanitize_doc(i) for i in raw]
-        items = _sort_desc(items)
+        items = _sort_desc(raw)
         return jsonify(items), 200
+    except InvalidCursor:
+        raise  # tratado em main.py (400)
     except Exception as e:
         return _json_error(e)
 
+# cabeçalhos reconhecidos por POST /transactions/import (o CSV volta para o sistema)
+EXPORT_COLUMNS = [
+    ("id", "id"), ("data", "date"), ("tipo", "type"), ("valor", "amount"),
+    ("status", "status"), ("categoria", "category"), ("descricao", "notes"),
+    ("client_text", "client_text"), ("material_text", "material_text"),
+    ("action_text", "action_text"), ("created_at", "created_at"), ("updated_at", "updated_at"),
+]
+
+@finance_bp.get("/transactions/export.csv")
+def export_transactions():
+    """Mesmos filtros e ordem de GET /transactions, sem paginação, em streaming."""
+    try:
+        filters, term = _list_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rows = fs.iter_query(COLLECTION, filters, ORDER, match=_text_match(term) if term else None)
+    filename = f"transacoes-{datetime.utcnow():%Y%m%d}.csv"
+    return csv_response(rows, EXPORT_COLUMNS, filename)
+
 @finance_bp.post("/transactions")
 def create_transaction():
     try:
@@ -165,7 +237,7 @@ def create_transaction():
         data.setdefault("created_at", _iso_now())
         doc_id, _ = fs.add_document(COLLECTION, data)
         saved = fs.get_document(COLLECTION, doc_id) or {**data, "id": doc_id}
-        saved = _sanitize_doc(saved)
+        finance_columns.upsert(doc_id, saved)
         return jsonify(saved), 201
     except Exception as e:
         return _json_error(e)
@@ -182,7 +254,7 @@ def update_transaction(id):
         saved = fs.get_document(COLLECTION, id)
         if not saved:
             return jsonify({"error": "Registro não encontrado"}), 404
-        saved = _sanitize_doc(saved)
+        finance_columns.upsert(id, saved)
         return jsonify(saved), 200
     except Exception as e:
         return _json_error(e)
@@ -229,18 +301,125 @@ def patch_transaction(id):
         saved = fs.get_document(COLLECTION, id)
         if not saved:
             return jsonify({"error": "Registro não encontrado"}), 404
-        saved = _sanitize_doc(saved)
+        finance_columns.upsert(id, saved)
         return jsonify(saved), 200
     except Exception as e:
         return _json_error(e)
 
+@finance_bp.post("/transactions/bulk")
+def bulk_transactions():
+    """create/update seguem as regras do POST/PUT; delete ignora ids inexistentes."""
+    try:
+        creates, updates, deletes, err = parse_bulk_body(request.get_json(force=True, silent=True))
+        if err:
+            return err
+        result = BulkResult()
+
+        to_create = []
+        for i, payload in split_creates(creates, result):
+            data = _normalize_payload(payload)
+            ok, msg = _require_date(data)
+            if not ok:
+                result.error("create", i, msg)
+                continue
+            data.setdefault("created_at", _iso_now())
+            to_create.append(data)
+        result.created = fs.add_documents(COLLECTION, to_create)
+        for doc_id, data in zip(result.created, to_create):
+            finance_columns.upsert(doc_id, data)
+
+        existing = fs.get_documents(COLLECTION, [doc_id for doc_id, _ in updates])
+        to_update = []
+        for i, doc_id, payload in split_existing(updates, existing, result):
+            data = _normalize_payload(payload)
+            ok, msg = _require_date(data)
+            if not ok:
+                result.error("update", i, msg, doc_id)
+                continue
+            to_update.append((doc_id, data))
+        result.updated = fs.update_documents(COLLECTION, to_update)
+        for doc_id, data in to_update:
+            finance_columns.upsert(doc_id, {**existing[doc_id], **data})
+
+        result.deleted = fs.delete_documents(COLLECTION, deletes)
+        for doc_id in deletes:
+            finance_columns.remove(doc_id)
+        return result.response()
+    except Exception as e:
+        return _json_error(e)
+
+def _import_row(payload: Dict[str, Any]):
+    """
+    Linha de extrato -> (dados, None) ou (None, erro). Mesmas regras do POST,
+    com três ajustes de extrato: o valor é obrigatório e tem de ser numérico,
+    sem coluna de status a transação já está "Pago", e sem coluna de tipo o
+    sinal do valor define entrada/saída (o valor é gravado positivo).
+    """
+    payload = dict(payload)
+    payload.setdefault("status", "Pago")
+    raw_amount = payload.get("amount") if payload.get("amount") not in (None, "") else payload.get("valor")
+    if _parse_brl(raw_amount, None) is None:
+        # _parse_brl gravaria 0,00 em silêncio: no extrato, valor ruim é erro da linha
+        return None, "Campo 'valor' ausente ou inválido."
+    data = _normalize_payload(payload)
+    ok, msg = _require_date(data)
+    if not ok:
+        return None, msg
+    if not (payload.get("type") or payload.get("tipo")) and data["amount"] < 0:
+        data["amount"] = -data["amount"]
+    data["created_at"] = data["updated_at"]
+    return data, None
+
+@finance_bp.post("/transactions/import")
+def import_transactions():
+    """
+    Extrato em multipart (campo "file") ou no corpo cru. ?format=csv|ofx
+    (padrão: pelo nome/cabeçalho). O upload é copiado em blocos para um
+    arquivo temporário e processado em segundo plano: responde 202 com o
+    job; ?wait=1 processa na própria requisição e responde 200.
+    """
+    try:
+        fmt = (request.args.get("format") or "").strip().lower()
+        if fmt and fmt not in finance_import.FORMATS:
+            return jsonify({"error": "'format' deve ser csv ou ofx."}), 400
+        upload = request.files.get("file")
+        source = upload.stream if upload else request.stream
+        filename = upload.filename if upload else ""
+        with tempfile.NamedTemporaryFile(prefix="finance-import-", delete=False) as tmp:
+            shutil.copyfileobj(source, tmp, 64 * 1024)
+            size = tmp.tell()
+        if not size:
+            os.remove(tmp.name)
+            return jsonify({"error": "Arquivo vazio."}), 400
+        if not fmt:
+            with open(tmp.name, "rb") as fh:
+                fmt = finance_import.detect_format(fh.read(4096), filename)
+
+        job_id = finance_import.create_job(fmt, filename, size)
+        if request.args.get("wait") == "1":
+            finance_import.run_import(job_id, tmp.name, fmt, _import_row, finance_columns.upsert)
+            return jsonify(finance_import.get_job(job_id)), 200
+        finance_import.run_import_async(job_id, tmp.name, fmt, _import_row, finance_columns.upsert)
+        return jsonify({"id": job_id, "status": "running"}), 202, {"Location": f"/api/transactions/import/{job_id}"}
+    except Exception as e:
+        return _json_error(e)
+
+@finance_bp.get("/transactions/import/<job_id>")
+def import_status(job_id):
+    try:
+        job = finance_import.get_job(job_id)
+        if not job:
+            return jsonify({"error": "Importação não encontrada"}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        return _json_error(e)
+
 @finance_bp.get("/transactions/<id>")
 def get_single(id):
     try:
         it = fs.get_document(COLLECTION, id)
         if not it:
             return jsonify({"error": "Registro não encontrado"}), 404
-        it = _sanitize_doc(it)
         return jsonify(it), 200
     except Exception as e:
         return _json_error(e)
@@ -252,16 +431,35 @@ def delete_transaction(id):
         if not it:
             return jsonify({"error": "Registro não encontrado"}), 404
         fs.delete_document(COLLECTION, id)
+        finance_columns.remove(id)
         return jsonify({"ok": True}), 200
     except Exception as e:
         return _json_error(e)
 
+@finance_bp.get("/finance/summary")
+def finance_summary():
+    """
+    Totais de entradas/saídas/despesas e saldos pago/pendente no servidor
+    (?from=&to= sobre date; ?group_by=month|category|status), em vez de
+    mandar o extrato inteiro para o front somar.
+    """
+    try:
+        date_from, date_to = request.args.get("from"), request.args.get("to")
+        for value in (date_from, date_to):
+            if value and not _is_ymd(value):
+                return jsonify({"error": "from/to devem estar no formato YYYY-MM-DD"}), 400
+        group_by = (request.args.get("group_by") or "").strip().lower() or None
+        if group_by and group_by not in GROUP_BY:
+            return jsonify({"error": f"group_by deve ser um de: {', '.join(GROUP_BY)}"}), 400
+        return jsonify(finance_columns.summary(date_from, date_to, group_by)), 200
+    except Exception as e:
+        return _json_error(e)
+
 # Diagnóstico rápido
 @finance_bp.get("/finance/_debug")
 def finance_debug():
     try:
         raw = fs.get_all_documents(COLLECTION) or []
-        items = [_sanitize_doc(i) for i in raw]
-        return jsonify({"ok": True, "count": len(items)}), 200
+        return jsonify({"ok": True, "count": len(raw)}), 200
     except Exception as e:
         return _json_error(e)
@@ -1,15 +1,30 @@
 # backend/src/routes/fleet.py
 # Firestore CRUD para Frota (Veículos + Abastecimentos)
 
+import logging
+from itertools import chain
+
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import firebase_admin
-from firebase_admin import firestore
+from src.services.firestore_service import firestore_service as fs, get_db, InvalidCursor, _server_ts
+from src.services.firestore_metrics import track, READ, WRITE
+from src.services.firestore_query import apply_memory, memory_plan
+from src.routes.pagination import page_args, page_response
+from src.routes.bulk import BulkResult, parse_bulk_body, split_creates, split_existing
+from src.routes.csv_export import csv_response
+from src.services.fuel_text_index import fuel_text_index
+from src.services import fleet_stats
+from src.services.fuel_analytics import fuel_analytics
 
 fleet_bp = Blueprint("fleet", __name__)
+log = logging.getLogger(__name__)
 
 COL_VEHICLES = "fleet_vehicles"
 COL_FUEL_LOGS = "fleet_fuel_logs"
+META = "_meta"
+FUEL_KEYS_META = "fuel_logs_keys"
+# até quantos ids do índice de texto vale ler direto (get_all) em vez de consultar
+MAX_TEXT_IDS = 1000
 
 
 # ----------------- helpers -----------------
@@ -23,13 +38,25 @@ def _doc(snap):
     return d
 
 
-def _get_db():
-    """Inicializa o app Firebase se necessário (credenciais já devem estar configuradas no ambiente)."""
-    try:
-        firebase_admin.get_app()
-    except ValueError:
-        firebase_admin.initialize_app()
-    return firestore.client()
+# Chamadas diretas ao cliente, cronometradas (ver firestore_metrics)
+def _read(ref, collection):
+    with track(READ, collection):
+        return ref.get()
+
+
+def _add(db, collection, data):
+    with track(WRITE, collection):
+        return db.collection(collection).add(data)[1]
+
+
+def _update(ref, collection, patch):
+    with track(WRITE, collection):
+        ref.update(patch)
+
+
+def _delete(ref, collection):
+    with track(WRITE, collection):
+        ref.delete()
 
 
 def _parse_float(v, default=0.0):
@@ -99,10 +126,128 @@ def _normalize_date(s: str) -> str:
     return s[:10]
 
 
-def _contains(val: str, term: str) -> bool:
-    if not term:
+def _is_ymd(s: str) -> bool:
+    try:
+        datetime.strptime(s, "%Y-%m-%d")
         return True
-    return term.lower() in (val or "").lower()
+    except Exception:
+        return False
+
+
+def _fuel_key(value) -> str:
+    """Combustível sem caixa e sem espaços extras (campo combustivel_key, usado no filtro)."""
+    return " ".join(str(value or "").split()).casefold()
+
+
+def _fuel_filters(args):
+    """
+    Querystring da listagem de abastecimentos -> filtros de query_documents
+    (só os que o Firestore resolve: placa, combustível, preço e período).
+    Os de texto livre vão para o índice de trigramas (_fuel_terms).
+    """
+    placa = (args.get("placa") or "").upper().strip()
+    combustivel = (args.get("combustivel") or "").strip()
+    preco_min = _parse_float(args.get("precoMin"), None)
+    preco_max = _parse_float(args.get("precoMax"), None)
+    de = _normalize_date(args.get("de") or args.get("dataDe") or "")
+    ate = _normalize_date(args.get("ate") or args.get("dataAte") or "")
+
+    filters = []
+    if placa:
+        filters.append(("placa", "==", placa))
+    if combustivel:
+        filters.append(("combustivel_key", "==", _fuel_key(combustivel)))
+    if preco_min is not None:
+        filters.append(("preco_litro", ">=", preco_min))
+    if preco_max is not None:
+        filters.append(("preco_litro", "<=", preco_max))
+    if de:
+        filters.append(("data", ">=", de))
+    if ate:
+        filters.append(("data", "<=", ate))
+    return filters
+
+
+def _fuel_terms(args):
+    return {
+        "carro": args.get("veiculo") or args.get("carro") or "",
+        "motorista": args.get("motorista") or "",
+        "posto": args.get("posto") or "",
+    }
+
+
+def _without_period(filters):
+    return [f for f in filters if f[0] != "data"]
+
+
+def _fuel_by_ids(filters, ids):
+    """
+    Docs dos ids achados no índice de texto que passam nos demais filtros,
+    por data; os sem data vêm antes e ignoram o período (_fuel_undated).
+    """
+    docs = list(fs.get_documents(COL_FUEL_LOGS, sorted(ids)).values())
+    for d in docs:
+        d["data"] = _normalize_date(d.get("data"))
+    undated = apply_memory([d for d in docs if not d["data"]], memory_plan(_without_period(filters), "id"))
+    return undated + apply_memory([d for d in docs if d["data"]], memory_plan(filters, "data"))
+
+
+def _fuel_undated(filters, match=None):
+    """
+    Abastecimentos sem data que passam nos demais filtros, por id. O período
+    (de/ate) nunca excluiu esses docs, mas o intervalo no Firestore não os
+    alcança: vêm de uma consulta de igualdade à parte (só quando há período).
+    """
+    rest = _without_period(filters)
+    if len(rest) == len(filters):
+        return []
+    docs = fs.query_documents(COL_FUEL_LOGS, rest + [("data", "==", "")])
+    if match:
+        docs = [d for d in docs if match(d)]
+    return sorted(docs, key=lambda d: d["id"])
+
+
+def _fuel_page(filters, limit, cursor, match=None):
+    """query_page por data, com os docs sem data (_fuel_undated) à frente."""
+    undated = _fuel_undated(filters, match)
+    pos = next((i for i, d in enumerate(undated) if d["id"] == cursor), None)
+    if pos is not None:
+        head, cursor = undated[pos + 1:], None
+    else:
+        head = [] if cursor else undated
+    if len(head) >= limit:
+        return head[:limit], head[limit - 1]["id"]
+    items, next_cursor = fs.query_page(
+        COL_FUEL_LOGS, filters, "data", limit - len(head), start_after=cursor, match=match)
+    return head + items, next_cursor
+
+
+def ensure_fuel_keys(force=False):
+    """
+    Backfill (CLI de migrations) dos abastecimentos gravados antes da
+    normalização: data em AAAA-MM-DD e combustivel_key. Marca
+    _meta/fuel_logs_keys ao terminar; depois custa uma leitura (force=True
+    refaz). Retorna quantos docs foram corrigidos.
+    """
+    meta = fs.get_document(META, FUEL_KEYS_META) or {}
+    if meta.get("backfilled_at") and not force:
+        return 0
+    fixes = []
+    for doc in fs.iter_query(COL_FUEL_LOGS):
+        patch = {}
+        data = _normalize_date(doc.get("data"))
+        if data != doc.get("data"):
+            patch["data"] = data
+        key = _fuel_key(doc.get("combustivel"))
+        if key != doc.get("combustivel_key"):
+            patch["combustivel_key"] = key
+        if patch:
+            fixes.append((doc["id"], patch))
+    written = fs.update_documents(COL_FUEL_LOGS, fixes) if fixes else 0
+    fs.update_document(META, FUEL_KEYS_META, {"backfilled_at": _server_ts()})
+    fs.invalidate_cache(META, FUEL_KEYS_META)
+    log.info("fleet: %d abastecimentos normalizados (data/combustivel_key)", written)
+    return written
 
 
 # ==============================================================================
@@ -110,15 +255,24 @@ def _contains(val: str, term: str) -> bool:
 # ==============================================================================
 @fleet_bp.get("/fleet/vehicles")
 def vehicles_list():
-    db = _get_db()
-    items = [_doc(doc) for doc in db.collection(COL_VEHICLES).stream()]
+    """
+    ?with_stats=1: cada veículo vem com "stats" (abastecimentos, litros,
+    valor total, último odômetro e data), lidos de fleet_vehicle_stats:
+    uma leitura por veículo, sem ler os abastecimentos.
+    """
+    # leitura via fachada: a coleção de veículos é cacheada por processo
+    items = fs.get_all_documents(COL_VEHICLES)
     items.sort(key=lambda x: x.get("created_at", ""))
+    if request.args.get("with_stats") == "1":
+        stats = fleet_stats.for_placas(it.get("placa") for it in items)
+        for it in items:
+            it["stats"] = stats.get(it.get("placa")) or fleet_stats.summarize({})
     return jsonify(items), 200
 
 
 @fleet_bp.post("/fleet/vehicles")
 def vehicles_create():
-    db = _get_db()
+    db = get_db()
     b = request.get_json(force=True) or {}
     data = {
         "placa": (b.get("placa") or "").upper().strip(),
@@ -129,15 +283,16 @@ def vehicles_create():
         "created_at": _now_iso(),
         "updated_at": _now_iso(),
     }
-    ref = db.collection(COL_VEHICLES).add(data)[1]
-    return jsonify(_doc(ref.get())), 201
+    ref = _add(db, COL_VEHICLES, data)
+    fs.invalidate_cache(COL_VEHICLES, ref.id)
+    return jsonify(_doc(_read(ref, COL_VEHICLES))), 201
 
 
 @fleet_bp.put("/fleet/vehicles/<id>")
 def vehicles_update(id):
-    db = _get_db()
+    db = get_db()
     ref = db.collection(COL_VEHICLES).document(id)
-    snap = ref.get()
+    snap = _read(ref, COL_VEHICLES)
     if not snap.exists:
         return jsonify({"error": "Veículo não encontrado"}), 404
 
@@ -151,17 +306,19 @@ def vehicles_update(id):
         "updated_at": _now_iso(),
     }
     patch = {k: v for k, v in patch.items() if not (isinstance(v, str) and v == "")}
-    ref.update(patch)
-    return jsonify(_doc(ref.get())), 200
+    _update(ref, COL_VEHICLES, patch)
+    fs.invalidate_cache(COL_VEHICLES, id)
+    return jsonify(_doc(_read(ref, COL_VEHICLES))), 200
 
 
 @fleet_bp.delete("/fleet/vehicles/<id>")
 def vehicles_delete(id):
-    db = _get_db()
+    db = get_db()
     ref = db.collection(COL_VEHICLES).document(id)
-    if not ref.get().exists:
+    if not _read(ref, COL_VEHICLES).exists:
         return jsonify({"error": "Veículo não encontrado"}), 404
-    ref.delete()
+    _delete(ref, COL_VEHICLES)
+    fs.invalidate_cache(COL_VEHICLES, id)
     return ("", 204)
 
 
@@ -174,55 +331,78 @@ def fuel_list():
     Filtros (querystring):
       placa, veiculo (carro), motorista, combustivel, posto,
       precoMin, precoMax, de, ate
+    placa, combustível (combustivel_key, sem caixa), período e preço vão
+    para o Firestore (um campo de intervalo por consulta: com período, o
+    preço é conferido em memória); com período, os sem data vêm antes. veiculo/motorista/posto ("contém", sem caixa)
+    são resolvidos no índice de trigramas: com poucos ids, lê só esses docs.
+    Paginação opcional: limit, cursor (ordem por data).
     """
-    db = _get_db()
     args = request.args
+    filters = _fuel_filters(args)
+    ids = fuel_text_index.search(_fuel_terms(args))
+    limit, cursor = page_args(args)
+
+    if ids is not None and len(ids) <= MAX_TEXT_IDS:
+        items = _fuel_by_ids(filters, ids)
+        next_cursor = None
+        if limit:
+            if cursor:
+                pos = next((i for i, it in enumerate(items) if it["id"] == cursor), None)
+                if pos is None:
+                    raise InvalidCursor(cursor)
+                items = items[pos + 1:]
+            next_cursor = items[limit - 1]["id"] if len(items) > limit else None
+            items = items[:limit]
+    else:
+        match = (lambda d: d["id"] in ids) if ids is not None else None
+        if limit:
+            items, next_cursor = _fuel_page(filters, limit, cursor, match)
+        else:
+            items = fs.query_documents(COL_FUEL_LOGS, filters, order_by="data")
+            if match:
+                items = [it for it in items if match(it)]
+            items = _fuel_undated(filters, match) + items
 
-    placa = (args.get("placa") or "").upper().strip()
-    veiculo = (args.get("veiculo") or args.get("carro") or "").strip()
-    motorista = (args.get("motorista") or "").strip()
-    combustivel = (args.get("combustivel") or "").strip()
-    posto = (args.get("posto") or "").strip()
-    preco_min = _parse_float(args.get("precoMin"), None)
-    preco_max = _parse_float(args.get("precoMax"), None)
-    de = _normalize_date(args.get("de") or args.get("dataDe") or "")
-    ate = _normalize_date(args.get("ate") or args.get("dataAte") or "")
-
-    # Busca tudo e filtra/ordena em memória (evita necessidade de índices compostos)
-    items = [_doc(doc) for doc in db.collection(COL_FUEL_LOGS).stream()]
-
-    norm = []
     for it in items:
         it["data"] = _normalize_date(it.get("data"))
-        if placa and (it.get("placa") or "").upper() != placa:
-            continue
-        if veiculo and not _contains(it.get("carro"), veiculo):
-            continue
-        if motorista and not _contains(it.get("motorista"), motorista):
-            continue
-        if combustivel and (it.get("combustivel") or "").lower() != combustivel.lower():
-            continue
-        if posto and not _contains(it.get("posto"), posto):
-            continue
-        if preco_min is not None and _parse_float(it.get("preco_litro")) < preco_min:
-            continue
-        if preco_max is not None and _parse_float(it.get("preco_litro")) > preco_max:
-            continue
-        if de and it["data"] and it["data"] < de:
-            continue
-        if ate and it["data"] and it["data"] > ate:
-            continue
-        norm.append(it)
-
-    norm.sort(key=lambda x: x.get("data", ""))
-    return jsonify(norm), 200
+    if limit:
+        return page_response(items, next_cursor)
+    items.sort(key=lambda x: x.get("data", ""))
+    return jsonify(items), 200
 
 
-@fleet_bp.post("/fleet/fuel-logs")
-def fuel_create():
-    db = _get_db()
-    b = request.get_json(force=True) or {}
-    data = {
+FUEL_EXPORT_COLUMNS = [
+    ("id", "id"), ("data", "data"), ("placa", "placa"), ("carro", "carro"),
+    ("motorista", "motorista"), ("combustivel", "combustivel"), ("litros", "litros"),
+    ("preco_litro", "preco_litro"), ("valor_total", "valor_total"), ("odometro", "odometro"),
+    ("posto", "posto"), ("nota_fiscal", "nota_fiscal"), ("observacoes", "observacoes"),
+]
+
+
+@fleet_bp.get("/fleet/fuel-logs/export.csv")
+def fuel_export():
+    """Mesmos filtros de GET /fleet/fuel-logs, ordenado por data, em streaming."""
+    filters = _fuel_filters(request.args)
+
+    ids = fuel_text_index.search(_fuel_terms(request.args))
+
+    def rows():
+        if ids is not None and len(ids) <= MAX_TEXT_IDS:
+            source = _fuel_by_ids(filters, ids)
+        else:
+            match = (lambda d: d["id"] in ids) if ids is not None else None
+            source = chain(_fuel_undated(filters, match),
+                           fs.iter_query(COL_FUEL_LOGS, filters, order_by="data", match=match))
+        for it in source:
+            it["data"] = _normalize_date(it.get("data"))
+            yield it
+
+    return csv_response(rows(), FUEL_EXPORT_COLUMNS, f"abastecimentos-{datetime.utcnow():%Y%m%d}.csv")
+
+
+def _fuel_fields(b, combustivel_default=""):
+    """Campos de abastecimento vindos do front (aceita aliases)."""
+    return {
         "placa": (b.get("placa") or "").upper().strip(),
         "carro": (b.get("carro") or "").strip(),
         "motorista": (b.get("motorista") or "").strip(),
@@ -234,48 +414,42 @@ def fuel_create():
         "posto": (b.get("posto") or "").strip(),
         "nota_fiscal": (b.get("nota_fiscal") or b.get("nf") or "").strip(),
         "observacoes": (b.get("observacoes") or b.get("obs") or "").strip(),
-        "combustivel": (b.get("combustivel") or "Gasolina").strip(),
-        "created_at": _now_iso(),
-        "updated_at": _now_iso(),
+        "combustivel": (b.get("combustivel") or combustivel_default).strip(),
+        "combustivel_key": _fuel_key(b.get("combustivel") or combustivel_default),
     }
+
+
+def _vehicle_model(db, placa, memo=None):
+    """Modelo/marca do veículo pela placa (memo evita repetir a consulta em lote)."""
+    if memo is not None and placa in memo:
+        return memo[placa]
+    modelo = ""
+    with track(READ, COL_VEHICLES):
+        vq = list(db.collection(COL_VEHICLES).where("placa", "==", placa).limit(1).stream())
+    for vdoc in vq:
+        v = vdoc.to_dict() or {}
+        modelo = v.get("modelo") or v.get("marca") or ""
+    if memo is not None:
+        memo[placa] = modelo
+    return modelo
+
+
+def _new_fuel_log(db, b, memo=None):
+    data = _fuel_fields(b, combustivel_default="Gasolina")
+    data["created_at"] = _now_iso()
+    data["updated_at"] = _now_iso()
     if not data["valor_total"]:
         data["valor_total"] = round(data["litros"] * (data["preco_litro"] or 0), 2)
 
     # snapshot do modelo do veículo pela placa (se não enviado)
     if data["placa"] and not data["carro"]:
-        vq = db.collection(COL_VEHICLES).where("placa", "==", data["placa"]).limit(1).stream()
-        for vdoc in vq:
-            v = vdoc.to_dict() or {}
-            data["carro"] = v.get("modelo") or v.get("marca") or ""
+        data["carro"] = _vehicle_model(db, data["placa"], memo)
+    return data
 
-    ref = db.collection(COL_FUEL_LOGS).add(data)[1]
-    return jsonify(_doc(ref.get())), 201
 
-
-@fleet_bp.put("/fleet/fuel-logs/<id>")
-def fuel_update(id):
-    db = _get_db()
-    ref = db.collection(COL_FUEL_LOGS).document(id)
-    snap = ref.get()
-    if not snap.exists:
-        return jsonify({"error": "Registro não encontrado"}), 404
-
-    b = request.get_json(force=True) or {}
-    patch = {
-        "placa": (b.get("placa") or "").upper().strip(),
-        "carro": (b.get("carro") or "").strip(),
-        "motorista": (b.get("motorista") or "").strip(),
-        "data": _normalize_date(b.get("data")),
-        "litros": _parse_float(b.get("litros")),
-        "preco_litro": _parse_float(b.get("preco_litro") or b.get("preco") or b.get("precoLitro")),
-        "valor_total": _parse_float(b.get("valor_total") or b.get("valor") or 0),
-        "odometro": _parse_int(b.get("odometro") or b.get("km") or 0),
-        "posto": (b.get("posto") or "").strip(),
-        "nota_fiscal": (b.get("nota_fiscal") or b.get("nf") or "").strip(),
-        "observacoes": (b.get("observacoes") or b.get("obs") or "").strip(),
-        "combustivel": (b.get("combustivel") or "").strip(),
-        "updated_at": _now_iso(),
-    }
+def _fuel_patch(b, base):
+    patch = _fuel_fields(b)
+    patch["updated_at"] = _now_iso()
 
     # limpa strings vazias e None
     clean = {}
@@ -288,26 +462,104 @@ def fuel_update(id):
                 clean[k] = v
 
     # recalcula valor_total quando litros/preço mudarem
-    base = snap.to_dict() or {}
     if "litros" in clean or "preco_litro" in clean:
         litros = clean.get("litros", base.get("litros", 0))
         preco = clean.get("preco_litro", base.get("preco_litro", 0))
         clean.setdefault("valor_total", round(float(litros) * float(preco or 0), 2))
+    return clean
+
+
+@fleet_bp.post("/fleet/fuel-logs")
+def fuel_create():
+    db = get_db()
+    b = request.get_json(force=True) or {}
+    data = _new_fuel_log(db, b)
+    doc_id = fleet_stats.create_log(data)
+    fuel_text_index.upsert(doc_id, data)
+    fuel_analytics.upsert(doc_id, data)
+    return jsonify({**data, "id": doc_id}), 201
+
+
+@fleet_bp.put("/fleet/fuel-logs/<id>")
+def fuel_update(id):
+    db = get_db()
+    ref = db.collection(COL_FUEL_LOGS).document(id)
+    snap = _read(ref, COL_FUEL_LOGS)
+    if not snap.exists:
+        return jsonify({"error": "Registro não encontrado"}), 404
 
-    ref.update(clean)
-    return jsonify(_doc(ref.get())), 200
+    b = request.get_json(force=True) or {}
+    clean = _fuel_patch(b, snap.to_dict() or {})
+    saved = fleet_stats.update_log(id, clean)
+    if saved is None:
+        return jsonify({"error": "Registro não encontrado"}), 404
+    fuel_text_index.upsert(id, clean)
+    fuel_analytics.upsert(id, saved)
+    return jsonify(saved), 200
+
+
+@fleet_bp.post("/fleet/fuel-logs/bulk")
+def fuel_bulk():
+    """Mesmas regras do POST/PUT; delete ignora ids inexistentes."""
+    creates, updates, deletes, err = parse_bulk_body(request.get_json(force=True, silent=True))
+    if err:
+        return err
+    db = get_db()
+    result = BulkResult()
+
+    memo = {}
+    new_logs = [_new_fuel_log(db, b, memo) for _, b in split_creates(creates, result)]
+    result.created = fs.add_documents(COL_FUEL_LOGS, new_logs)
+    changes = []  # (id, antes, depois) para os stats por veículo
+    for doc_id, data in zip(result.created, new_logs):
+        fuel_text_index.upsert(doc_id, data)
+        fuel_analytics.upsert(doc_id, data)
+        changes.append((doc_id, None, data))
+
+    bases = fs.get_documents(COL_FUEL_LOGS, [doc_id for doc_id, _ in updates] + list(deletes))
+    patches = [(doc_id, _fuel_patch(b, bases[doc_id])) for _, doc_id, b in split_existing(updates, bases, result)]
+    result.updated = fs.update_documents(COL_FUEL_LOGS, patches)
+    for doc_id, patch in patches:
+        fuel_text_index.upsert(doc_id, patch)
+        fuel_analytics.upsert(doc_id, {**bases[doc_id], **patch})
+        changes.append((doc_id, bases[doc_id], {**bases[doc_id], **patch}))
+
+    result.deleted = fs.delete_documents(COL_FUEL_LOGS, deletes)
+    for doc_id in deletes:
+        fuel_text_index.remove(doc_id)
+        fuel_analytics.remove(doc_id)
+        if doc_id in bases:
+            changes.append((doc_id, bases[doc_id], None))
+    fleet_stats.apply_changes(changes)
+    return result.response()
 
 
 @fleet_bp.delete("/fleet/fuel-logs/<id>")
 def fuel_delete(id):
-    db = _get_db()
-    ref = db.collection(COL_FUEL_LOGS).document(id)
-    if not ref.get().exists:
+    if not fleet_stats.delete_log(id):
         return jsonify({"error": "Registro não encontrado"}), 404
-    ref.delete()
+    fuel_text_index.remove(id)
+    fuel_analytics.remove(id)
     return ("", 204)
 
 
+@fleet_bp.get("/fleet/analytics")
+def fleet_analytics():
+    """
+    Consumo (km/l, custo por km) por veículo e anomalias dos abastecimentos:
+    odômetro que volta, preço/litro fora da curva do combustível e
+    valor_total diferente de litros * preço. Filtros: placa, de, ate.
+    Calculado sobre as colunas em cache e memorizado até a próxima escrita.
+    """
+    args = request.args
+    placa = (args.get("placa") or "").upper().strip() or None
+    de, ate = _normalize_date(args.get("de")), _normalize_date(args.get("ate"))
+    for value in (de, ate):
+        if value and not _is_ymd(value):
+            return jsonify({"error": "de/ate devem ser datas (AAAA-MM-DD ou DD/MM/AAAA)"}), 400
+    return jsonify(fuel_analytics.analytics(placa, de or None, ate or None)), 200
+
+
 @fleet_bp.get("/fleet/health")
 def fleet_health():
     return jsonify({"ok": True, "module": "fleet"}), 200
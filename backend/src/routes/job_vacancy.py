@@ -2,6 +2,7 @@
 from flask import Blueprint, request, jsonify
 from src.models import JobVacancy
 from src.middleware.auth_middleware import require_admin, require_supervisor, roles_allowed
+from src.routes.pagination import page_args, page_response
 
 job_vacancy_bp = Blueprint("job_vacancy_bp", __name__)
 
@@ -17,6 +18,9 @@ def create_job_vacancy():
 @job_vacancy_bp.route("/job-vacancies", methods=["GET"])
 @roles_allowed('admin', 'supervisor')
 def get_all_job_vacancies():
+    limit, cursor = page_args(request.args)
+    if limit:
+        return page_response(*JobVacancy.get_page(limit, cursor))
     job_vacancies = JobVacancy.get_all()
     return jsonify(job_vacancies), 200
 
@@ -1,57 +1,67 @@
 # backend/src/routes/metrics.py
-from collections import defaultdict
-from flask import Blueprint, jsonify
-from src.services.firestore_service import get_db
+from flask import Blueprint, jsonify, request
+from src.services.firestore_service import cache_stats
+from src.services.firestore_metrics import snapshot
+from src.services import action_metrics
+from src.services.user_service import auth_cache_stats
+from src.services import password_hasher
+from src.services.schedule_index import schedule_index
+from src.services.finance_summary import finance_columns
+from src.services.fuel_text_index import fuel_text_index
+from src.services.fuel_analytics import fuel_analytics
+from src.middleware.auth_middleware import roles_allowed
 
 metrics_bp = Blueprint("metrics", __name__)
 
-# Ajuste estes aliases conforme os valores reais que você grava no campo (service_type/type/category)
-ALIASES = {
-    "Panfletagem Residencial": {"residencial", "panfletagem", "panfletagem_residencial"},
-    "Sinaleiros/Pedestres": {"sinaleiros", "pedestres", "sinaleiro"},
-    "Eventos Estratégicos": {"eventos", "evento", "estrategicos", "eventos_estrategicos"},
-    "Ações Promocionais": {"promocionais", "acao_promocional", "ações", "promocoes", "acoes_promocionais"},
-}
-
-DEFAULT_LABELS = [
-    "Panfletagem Residencial",
-    "Sinaleiros/Pedestres",
-    "Eventos Estratégicos",
-    "Ações Promocionais",
-]
-
-def _normalize(raw: str) -> str:
-    if not raw:
-        return "Outros"
-    r = str(raw).strip().lower()
-    for label, keys in ALIASES.items():
-        if r in keys:
-            return label
-    return "Outros"
-
 @metrics_bp.get("/services/distribution")
+@metrics_bp.get("/service-distribution")
 def services_distribution():
     """
-    Retorna contagem por tipo de serviço.
-    Busca documentos na coleção 'actions' (ajuste se o seu estiver em outra).
-    Considera os campos: 'service_type' (preferência), senão 'type' ou 'category'.
+    Retorna contagem por tipo de serviço (labels de action_metrics.ALIASES).
+    Lê o documento de contadores mantido pelo modelo Action: uma leitura,
+    independente do tamanho de 'actions'.
     """
-    db = get_db()
+    return jsonify(action_metrics.distribution())
+
 
-    # Altere 'actions' se sua coleção for outra (ex.: 'campaigns')
-    col = db.collection("actions")
+@metrics_bp.get("/monthly-campaigns")
+def monthly_campaigns():
+    """
+    Ações por mês (mês do start_date) nos últimos ?months=N meses (padrão 6,
+    máx. 36), do mais antigo para o atual: total, por status, por tipo e
+    soma de material_qty. Lê um rollup por mês, não o histórico.
+    """
+    try:
+        months = int(request.args.get("months", 6))
+    except ValueError:
+        return jsonify({"message": "months deve ser um inteiro"}), 400
+    if months < 1:
+        return jsonify({"message": "months deve ser >= 1"}), 400
+    return jsonify(action_metrics.monthly(months))
 
-    # Suporte Firestore e memory_db
-    docs = col.stream() if hasattr(col, "stream") else col.get()
 
-    counts = defaultdict(int)
-    for doc in docs:
-        data = doc.to_dict() if hasattr(doc, "to_dict") else doc
-        label = _normalize(data.get("service_type") or data.get("type") or data.get("category"))
-        counts[label] += 1
+@metrics_bp.get("/cache")
+@roles_allowed("admin")
+def document_cache_stats():
+    """Hits/misses do cache de leitura do firestore_service e do cache de autenticação (deste worker)."""
+    stats = cache_stats()
+    stats["auth_users"] = auth_cache_stats()
+    return jsonify(stats)
 
-    # Garante as labels principais
-    for label in DEFAULT_LABELS:
-        counts[label] += 0
 
-    return jsonify(dict(counts))
+@metrics_bp.get("/internal")
+@roles_allowed("admin")
+def internal_metrics():
+    """
+    Custo de Firestore deste worker: histogramas de latência por operação/coleção,
+    leituras/escritas por endpoint (ordenado por leituras) e o cache de leitura.
+    """
+    data = snapshot()
+    data["cache"] = cache_stats()
+    data["cache"]["auth_users"] = auth_cache_stats()
+    data["bcrypt"] = password_hasher.stats()
+    data["schedule_index"] = schedule_index.stats()
+    data["finance_columns"] = finance_columns.stats()
+    data["fuel_text_index"] = fuel_text_index.stats()
+    data["fuel_analytics"] = fuel_analytics.stats()
+    return jsonify(data)
@@ -0,0 +1,38 @@
+# backend/src/routes/pagination.py
+# Helpers de paginação por cursor (?limit=&cursor=) compartilhados pelas rotas de listagem.
+# Sem ?limit e sem ?cursor as rotas mantêm o formato antigo (lista completa).
+
+from flask import jsonify
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+def page_args(args, default_limit: int = DEFAULT_LIMIT, max_limit: int = MAX_LIMIT):
+    """
+    Lê ?limit= e ?cursor= da querystring.
+    Retorna (limit, cursor), ou (None, None) quando a chamada não é paginada.
+    """
+    raw_limit = (args.get("limit") or "").strip()
+    cursor = (args.get("cursor") or "").strip() or None
+    if not raw_limit and not cursor:
+        return None, None
+    try:
+        limit = int(raw_limit) if raw_limit else default_limit
+    except ValueError:
+        limit = default_limit
+    limit = max(1, min(limit, max_limit))
+    return limit, cursor
+
+
+def page_response(items, next_cursor, status: int = 200, total: int = None):
+    """
+    Envelope padrão de página: {"items": [...], "next_cursor": "..."|null}.
+    total (opcional): contagem de todos os itens da consulta, também em X-Total-Count.
+    """
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    body = {"items": items, "next_cursor": next_cursor}
+    if total is not None:
+        body["total"] = total
+        headers["X-Total-Count"] = str(total)
+    return jsonify(body), status, headers
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from src.services.user_service import create_user, get_user_by_id, find_user_by_username, update_user, delete_user, get_all_users
+from src.services.user_service import create_user, get_user_by_id, find_user_by_username, update_user, delete_user, get_all_users, PasswordHasherBusy
 from src.middleware.auth_middleware import require_admin, roles_allowed
 
 user_bp = Blueprint('user_bp', __name__)
@@ -15,6 +15,8 @@ def add_user():
         return jsonify(user), 201
     except ValueError as e:
         return jsonify({'message': str(e)}), 409 # Conflict
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         return jsonify({'message': f'Erro ao criar usuário: {str(e)}'}), 500
 
@@ -42,6 +44,10 @@ def update_single_user(user_id):
         if update_user(user_id, data):
             return jsonify({'message': 'Usuário atualizado com sucesso'}), 200
         return jsonify({'message': 'Usuário não encontrado ou nada para atualizar'}), 404
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 409 # Conflict
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
         return jsonify({'message': f'Erro ao atualizar usuário: {str(e)}'}), 500
 
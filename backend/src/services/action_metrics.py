@@ -0,0 +1,313 @@
+# backend/src/services/action_metrics.py
+"""
+Métricas de ações materializadas (o dashboard não varre "actions").
+
+_meta/actions_by_service = {"counts": {label: n}, "rebuilt_at"}
+actions_monthly/<YYYY-MM> = {"month", "total", "by_status": {status: n},
+                             "by_type": {tipo: n}, "material_qty"}
+O mês de uma ação é o do start_date; ação com vários tipos conta em cada
+um deles em by_type (e uma vez em total).
+
+O modelo Action aplica Increment(+/-) nos contadores afetados a cada
+create/update/delete (na mesma transação da escrita, nas operações
+unitárias; numa escrita logo depois, nas em lote). O dashboard lê um
+documento (distribuição) ou um por mês (rollups).
+
+rebuild() recalcula tudo a partir de "actions" (corrige desvio de
+escritas feitas fora do modelo ou de lotes que falharam no meio).
+Rodar periodicamente, ex. cron diário:
+
+    cd backend && python -m src.services.action_metrics
+
+Incrementos concorrentes com o rebuild podem se perder; rode fora do
+horário de uso. Por isso as leituras nunca recalculam: numa base que ainda
+não passou pelo backfill (python -m src.migrations backfill action_metrics)
+o dashboard mostra só o que os incrementos já contaram, com um aviso no log.
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import date
+
+from google.cloud.firestore_v1 import Increment
+
+from .firestore_service import get_db, get_documents, invalidate_cache, BATCH_LIMIT, _server_ts
+from .firestore_metrics import track, READ, WRITE
+
+log = logging.getLogger(__name__)
+
+ACTIONS = "actions"
+META = "_meta"
+COUNTERS = "actions_by_service"
+MONTHLY = "actions_monthly"
+MAX_MONTHS = 36
+
+_STATUSES = {"aguardando", "andamento", "concluido"}
+
+# Ajuste estes aliases conforme os valores reais que você grava no campo (service_type/type/category)
+ALIASES = {
+    "Panfletagem Residencial": {"residencial", "panfletagem", "panfletagem_residencial"},
+    "Sinaleiros/Pedestres": {"sinaleiros", "pedestres", "sinaleiro"},
+    "Eventos Estratégicos": {"eventos", "evento", "estrategicos", "eventos_estrategicos"},
+    "Ações Promocionais": {"promocionais", "acao_promocional", "ações", "promocoes", "acoes_promocionais"},
+}
+
+DEFAULT_LABELS = [
+    "Panfletagem Residencial",
+    "Sinaleiros/Pedestres",
+    "Eventos Estratégicos",
+    "Ações Promocionais",
+]
+
+# aviso de "sem rebuild" já dado neste processo
+_warned = False
+
+# alias -> label (uma consulta de dict em vez de percorrer ALIASES)
+_LABEL_BY_ALIAS = {alias: label for label, keys in ALIASES.items() for alias in keys}
+
+
+def service_label(raw) -> str:
+    if not raw:
+        return "Outros"
+    return _LABEL_BY_ALIAS.get(str(raw).strip().lower(), "Outros")
+
+
+def label_for(doc: dict) -> str:
+    """
+    Label da ação: 'service_type' (preferência), senão 'type' (ou 'types',
+    no formato canônico) ou 'category'.
+    """
+    raw = doc.get("service_type") or doc.get("type") or ", ".join(doc.get("types") or []) or doc.get("category")
+    return service_label(raw)
+
+
+def month_of(doc: dict):
+    """'YYYY-MM' do início da ação (None sem data)."""
+    raw = doc.get("start_date") or doc.get("start_datetime")
+    if isinstance(raw, str) and len(raw) >= 7 and raw[4] == "-":
+        return raw[:7]
+    return None
+
+
+def _status(doc: dict) -> str:
+    s = str(doc.get("status") or "aguardando").strip().lower()
+    return s if s in _STATUSES else "aguardando"
+
+
+def _types(doc: dict):
+    types = doc.get("types")
+    if types is None:
+        types = str(doc.get("type") or doc.get("action_type") or "").split(",")
+    return {str(t).strip() for t in types if str(t).strip()}
+
+
+def _material_qty(doc: dict) -> int:
+    qty = doc.get("material_qty")
+    if qty is None:
+        qty = doc.get("material_quantity")
+    try:
+        return int(float(qty or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _add_deltas(deltas, doc: dict, sign: int):
+    deltas[(META, COUNTERS)][("counts", label_for(doc))] += sign
+    month = month_of(doc)
+    if not month:
+        return
+    rollup = deltas[(MONTHLY, month)]
+    rollup[("total",)] += sign
+    rollup[("by_status", _status(doc))] += sign
+    for t in _types(doc):
+        rollup[("by_type", t)] += sign
+    qty = _material_qty(doc)
+    if qty:
+        rollup[("material_qty",)] += sign * qty
+
+
+def changes(pairs, deltas=None):
+    """
+    pairs: [(antes, depois)] com None para "não existe".
+    Retorna {(coleção, doc_id): Counter({caminho: variação})}.
+    """
+    deltas = deltas if deltas is not None else defaultdict(Counter)
+    for old, new in pairs:
+        if old is not None:
+            _add_deltas(deltas, old, -1)
+        if new is not None:
+            _add_deltas(deltas, new, +1)
+    return deltas
+
+
+def _payload(collection: str, doc_id: str, counter: Counter):
+    """set(merge=True) com Increment em cada caminho alterado (None se nada mudou)."""
+    out = {}
+    for path, n in counter.items():
+        if not n:
+            continue
+        node = out
+        for part in path[:-1]:
+            node = node.setdefault(part, {})
+        node[path[-1]] = Increment(n)
+    if not out:
+        return None
+    if collection == MONTHLY:
+        out["month"] = doc_id
+    return out
+
+
+def counter_writes(db, old=None, new=None):
+    """[(ref, payload)] para aplicar numa transação: tx.set(ref, payload, merge=True)."""
+    out = []
+    for (collection, doc_id), counter in changes([(old, new)]).items():
+        payload = _payload(collection, doc_id, counter)
+        if payload:
+            out.append((db.collection(collection).document(doc_id), payload))
+    return out
+
+
+def apply_changes(pairs):
+    """Aplica as variações de várias ações de uma vez (operações em lote)."""
+    db = get_db()
+    writes = []
+    for (collection, doc_id), counter in changes(pairs).items():
+        payload = _payload(collection, doc_id, counter)
+        if payload:
+            writes.append((db.collection(collection).document(doc_id), payload))
+    for i in range(0, len(writes), BATCH_LIMIT):
+        batch = db.batch()
+        for ref, payload in writes[i:i + BATCH_LIMIT]:
+            batch.set(ref, payload, merge=True)
+        with track(WRITE, META, docs=len(writes[i:i + BATCH_LIMIT])):
+            batch.commit()
+
+
+def rebuild() -> dict:
+    """
+    Recalcula a distribuição e os rollups mensais a partir da coleção
+    inteira (meses que ficaram sem ações são apagados). Retorna as contagens
+    da distribuição.
+    """
+    db = get_db()
+    deltas = defaultdict(Counter)
+    with track(READ, ACTIONS) as op:
+        n = 0
+        for snap in db.collection(ACTIONS).stream():
+            _add_deltas(deltas, snap.to_dict() or {}, +1)
+            n += 1
+        op.docs = n
+    with track(READ, MONTHLY) as op:
+        stale = [s.id for s in db.collection(MONTHLY).stream()]
+        op.docs = len(stale)
+
+    counts = {path[1]: v for path, v in deltas.pop((META, COUNTERS), Counter()).items() if v}
+    ops = [(counters_ref(db), {"counts": counts, "rebuilt_at": _server_ts()}, False)]
+    months = {}
+    for (_, month), counter in deltas.items():
+        doc = {"month": month, "total": 0, "by_status": {}, "by_type": {}, "material_qty": 0}
+        for path, v in counter.items():
+            if len(path) == 1:
+                doc[path[0]] = v
+            else:
+                doc[path[0]][path[1]] = v
+        months[month] = doc
+        ops.append((db.collection(MONTHLY).document(month), doc, False))
+    ops.extend((db.collection(MONTHLY).document(m), None, True) for m in stale if m not in months)
+
+    for i in range(0, len(ops), BATCH_LIMIT):
+        batch = db.batch()
+        chunk = ops[i:i + BATCH_LIMIT]
+        for ref, data, delete in chunk:
+            if delete:
+                batch.delete(ref)
+            else:
+                batch.set(ref, data)
+        with track(WRITE, META, docs=len(chunk)):
+            batch.commit()
+    invalidate_cache(META, COUNTERS)
+    invalidate_cache(MONTHLY)
+    log.info("métricas de ações recalculadas: %d ações, %d meses", n, len(months))
+    return counts
+
+
+def counters_ref(db):
+    return db.collection(META).document(COUNTERS)
+
+
+def _read_counters():
+    """
+    (contagens da distribuição, já houve rebuild). Sem rebuild, os
+    incrementos podem ter criado o documento sem as ações antigas.
+    """
+    with track(READ, META):
+        snap = counters_ref(get_db()).get()
+    data = (snap.to_dict() or {}) if snap.exists else {}
+    return data.get("counts") or {}, bool(data.get("rebuilt_at"))
+
+
+def ensure_built() -> bool:
+    """Primeiro rebuild (backfill da CLI: python -m src.migrations backfill)."""
+    if _read_counters()[1]:
+        return False
+    rebuild()
+    return True
+
+
+def distribution() -> dict:
+    """
+    Contagem por label para o dashboard: uma leitura. Sem rebuild anterior
+    (base anterior aos contadores), usa o que houver e avisa no log.
+    """
+    global _warned
+    counts, built = _read_counters()
+    if not built and not _warned:
+        _warned = True
+        log.warning("métricas de ações sem rebuild: rode python -m src.migrations backfill action_metrics")
+    out = {label: int(n) for label, n in counts.items() if n > 0}
+    # Garante as labels principais
+    for label in DEFAULT_LABELS:
+        out.setdefault(label, 0)
+    return out
+
+
+def last_months(n: int, today: date = None):
+    """['YYYY-MM', ...] dos n meses até o atual (mais antigo primeiro)."""
+    today = today or date.today()
+    y, m = today.year, today.month
+    out = []
+    for _ in range(n):
+        out.append(f"{y:04d}-{m:02d}")
+        y, m = (y - 1, 12) if m == 1 else (y, m - 1)
+    return out[::-1]
+
+
+def monthly(months: int = 6) -> list:
+    """
+    Rollups dos últimos `months` meses (mais antigo primeiro), com zeros
+    nos meses sem ação: uma leitura por mês, independente do histórico.
+    """
+    months = max(1, min(int(months), MAX_MONTHS))
+    keys = last_months(months)
+    docs = get_documents(MONTHLY, keys)
+    out = []
+    for key in keys:
+        doc = docs.get(key) or {}
+        out.append({
+            "month": key,
+            "campaigns": int(doc.get("total") or 0),
+            "by_status": {k: int(v) for k, v in (doc.get("by_status") or {}).items() if v},
+            "by_type": {k: int(v) for k, v in (doc.get("by_type") or {}).items() if v},
+            "material_qty": int(doc.get("material_qty") or 0),
+        })
+    return out
+
+
+if __name__ == "__main__":
+    import json
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print(json.dumps(rebuild(), indent=2, ensure_ascii=False))
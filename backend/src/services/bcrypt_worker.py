@@ -0,0 +1,25 @@
+# backend/src/services/bcrypt_worker.py
+"""
+Funções executadas nos processos do pool do bcrypt (password_hasher).
+
+Módulo sem dependências do app: ao desserializar a tarefa, o processo
+filho importa só isto (e bcrypt), nunca src.main.
+"""
+import os
+
+import bcrypt
+
+
+def hashpw(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def checkpw(password: str, password_hash: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+    except Exception:
+        return False
+
+
+def ping() -> int:
+    return os.getpid()
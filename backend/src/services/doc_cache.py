@@ -0,0 +1,165 @@
+# backend/src/services/doc_cache.py
+"""
+Cache de leitura (por processo) na frente do firestore_service.
+
+- LRU + TTL configuráveis por coleção
+- Invalidação explícita nas escritas (add/update/delete)
+- Contadores de hit/miss/evictions por coleção
+
+Configuração via env:
+  FIRESTORE_CACHE          -> "colecao:ttl_segundos:max_itens,..."
+                              (ex.: "users:30:500,clients:120:2000")
+  FIRESTORE_CACHE_DISABLED -> "1"/"true" desliga o cache
+Cada worker do gunicorn tem o seu cache; escritas feitas em outro worker
+só aparecem aqui depois do TTL, por isso os TTLs padrão são curtos.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# coleção -> (ttl em segundos, máximo de entradas)
+DEFAULT_CONFIG = {
+    "users": (30, 500),
+    "clients": (120, 2000),
+    "fleet_vehicles": (300, 500),
+}
+
+# chave usada para o resultado de get_all_documents(colecao)
+ALL_KEY = "__all__"
+
+MISSING = object()
+
+
+def _parse_config(raw: str) -> dict:
+    """
+    "users:30:500,clients:120" -> {"users": (30, 500), "clients": (120, 1000)}
+    Entradas inválidas são ignoradas; ttl 0 desliga o cache da coleção.
+    """
+    out = {}
+    for part in (raw or "").split(","):
+        bits = [b.strip() for b in part.split(":")]
+        if not bits or not bits[0]:
+            continue
+        try:
+            ttl = float(bits[1]) if len(bits) > 1 and bits[1] else 60.0
+            size = int(bits[2]) if len(bits) > 2 and bits[2] else 1000
+        except ValueError:
+            continue
+        out[bits[0]] = (ttl, size)
+    return out
+
+
+class LRUCache:
+    """LRU com expiração por TTL. Thread-safe."""
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = float(ttl)
+        self.maxsize = int(maxsize)
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is MISSING or item[0] <= now:
+                if item is not MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class DocumentCache:
+    """
+    Um LRUCache por coleção configurada. Coleções fora da configuração
+    não são cacheadas (get retorna sempre "miss" sem contar).
+    """
+
+    def __init__(self, config: dict, enabled: bool = True):
+        self.enabled = enabled
+        self._caches = {name: LRUCache(ttl, size) for name, (ttl, size) in config.items()}
+
+    def cached(self, collection: str) -> bool:
+        return self.enabled and collection in self._caches
+
+    def get(self, collection: str, key: str):
+        """Retorna o valor ou MISSING."""
+        if not self.cached(collection):
+            return MISSING
+        return self._caches[collection].get(key, MISSING)
+
+    def set(self, collection: str, key: str, value):
+        if self.cached(collection):
+            self._caches[collection].set(key, value)
+
+    def invalidate(self, collection: str, doc_id: str = None):
+        """
+        Remove o documento e a listagem da coleção.
+        Sem doc_id, limpa a coleção inteira.
+        """
+        cache = self._caches.get(collection)
+        if cache is None:
+            return
+        if doc_id is None:
+            cache.clear()
+            return
+        cache.pop(doc_id)
+        cache.pop(ALL_KEY)
+
+    def clear(self):
+        for cache in self._caches.values():
+            cache.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "collections": {name: c.stats() for name, c in self._caches.items()},
+        }
+
+
+def _build_from_env() -> DocumentCache:
+    disabled = os.getenv("FIRESTORE_CACHE_DISABLED", "").strip().lower() in ("1", "true", "yes")
+    config = dict(DEFAULT_CONFIG)
+    config.update(_parse_config(os.getenv("FIRESTORE_CACHE", "")))
+    config = {k: v for k, v in config.items() if v[0] > 0 and v[1] > 0}
+    return DocumentCache(config, enabled=not disabled)
+
+
+# Instância global (por processo)
+doc_cache = _build_from_env()
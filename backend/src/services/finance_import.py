@@ -0,0 +1,286 @@
+# backend/src/services/finance_import.py
+"""
+Importação de extratos (CSV/OFX) para finance_transactions.
+
+O arquivo é lido em streaming (linha a linha no CSV, em blocos no OFX) e
+gravado em WriteBatches de CHUNK_ROWS linhas: a memória fica limitada a um
+lote, qualquer que seja o tamanho do extrato.
+
+O andamento fica em finance_import_jobs/<job_id> (qualquer worker responde
+a consulta de progresso):
+    {"status": "running"|"done"|"failed", "format", "filename",
+     "bytes_total", "bytes_read", "rows", "created", "error_count",
+     "errors": [{"row", "error"}] (até MAX_ERRORS), "started_at", "finished_at",
+     "updated_at"}
+
+updated_at é renovado a cada gravação de progresso (no máximo a cada
+HEARTBEAT_S, mesmo só com linhas inválidas); get_job marca "stale": True no
+job "running" sem sinal há mais de STALE_AFTER_S (worker morto no meio).
+Se um lote falha depois de outros já gravados, o job "failed" traz em
+"partial_ids" os ids da rodada que ficaram gravados ("created" os inclui).
+
+A normalização de cada linha (datas, valores em BRL, tipo/status) é a
+mesma do POST /api/transactions; a rota passa a função em run_import().
+"""
+import io
+import os
+import re
+import csv
+import codecs
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+
+from .firestore_service import (
+    get_db, add_documents, PartialWriteError, BATCH_LIMIT, BATCH_WORKERS, _server_ts,
+)
+from .firestore_metrics import track, READ, WRITE
+
+log = logging.getLogger(__name__)
+
+COLLECTION = "finance_transactions"
+JOBS = "finance_import_jobs"
+FORMATS = ("csv", "ofx")
+# linhas por rodada de escrita: BATCH_WORKERS lotes comitados em paralelo
+CHUNK_ROWS = BATCH_LIMIT * max(1, BATCH_WORKERS)
+MAX_ERRORS = 200
+HEARTBEAT_S = 15
+STALE_AFTER_S = 120
+_READ_SIZE = 64 * 1024
+
+# cabeçalhos comuns de extrato -> chaves aceitas por _normalize_payload
+_CSV_ALIASES = {
+    "data": "date",
+    "data lançamento": "date",
+    "data lancamento": "date",
+    "vencimento": "due_date",
+    "descrição": "notes",
+    "descricao": "notes",
+    "histórico": "notes",
+    "historico": "notes",
+    "lançamento": "notes",
+    "lancamento": "notes",
+    "valor (r$)": "valor",
+}
+
+
+# ---------------------------
+# Leitura
+# ---------------------------
+def detect_format(head: bytes, filename: str = "") -> str:
+    """'ofx' pelo cabeçalho/extensão, senão 'csv'."""
+    name = (filename or "").lower()
+    if name.endswith(".ofx") or b"OFXHEADER" in head[:512] or b"<OFX>" in head.upper():
+        return "ofx"
+    return "csv"
+
+
+def _csv_key(header: str) -> str:
+    key = " ".join(str(header or "").split()).lower()
+    return _CSV_ALIASES.get(key, key)
+
+
+def iter_csv(stream, encoding: str = "utf-8-sig"):
+    """
+    Linhas do CSV como dicts (cabeçalho na primeira linha). Detecta ';', ','
+    ou tab como separador. Linhas vazias são puladas.
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, errors="replace", newline="")
+    sample = text.read(4096)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+    except csv.Error:
+        dialect = csv.excel
+    text.seek(0)
+    try:
+        reader = csv.reader(text, dialect)
+        header = next(reader, None)
+        if not header:
+            return
+        keys = [_csv_key(h) for h in header]
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            yield {k: v.strip() for k, v in zip(keys, row) if k}
+    finally:
+        text.detach()  # não fecha o arquivo de quem chamou
+
+
+_OFX_DATE = re.compile(r"^(\d{4})(\d{2})(\d{2})")
+
+
+def _ofx_tags(stream, encoding: str = "cp1252"):
+    """(TAG, valor) de um OFX 1.x (SGML) ou 2.x (XML), lido em blocos de _READ_SIZE."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buf = ""
+    while True:
+        chunk = stream.read(_READ_SIZE)
+        buf += decoder.decode(chunk, final=not chunk)
+        parts = buf.split("<")
+        # o último pedaço pode estar cortado no meio: fica para o próximo bloco
+        buf = parts.pop() if chunk else ""
+        for part in parts:
+            tag, sep, value = part.partition(">")
+            if sep:
+                yield tag.strip().upper(), value.strip()
+        if not chunk:
+            return
+
+
+def iter_ofx(stream):
+    """
+    Transações (<STMTTRN>) do OFX como payloads da rota de finance:
+    date (DTPOSTED), valor (TRNAMT, já numérico), notes (MEMO ou NAME).
+    """
+    cur = None
+    for tag, value in _ofx_tags(stream):
+        if tag in ("STMTTRN", "/STMTTRN", "/BANKTRANLIST"):
+            # SGML tolera </STMTTRN> ausente: a próxima transação fecha a anterior
+            if cur:
+                yield _ofx_payload(cur)
+            cur = {} if tag == "STMTTRN" else None
+        elif cur is not None and not tag.startswith("/"):
+            cur[tag] = value
+
+
+def _ofx_payload(trn: dict) -> dict:
+    m = _OFX_DATE.match(trn.get("DTPOSTED") or trn.get("DTUSER") or "")
+    raw = (trn.get("TRNAMT") or "").replace(",", ".")
+    try:
+        amount = float(raw)
+    except ValueError:
+        amount = raw  # texto cru: o normalizador da rota (_import_row) devolve erro de linha
+    return {
+        "date": f"{m.group(1)}-{m.group(2)}-{m.group(3)}" if m else "",
+        "valor": amount,
+        "notes": trn.get("MEMO") or trn.get("NAME") or "",
+    }
+
+
+def iter_rows(stream, fmt: str):
+    return iter_ofx(stream) if fmt == "ofx" else iter_csv(stream)
+
+
+# ---------------------------
+# Jobs
+# ---------------------------
+def _job_ref(job_id):
+    return get_db().collection(JOBS).document(job_id)
+
+
+def create_job(fmt: str, filename: str, bytes_total: int) -> str:
+    ref = get_db().collection(JOBS).document()
+    with track(WRITE, JOBS):
+        ref.set({
+            "status": "running",
+            "format": fmt,
+            "filename": filename or "",
+            "bytes_total": bytes_total,
+            "bytes_read": 0,
+            "rows": 0,
+            "created": 0,
+            "error_count": 0,
+            "errors": [],
+            "started_at": _server_ts(),
+            "updated_at": _server_ts(),
+            "finished_at": None,
+        })
+    return ref.id
+
+
+def get_job(job_id: str):
+    with track(READ, JOBS):
+        snap = _job_ref(job_id).get()
+    if not snap.exists:
+        return None
+    data = snap.to_dict() or {}
+    data["id"] = snap.id
+    total = data.get("bytes_total") or 0
+    data["progress"] = round(min(1.0, (data.get("bytes_read") or 0) / total), 4) if total else None
+    data["stale"] = data.get("status") == "running" and _age_s(data.get("updated_at")) > STALE_AFTER_S
+    return data
+
+
+def _age_s(ts) -> float:
+    """Segundos desde ts (datetime do Firestore); 0 se ausente/ilegível."""
+    if not isinstance(ts, datetime):
+        return 0.0
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - ts).total_seconds()
+
+
+def _save(job_id, data):
+    with track(WRITE, JOBS):
+        _job_ref(job_id).set(dict(data, updated_at=_server_ts()), merge=True)
+
+
+def run_import(job_id: str, path: str, fmt: str, normalize, on_created=None):
+    """
+    Lê o arquivo em `path`, normaliza cada linha com normalize(payload)
+    (retorna (dados, None) ou (None, mensagem de erro)) e grava em lotes.
+    on_created(doc_id, dados) é chamado para cada doc criado. Apaga o
+    arquivo no fim e marca o job como done/failed.
+    """
+    state = {"rows": 0, "created": 0, "error_count": 0, "errors": []}
+    pending = []
+    last_save = [time.monotonic()]
+
+    def created(ids, items):
+        if on_created:
+            for doc_id, data in zip(ids, items):
+                on_created(doc_id, data)
+        state["created"] += len(ids)
+
+    def flush(fh):
+        if pending:
+            try:
+                ids = add_documents(COLLECTION, pending)
+            except PartialWriteError as e:
+                # lotes paralelos já gravados continuam no banco: conta e registra
+                created(e.ids, [pending[j] for j in e.committed])
+                state["partial_ids"] = e.ids
+                raise
+            created(ids, pending)
+            pending.clear()
+        _save(job_id, dict(state, bytes_read=fh.tell()))
+        last_save[0] = time.monotonic()
+
+    try:
+        with open(path, "rb") as fh:
+            for n, payload in enumerate(iter_rows(fh, fmt), start=1):
+                state["rows"] = n
+                if time.monotonic() - last_save[0] >= HEARTBEAT_S:
+                    _save(job_id, dict(state, bytes_read=fh.tell()))
+                    last_save[0] = time.monotonic()
+                data, error = normalize(payload)
+                if error:
+                    state["error_count"] += 1
+                    if len(state["errors"]) < MAX_ERRORS:
+                        state["errors"].append({"row": n, "error": error})
+                    continue
+                pending.append(data)
+                if len(pending) >= CHUNK_ROWS:
+                    flush(fh)
+            flush(fh)
+        _save(job_id, {"status": "done", "finished_at": _server_ts()})
+    except Exception as e:
+        log.exception("importação %s falhou", job_id)
+        _save(job_id, dict(state, status="failed", failure=str(e)[:500], finished_at=_server_ts()))
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def run_import_async(job_id, path, fmt, normalize, on_created=None):
+    """run_import em thread daemon (a requisição responde 202 na hora)."""
+    t = threading.Thread(
+        target=run_import, args=(job_id, path, fmt, normalize, on_created),
+        name=f"finance-import-{job_id}", daemon=True,
+    )
+    t.start()
+    return t
+
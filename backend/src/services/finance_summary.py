@@ -0,0 +1,260 @@
+# backend/src/services/finance_summary.py
+"""
+Resumo financeiro (entradas, saídas, despesas, saldos pago/pendente)
+calculado no servidor sobre colunas NumPy em cache.
+
+Cada worker guarda finance_transactions em colunas (data como inteiro
+YYYYMMDD, valor, tipo, status e categoria codificados) e agrega com
+máscaras + bincount, sem montar dicts por transação a cada requisição.
+As rotas de finance chamam upsert()/remove() depois de cada escrita, então
+o resumo deste worker fica em dia na hora; escritas feitas em outro
+worker aparecem quando as colunas são recarregadas, a cada
+FINANCE_SUMMARY_TTL segundos (padrão 300; 0 = nunca expira).
+
+Totais ignoram transações "Cancelado" (elas aparecem só em by_status).
+"""
+import os
+import time
+import threading
+
+import numpy as np
+
+from .firestore_service import get_all_documents
+
+COLLECTION = "finance_transactions"
+TTL_S = float(os.getenv("FINANCE_SUMMARY_TTL", "300"))
+
+TYPES = ("entrada", "saida", "despesa")
+STATUSES = ("Pago", "Pendente", "Cancelado")
+GROUP_BY = ("month", "category", "status")
+_CANCELLED = STATUSES.index("Cancelado")
+_OTHER = -1  # tipo/status fora das listas acima
+
+
+def _date_int(v) -> int:
+    """'YYYY-MM-DD' -> 20240315 (0 se vazio/ inválido)."""
+    s = str(v or "")
+    if len(s) >= 10 and s[4] == "-" and s[7] == "-":
+        try:
+            return int(s[:4]) * 10000 + int(s[5:7]) * 100 + int(s[8:10])
+        except ValueError:
+            return 0
+    return 0
+
+
+def _amount(v) -> float:
+    try:
+        n = float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+    return n if np.isfinite(n) else 0.0
+
+
+def _code(value, choices) -> int:
+    try:
+        return choices.index(value)
+    except ValueError:
+        return _OTHER
+
+
+class FinanceColumns:
+    def __init__(self, ttl: float = TTL_S):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._reset(0)
+
+    # ---------------------------
+    # Armazenamento
+    # ---------------------------
+    def _reset(self, capacity):
+        capacity = max(capacity, 64)
+        self._n = 0
+        self._row = {}                       # id -> linha
+        self._date = np.zeros(capacity, dtype=np.int32)
+        self._amount = np.zeros(capacity, dtype=np.float64)
+        self._type = np.full(capacity, _OTHER, dtype=np.int8)
+        self._status = np.full(capacity, _OTHER, dtype=np.int8)
+        self._category = np.zeros(capacity, dtype=np.int32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._categories = []                # código -> nome
+        self._category_code = {}             # nome -> código
+
+    def _grow(self):
+        capacity = len(self._date) * 2
+        for name in ("_date", "_amount", "_type", "_status", "_category", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            if name in ("_type", "_status"):
+                new.fill(_OTHER)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _category_of(self, name) -> int:
+        name = str(name or "").strip()
+        code = self._category_code.get(name)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(name)
+            self._category_code[name] = code
+        return code
+
+    def _write(self, doc_id, doc):
+        row = self._row.get(doc_id)
+        if row is None:
+            if self._n == len(self._date):
+                self._grow()
+            row = self._n
+            self._n += 1
+            self._row[doc_id] = row
+        self._date[row] = _date_int(doc.get("date"))
+        self._amount[row] = _amount(doc.get("amount"))
+        self._type[row] = _code(doc.get("type"), TYPES)
+        self._status[row] = _code(doc.get("status"), STATUSES)
+        self._category[row] = self._category_of(doc.get("category"))
+        self._alive[row] = True
+
+    def _compact(self):
+        """Regrava só as linhas vivas quando as apagadas passam de 1/4."""
+        dead = self._n - len(self._row)
+        if dead < 64 or dead * 4 < self._n:
+            return
+        keep = np.flatnonzero(self._alive[:self._n])
+        ids = sorted(self._row, key=self._row.get)
+        for name in ("_date", "_amount", "_type", "_status", "_category", "_alive"):
+            col = getattr(self, name)
+            col[:len(keep)] = col[keep]
+        self._alive[len(keep):self._n] = False
+        self._row = {doc_id: i for i, doc_id in enumerate(ids)}
+        self._n = len(keep)
+
+    # ---------------------------
+    # Manutenção
+    # ---------------------------
+    def load(self, docs=None):
+        """Recarrega a coleção inteira (ou a lista dada)."""
+        if docs is None:
+            docs = get_all_documents(COLLECTION) or []
+        with self._lock:
+            self._reset(len(docs) * 2)
+            for doc in docs:
+                if doc.get("id"):
+                    self._write(doc["id"], doc)
+            self._loaded_at = time.time()
+
+    def _ensure(self):
+        if self._loaded_at is not None and (self.ttl <= 0 or time.time() - self._loaded_at < self.ttl):
+            return
+        self.load()
+
+    def upsert(self, doc_id, doc):
+        """Chamado depois de gravar a transação (doc completo). Sem cache carregado, não faz nada."""
+        with self._lock:
+            if self._loaded_at is not None and doc_id:
+                self._write(doc_id, doc)
+
+    def remove(self, doc_id):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            row = self._row.pop(doc_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._compact()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    # ---------------------------
+    # Agregação
+    # ---------------------------
+    def summary(self, date_from=None, date_to=None, group_by=None) -> dict:
+        """
+        date_from/date_to: 'YYYY-MM-DD' (inclusive) sobre o campo date.
+        group_by: None | "month" | "category" | "status".
+        """
+        with self._lock:
+            self._ensure()
+            n = self._n
+            date = self._date[:n].copy()
+            amount = self._amount[:n].copy()
+            type_ = self._type[:n].copy()
+            status = self._status[:n].copy()
+            category = self._category[:n].copy()
+            mask = self._alive[:n].copy()
+            categories = list(self._categories)
+
+        if date_from:
+            mask &= date >= _date_int(date_from)
+        if date_to:
+            mask &= date <= _date_int(date_to)
+        date, amount, type_, status, category = date[mask], amount[mask], type_[mask], status[mask], category[mask]
+
+        by_status = {}
+        for code, name in enumerate(STATUSES):
+            by_status[name] = _totals(amount, type_, status == code)
+        counted = status != _CANCELLED
+        out = {
+            "totals": _totals(amount, type_, counted),
+            "by_status": by_status,
+            "balance": {
+                "paid": by_status["Pago"]["balance"],
+                "pending": by_status["Pendente"]["balance"],
+            },
+        }
+        out["balance"]["total"] = out["totals"]["balance"]
+
+        if group_by:
+            if group_by == "month":
+                keys = date[counted] // 100
+                label = lambda k: f"{k // 100:04d}-{k % 100:02d}" if k else ""
+            elif group_by == "category":
+                keys = category[counted]
+                label = lambda k: categories[k]
+            else:
+                keys = status[counted]
+                label = lambda k: STATUSES[k] if k >= 0 else ""
+            out["groups"] = _grouped(keys, amount[counted], type_[counted], label)
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": len(self._row),
+                "capacity": len(self._date),
+                "categories": len(self._categories),
+                "loaded_s_ago": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+                "ttl_s": self.ttl,
+            }
+
+
+def _totals(amount, type_, mask) -> dict:
+    out = {t: round(float(amount[mask & (type_ == code)].sum()), 2) for code, t in enumerate(TYPES)}
+    out["balance"] = round(out["entrada"] - out["saida"] - out["despesa"], 2)
+    out["count"] = int(mask.sum())
+    return out
+
+
+def _grouped(keys, amount, type_, label) -> list:
+    if not len(keys):
+        return []
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    size = len(uniq)
+    sums = {
+        t: np.bincount(inverse, weights=np.where(type_ == code, amount, 0.0), minlength=size)
+        for code, t in enumerate(TYPES)
+    }
+    counts = np.bincount(inverse, minlength=size)
+    out = []
+    for i, key in enumerate(uniq):
+        row = {"key": label(int(key))}
+        for t in TYPES:
+            row[t] = round(float(sums[t][i]), 2)
+        row["balance"] = round(row["entrada"] - row["saida"] - row["despesa"], 2)
+        row["count"] = int(counts[i])
+        out.append(row)
+    return out
+
+
+finance_columns = FinanceColumns()
@@ -0,0 +1,90 @@
+# backend/src/services/firestore_indexes.py
+"""
+Índices compostos declarados para as consultas do app.
+
+O planner de firestore_query só empurra para o Firestore as combinações
+de filtro/ordenação que tenham um índice declarado aqui; o resto é
+resolvido em memória. Depois de declarar um índice novo, regenere o
+arquivo de deploy:
+
+    cd backend && python -m src.services.firestore_indexes
+    firebase deploy --only firestore:indexes
+
+(o firebase.json do projeto deve apontar "firestore.indexes" para
+backend/firestore.indexes.json)
+"""
+import os
+import sys
+import json
+from collections import namedtuple
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+CONTAINS = "CONTAINS"  # campos usados com array_contains
+
+Index = namedtuple("Index", ["collection", "fields"])  # fields: ((campo, ordem), ...)
+
+INDEXES = []
+
+
+def declare_index(collection: str, *fields):
+    """
+    declare_index("fleet_fuel_logs", "placa", ("data", DESCENDING))
+    Campo sem ordem explícita = ASCENDING.
+    """
+    norm = []
+    for f in fields:
+        if isinstance(f, (tuple, list)):
+            norm.append((f[0], f[1]))
+        else:
+            norm.append((f, ASCENDING))
+    idx = Index(collection, tuple(norm))
+    if idx not in INDEXES:
+        INDEXES.append(idx)
+    return idx
+
+
+def indexes_for(collection: str):
+    return [i for i in INDEXES if i.collection == collection]
+
+
+def build_indexes_json() -> dict:
+    """Formato aceito por `firebase deploy --only firestore:indexes`."""
+    out = []
+    for idx in INDEXES:
+        fields = []
+        for name, order in idx.fields:
+            if order == CONTAINS:
+                fields.append({"fieldPath": name, "arrayConfig": CONTAINS})
+            else:
+                fields.append({"fieldPath": name, "order": order})
+        out.append({"collectionGroup": idx.collection, "queryScope": "COLLECTION", "fields": fields})
+    return {"indexes": out, "fieldOverrides": []}
+
+
+# ---------------------------
+# Declarações
+# ---------------------------
+# Abastecimentos: placa + período (fleet.fuel_list)
+declare_index("fleet_fuel_logs", "placa", "data")
+# ... + combustível (combustivel_key: sem caixa e espaços extras)
+declare_index("fleet_fuel_logs", "combustivel_key", "data")
+declare_index("fleet_fuel_logs", "placa", "combustivel_key", "data")
+# Último abastecimento da placa (fleet_stats)
+declare_index("fleet_fuel_logs", "placa", ("data", DESCENDING))
+# Calendário de ações: status + janela em start_date (Action.get_window)
+declare_index("actions", "status", "start_date")
+# Transações: filtros de igualdade + período, sempre em (date, updated_at)
+# decrescentes para a paginação por cursor (routes/finance.list_transactions)
+for _eq in ((), ("status",), ("type",), ("category",), ("status", "type"),
+            ("status", "category"), ("type", "category"), ("status", "type", "category")):
+    declare_index("finance_transactions", *_eq, ("date", DESCENDING), ("updated_at", DESCENDING))
+
+
+if __name__ == "__main__":
+    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(backend_dir, "firestore.indexes.json")
+    with open(target, "w", encoding="utf-8") as fh:
+        json.dump(build_indexes_json(), fh, indent=2, ensure_ascii=False)
+        fh.write("\n")
+    print(f"{len(INDEXES)} índices escritos em {target}")
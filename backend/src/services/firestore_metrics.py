@@ -0,0 +1,234 @@
+# backend/src/services/firestore_metrics.py
+"""
+Instrumentação das chamadas ao Firestore.
+
+- track(kind, collection): context manager que cronometra uma chamada e
+  acumula documentos lidos/escritos (op.docs = n)
+- totais por requisição em flask.g, devolvidos no header X-Firestore-Ops
+  (e em Server-Timing, visível no DevTools)
+- histogramas de latência por tipo de operação e totais por endpoint,
+  por processo, expostos em GET /api/metrics/internal
+
+Contagem de leituras segue a cobrança do Firestore: consulta sem resultado
+conta 1 leitura; hits do cache de doc_cache não contam.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+
+READ = "read"
+WRITE = "write"
+
+# limites superiores dos buckets (ms)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+_lock = threading.Lock()
+_started_at = time.time()
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, ms: float):
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += ms
+
+    def quantile(self, q: float):
+        """Estimativa pelo limite superior do bucket."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            acc += n
+            if acc >= target:
+                return bound if bound != float("inf") else BUCKETS_MS[-2]
+        return BUCKETS_MS[-2]
+
+    def to_dict(self) -> dict:
+        buckets = {("+Inf" if b == float("inf") else str(b)): n for b, n in zip(BUCKETS_MS, self.counts)}
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 2),
+            "avg_ms": round(self.sum / self.count, 2) if self.count else 0.0,
+            "p50_ms": self.quantile(0.50),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class _OpStats:
+    def __init__(self):
+        self.calls = 0
+        self.docs = 0
+        self.errors = 0
+        self.latency = Histogram()
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.reads = 0
+        self.writes = 0
+        self.calls = 0
+        self.firestore_ms = 0.0
+        self.latency = Histogram()  # tempo de Firestore por requisição
+
+
+_ops = {}        # (kind, collection) -> _OpStats
+_endpoints = {}  # "GET /api/x" -> _EndpointStats
+
+
+class _Op:
+    __slots__ = ("docs", "nested_ms")
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.nested_ms = 0.0
+
+
+# track() aninhados (leituras dentro de uma transação cronometrada como escrita)
+_active = threading.local()
+
+
+def _request_totals():
+    if not has_request_context():
+        return None
+    totals = getattr(g, "_firestore_ops", None)
+    if totals is None:
+        totals = {"reads": 0, "writes": 0, "calls": 0, "ms": 0.0}
+        g._firestore_ops = totals
+    return totals
+
+
+def record(kind: str, collection: str, ms: float, docs: int = 0, error: bool = False):
+    with _lock:
+        st = _ops.get((kind, collection))
+        if st is None:
+            st = _ops[(kind, collection)] = _OpStats()
+        st.calls += 1
+        st.docs += docs
+        st.errors += 1 if error else 0
+        st.latency.observe(ms)
+
+    totals = _request_totals()
+    if totals is not None:
+        totals["calls"] += 1
+        totals["ms"] += ms
+        totals["reads" if kind == READ else "writes"] += docs
+
+
+@contextmanager
+def track(kind: str, collection: str, docs: int = None):
+    """
+    with track(READ, "users") as op:
+        snaps = ...
+        op.docs = len(snaps)
+    Sem op.docs: escrita conta 1 documento; leitura conta 1 (mínimo cobrado).
+    Um track dentro de outro (ex.: leituras de uma transação) conta as suas
+    operações e o seu tempo; o de fora registra só o tempo restante.
+    """
+    op = _Op(docs)
+    stack = getattr(_active, "stack", None)
+    if stack is None:
+        stack = _active.stack = []
+    stack.append(op)
+    start = time.perf_counter()
+    error = False
+    try:
+        yield op
+    except Exception:
+        error = True
+        raise
+    finally:
+        ms = (time.perf_counter() - start) * 1000.0
+        stack.pop()
+        if stack:
+            stack[-1].nested_ms += ms
+        n = op.docs if op.docs is not None else 1
+        if kind == READ:
+            n = max(1, n)
+        record(kind, collection, max(0.0, ms - op.nested_ms), n, error)
+
+
+# ---------------------------
+# Integração com Flask
+# ---------------------------
+def _endpoint_key():
+    rule = request.url_rule.rule if request.url_rule else request.path
+    return f"{request.method} {rule}"
+
+
+def _after_request(response):
+    totals = getattr(g, "_firestore_ops", None)
+    if not totals:
+        return response
+    response.headers["X-Firestore-Ops"] = (
+        f"reads={totals['reads']}, writes={totals['writes']}, "
+        f"calls={totals['calls']}, ms={totals['ms']:.1f}"
+    )
+    response.headers.add(
+        "Server-Timing",
+        f'firestore;dur={totals["ms"]:.1f};desc="r={totals["reads"]} w={totals["writes"]}"',
+    )
+    with _lock:
+        key = _endpoint_key()
+        st = _endpoints.get(key)
+        if st is None:
+            st = _endpoints[key] = _EndpointStats()
+        st.requests += 1
+        st.reads += totals["reads"]
+        st.writes += totals["writes"]
+        st.calls += totals["calls"]
+        st.firestore_ms += totals["ms"]
+        st.latency.observe(totals["ms"])
+    return response
+
+
+def init_app(app):
+    app.after_request(_after_request)
+
+
+def request_totals() -> dict:
+    """Totais da requisição corrente (ou {} fora de requisição)."""
+    return dict(getattr(g, "_firestore_ops", None) or {}) if has_request_context() else {}
+
+
+def snapshot() -> dict:
+    with _lock:
+        ops = {}
+        for (kind, collection), st in sorted(_ops.items()):
+            ops.setdefault(kind, {})[collection] = {
+                "calls": st.calls,
+                "docs": st.docs,
+                "errors": st.errors,
+                "latency": st.latency.to_dict(),
+            }
+        endpoints = {
+            key: {
+                "requests": st.requests,
+                "reads": st.reads,
+                "writes": st.writes,
+                "calls": st.calls,
+                "reads_per_request": round(st.reads / st.requests, 2) if st.requests else 0.0,
+                "firestore_ms": st.latency.to_dict(),
+            }
+            for key, st in sorted(_endpoints.items(), key=lambda kv: -kv[1].reads)
+        }
+    return {"uptime_s": round(time.time() - _started_at, 1), "ops": ops, "endpoints": endpoints}
+
+
+def reset():
+    with _lock:
+        _ops.clear()
+        _endpoints.clear()
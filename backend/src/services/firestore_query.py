@@ -0,0 +1,312 @@
+# backend/src/services/firestore_query.py
+"""
+Planner das consultas declarativas de firestore_service.query_documents.
+
+Recebe filtros no formato (campo, operador, valor) + ordenação e decide o
+que vai para o Firestore e o que fica para filtrar/ordenar em memória:
+
+- igualdades (==, in, array_contains, array_contains_any) sempre podem ir
+  sozinhas (índices simples);
+- um único campo de intervalo (<, <=, >, >=, !=, not-in) vai junto;
+- combinações que exigem índice composto só são empurradas se o índice
+  estiver declarado em firestore_indexes; senão, a ordenação e depois o
+  intervalo caem para memória;
+- operadores só-memória: contains / icontains (substring, sem caixa) e
+  ieq (igualdade sem caixa).
+
+A avaliação em memória segue a semântica do Firestore: campo ausente não
+casa e só se compara valores do mesmo tipo (números int/float juntos).
+"""
+from collections import namedtuple
+from itertools import combinations
+from datetime import datetime
+
+from .firestore_indexes import indexes_for, ASCENDING, DESCENDING, CONTAINS
+
+EQ_OPS = {"==", "in", "array_contains", "array_contains_any"}
+RANGE_OPS = {"<", "<=", ">", ">=", "!=", "not-in"}
+MEMORY_OPS = {"contains", "icontains", "ieq"}
+# operadores que o Firestore aceita no máximo uma vez por consulta
+_SINGLE_USE = {"in", "not-in", "array_contains_any"}
+_MAX_DISJUNCTION = 30
+
+Filter = namedtuple("Filter", ["field", "op", "value"])
+
+
+class QueryPlan(namedtuple("QueryPlan", ["pushed", "memory", "pushed_order", "memory_order", "push_limit"])):
+    """
+    pushed / memory: listas de Filter
+    pushed_order / memory_order: listas de (campo, ASCENDING|DESCENDING)
+    push_limit: se o limit pode ir para o Firestore
+    """
+
+    @property
+    def needs_memory_pass(self):
+        return bool(self.memory or self.memory_order)
+
+
+# ---------------------------
+# Normalização de entrada
+# ---------------------------
+_OP_ALIASES = {"array-contains": "array_contains", "array-contains-any": "array_contains_any"}
+
+
+def normalize_filters(filters):
+    out = []
+    for field, op, value in filters or []:
+        op = _OP_ALIASES.get(op, op)
+        if op in MEMORY_OPS and value in (None, ""):
+            continue  # termo vazio não filtra nada
+        out.append(Filter(field, op, value))
+    return out
+
+
+def normalize_order(order_by):
+    """
+    "data" | "-data" | ("data", DESCENDING) | lista de qualquer um desses
+    -> [(campo, direção), ...]
+    """
+    if not order_by:
+        return []
+    if isinstance(order_by, (str, tuple)):
+        order_by = [order_by]
+    out = []
+    for item in order_by:
+        if isinstance(item, tuple):
+            out.append((item[0], item[1]))
+        elif item.startswith("-"):
+            out.append((item[1:], DESCENDING))
+        else:
+            out.append((item, ASCENDING))
+    return out
+
+
+# ---------------------------
+# Planejamento
+# ---------------------------
+def _needs_composite(eq, range_field, order):
+    """True se a forma da consulta exige índice composto."""
+    order_fields = [f for f, _ in order]
+    if not range_field and not order_fields:
+        return False  # só igualdades: índices simples (merge)
+    if not eq:
+        if not order_fields:
+            return False
+        if len(order_fields) == 1 and (range_field is None or range_field == order_fields[0]):
+            return False
+    return True
+
+
+def _index_matches(index, eq, range_field, order):
+    eq_fields = {f.field: (CONTAINS if f.op in ("array_contains", "array_contains_any") else ASCENDING) for f in eq}
+    seq = list(order)
+    if range_field and (not seq or seq[0][0] != range_field):
+        seq.insert(0, (range_field, ASCENDING))
+    fields = list(index.fields)
+    if len(fields) != len(eq_fields) + len(seq):
+        return False
+    head, tail = fields[:len(eq_fields)], fields[len(eq_fields):]
+    if {f for f, _ in head} != set(eq_fields):
+        return False
+    for name, mode in head:
+        if eq_fields[name] == CONTAINS and mode != CONTAINS:
+            return False
+    return tail == seq
+
+
+def _supported(collection, eq, range_field, order):
+    if not _needs_composite(eq, range_field, order):
+        return True
+    return any(_index_matches(i, eq, range_field, order) for i in indexes_for(collection))
+
+
+def plan_query(collection, filters=None, order_by=None) -> QueryPlan:
+    filters = normalize_filters(filters)
+    order = normalize_order(order_by)
+
+    memory, eq, ranges = [], [], []
+    used_single = False
+    used_contains = False
+    for f in filters:
+        if f.op in _SINGLE_USE:
+            if used_single or not isinstance(f.value, (list, tuple)) or len(f.value) > _MAX_DISJUNCTION:
+                memory.append(f)
+                continue
+            used_single = True
+        if f.op == "array_contains":
+            if used_contains:
+                memory.append(f)
+                continue
+            used_contains = True
+        if f.op in EQ_OPS:
+            eq.append(f)
+        elif f.op in RANGE_OPS:
+            ranges.append(f)
+        else:
+            memory.append(f)
+
+    # um único campo de intervalo: prefere o campo da ordenação
+    range_field = None
+    if ranges:
+        range_fields = [f.field for f in ranges]
+        range_field = order[0][0] if order and order[0][0] in range_fields else range_fields[0]
+        memory.extend(f for f in ranges if f.field != range_field)
+        ranges = [f for f in ranges if f.field == range_field]
+
+    pushed_order = list(order)
+    memory_order = []
+    # intervalo num campo e ordenação começando por outro: ordena em memória
+    if range_field and pushed_order and pushed_order[0][0] != range_field:
+        memory_order, pushed_order = pushed_order, []
+
+    if not _supported(collection, eq, range_field, pushed_order):
+        # 1) tenta sem a ordenação
+        if pushed_order:
+            memory_order, pushed_order = order, []
+        # 2) ainda precisa de índice: intervalo vai para memória
+        if not _supported(collection, eq, range_field, pushed_order):
+            memory.extend(ranges)
+            ranges, range_field = [], None
+
+    push_limit = not memory and not memory_order
+    return QueryPlan(eq + ranges, memory, pushed_order, memory_order, push_limit)
+
+
+def plan_page(collection, filters=None, order_by=None) -> QueryPlan:
+    """
+    Plano para paginação por cursor: a ordenação precisa ir inteira para o
+    Firestore (senão o cursor não serve). Se a combinação completa não tiver
+    índice, empurra o maior subconjunto de igualdades que tenha e filtra o
+    resto em memória, página a página; em último caso, só a ordenação.
+    """
+    filters = normalize_filters(filters)
+    order = normalize_order(order_by)
+    plan = plan_query(collection, filters, order)
+    if not plan.memory_order:
+        return plan._replace(push_limit=not plan.memory)
+
+    eq = [f for f in filters if f.op in EQ_OPS]
+    rest = [f for f in filters if f.op not in EQ_OPS]
+    for k in range(len(eq) - 1, -1, -1):
+        for kept in combinations(eq, k):
+            plan = plan_query(collection, list(kept) + rest, order)
+            if not plan.memory_order:
+                memory = plan.memory + [f for f in eq if f not in kept]
+                return plan._replace(memory=memory, push_limit=not memory)
+    plan = plan_query(collection, [], order)
+    return plan._replace(memory=filters, push_limit=not filters)
+
+
+def memory_plan(filters=None, order_by=None) -> QueryPlan:
+    """Plano sem nada empurrado (fallback quando o Firestore recusa a consulta)."""
+    return QueryPlan([], normalize_filters(filters), [], normalize_order(order_by), False)
+
+
+# ---------------------------
+# Avaliação em memória (semântica Firestore)
+# ---------------------------
+_ABSENT = object()
+
+
+def get_field(doc: dict, path: str):
+    cur = doc
+    for part in path.split("."):
+        if not isinstance(cur, dict) or part not in cur:
+            return _ABSENT
+        cur = cur[part]
+    return cur
+
+
+def _type_rank(v):
+    if v is None:
+        return 0
+    if isinstance(v, bool):
+        return 1
+    if isinstance(v, (int, float)):
+        return 2
+    if isinstance(v, datetime):
+        return 3
+    if isinstance(v, str):
+        return 4
+    if isinstance(v, bytes):
+        return 5
+    if isinstance(v, (list, tuple)):
+        return 8
+    if isinstance(v, dict):
+        return 9
+    return 6
+
+
+def sort_key(v):
+    """Chave de ordenação entre tipos (ordem do Firestore); ausente vem primeiro."""
+    if v is _ABSENT:
+        return (-1, 0)
+    rank = _type_rank(v)
+    if rank == 0:
+        return (0, 0)
+    if rank == 8:
+        return (rank, tuple(sort_key(x) for x in v))
+    if rank in (6, 9):
+        return (rank, str(v))
+    return (rank, v)
+
+
+def _same_type(a, b):
+    return _type_rank(a) == _type_rank(b)
+
+
+def _eq(a, b):
+    return _same_type(a, b) and a == b
+
+
+def match_filter(doc: dict, f) -> bool:
+    field, op, value = f
+    v = get_field(doc, field)
+
+    if op in MEMORY_OPS:
+        text = "" if v is _ABSENT or v is None else str(v)
+        term = str(value)
+        if op == "ieq":
+            return text.lower() == term.lower()
+        return not term or term.lower() in text.lower()
+
+    if v is _ABSENT:
+        return False
+    if op == "==":
+        return _eq(v, value)
+    if op == "!=":
+        return v is not None and not _eq(v, value)
+    if op == "in":
+        return any(_eq(v, x) for x in value)
+    if op == "not-in":
+        return v is not None and not any(_eq(v, x) for x in value)
+    if op == "array_contains":
+        return isinstance(v, list) and any(_eq(x, value) for x in v)
+    if op == "array_contains_any":
+        return isinstance(v, list) and any(_eq(x, y) for x in v for y in value)
+    if not _same_type(v, value) or v is None:
+        return False
+    try:
+        if op == "<":
+            return v < value
+        if op == "<=":
+            return v <= value
+        if op == ">":
+            return v > value
+        if op == ">=":
+            return v >= value
+    except TypeError:
+        return False
+    return False
+
+
+def apply_memory(docs, plan: QueryPlan, limit=None):
+    """Aplica filtros/ordenação/limite que ficaram para memória."""
+    if plan.memory:
+        docs = [d for d in docs if all(match_filter(d, f) for f in plan.memory)]
+    # sorted é estável: aplica do critério menos para o mais significativo
+    for field, direction in reversed(plan.memory_order):
+        docs = sorted(docs, key=lambda d: sort_key(get_field(d, field)), reverse=(direction == DESCENDING))
+    if limit and not plan.push_limit:
+        docs = docs[:limit]
+    return docs
@@ -2,12 +2,27 @@
 import os
 import json
 import base64
+import logging
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from types import SimpleNamespace
 
 import firebase_admin
 from firebase_admin import credentials, firestore, storage
 
+from .doc_cache import doc_cache, ALL_KEY, MISSING
+from .firestore_query import plan_query, plan_page, memory_plan, apply_memory, match_filter, DESCENDING
+from .firestore_metrics import track, READ, WRITE
+
+try:
+    from google.api_core.exceptions import FailedPrecondition
+except Exception:  # pragma: no cover - google-api-core vem com firebase-admin
+    FailedPrecondition = None
+
+log = logging.getLogger(__name__)
+
 
 # ---------------------------
 # Credenciais / Inicialização
@@ -100,13 +115,83 @@ def init_firebase():
 # ---------------------------
 # Acesso ao Firestore/Storage
 # ---------------------------
+# Registro de clientes: um pool por processo (worker), criado uma vez.
+# Todo módulo deve obter o cliente por get_db(); nada de firestore.client()
+# ou initialize_app() espalhados pelas rotas.
+POOL_SIZE = max(1, int(os.getenv("FIRESTORE_POOL_SIZE", "1")))
+# "firestore" (padrão) ou "memory": banco em memória para teste de carga local
+BACKEND = os.getenv("FIRESTORE_BACKEND", "firestore").strip().lower()
+_clients = []
+_clients_pid = None
+_clients_lock = threading.Lock()
+_round_robin = itertools.count()
+
+
+def _create_clients(app):
+    """
+    O primeiro cliente é o do firebase_admin; os extras (FIRESTORE_POOL_SIZE > 1)
+    são clientes independentes, cada um com o seu canal gRPC.
+    """
+    first = firestore.client(app)
+    extra = []
+    if POOL_SIZE > 1:
+        from google.cloud import firestore as gcf
+        cred = app.credential.get_credential()
+        extra = [gcf.Client(credentials=cred, project=first.project) for _ in range(POOL_SIZE - 1)]
+    return [first] + extra
+
+
+def _get_clients():
+    global _clients, _clients_pid
+    pid = os.getpid()
+    if _clients_pid == pid and _clients:
+        return _clients
+    with _clients_lock:
+        # gRPC não sobrevive a fork: se o processo mudou (gunicorn --preload), recria
+        if _clients_pid != pid or not _clients:
+            if BACKEND == "memory":
+                from .memory_db import memory_db
+                _clients = [memory_db]
+            else:
+                _clients = _create_clients(init_firebase())
+            _clients_pid = pid
+    return _clients
+
+
 def get_db():
     """
-    Retorna SEMPRE o cliente Firestore real.
-    Sem fallback em memória.
+    Retorna o cliente Firestore compartilhado do processo.
+    Com FIRESTORE_POOL_SIZE > 1 distribui as chamadas entre os clientes do pool.
     """
-    init_firebase()
-    return firestore.client()
+    clients = _get_clients()
+    if len(clients) == 1:
+        return clients[0]
+    return clients[next(_round_robin) % len(clients)]
+
+
+def warm_up():
+    """
+    Cria o pool e abre os canais gRPC com uma leitura mínima em cada cliente,
+    para a primeira requisição do worker não pagar o handshake.
+    """
+    start = datetime.now(timezone.utc)
+    try:
+        clients = _get_clients()
+        for db in clients:
+            db.collection("_warmup").document("ping").get()
+    except Exception as e:
+        log.warning("warm_up do Firestore falhou: %s", e)
+        return False
+    ms = (datetime.now(timezone.utc) - start).total_seconds() * 1000
+    log.info("Firestore aquecido (%d cliente(s), %.0f ms)", len(clients), ms)
+    return True
+
+
+def warm_up_async():
+    """warm_up em thread daemon (não atrasa o boot nem o healthcheck)."""
+    t = threading.Thread(target=warm_up, name="firestore-warmup", daemon=True)
+    t.start()
+    return t
 
 
 def get_firestore_client():
@@ -151,6 +236,18 @@ def _doc_to_dict(doc):
     return dict(doc or {})
 
 
+def _copy_docs(docs):
+    """
+    Cópia rasa de cada dict: quem chama costuma mexer no resultado
+    (pop de password_hash, doc['id'] = ...) e não pode sujar o cache.
+    """
+    if docs is None:
+        return None
+    if isinstance(docs, list):
+        return [dict(d) for d in docs]
+    return dict(docs)
+
+
 def _set_merge(doc_ref, data: dict):
     """set(..., merge=True) quando disponível."""
     try:
@@ -159,6 +256,72 @@ def _set_merge(doc_ref, data: dict):
         doc_ref.set(data)
 
 
+# ---------------------------
+# Lotes (WriteBatch)
+# ---------------------------
+BATCH_LIMIT = 500  # máximo de operações por WriteBatch no Firestore
+BATCH_WORKERS = int(os.getenv("FIRESTORE_BATCH_WORKERS", "4"))
+
+
+class PartialWriteError(RuntimeError):
+    """
+    Parte dos WriteBatches foi gravada e parte falhou.
+    committed: índices (nas ops/itens enviados) que ficaram gravados;
+    add_documents preenche também `ids` com os ids desses documentos.
+    """
+
+    def __init__(self, cause: Exception, committed):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.committed = committed
+        self.ids = []
+
+
+def _commit_in_chunks(db, ops):
+    """
+    ops: [(tipo, ref, data)] com tipo em "set" | "merge" | "delete".
+    Divide em WriteBatches de até BATCH_LIMIT e comita os lotes em paralelo.
+    Cada lote é atômico; o conjunto não é (um lote pode falhar e outros não).
+    Se nenhum lote gravou, levanta a primeira exceção; se algum gravou,
+    levanta PartialWriteError com os índices gravados.
+    """
+    chunks = [ops[i:i + BATCH_LIMIT] for i in range(0, len(ops), BATCH_LIMIT)]
+
+    def commit(chunk):
+        batch = db.batch()
+        for kind, ref, data in chunk:
+            if kind == "delete":
+                batch.delete(ref)
+            elif kind == "merge":
+                batch.set(ref, data, merge=True)
+            else:
+                batch.set(ref, data)
+        batch.commit()
+
+    done, errors = [], []
+    if len(chunks) <= 1 or BATCH_WORKERS <= 1:
+        for i, chunk in enumerate(chunks):
+            try:
+                commit(chunk)
+            except Exception as e:
+                errors.append(e)
+                break
+            done.append(i)
+    else:
+        with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(chunks))) as pool:
+            for i, fut in enumerate([pool.submit(commit, c) for c in chunks]):
+                exc = fut.exception()
+                if exc is not None:
+                    errors.append(exc)
+                else:
+                    done.append(i)
+    if errors:
+        if not done:
+            raise errors[0]
+        committed = [j for i in done for j in range(i * BATCH_LIMIT, min(len(ops), (i + 1) * BATCH_LIMIT))]
+        raise PartialWriteError(errors[0], committed) from errors[0]
+
+
 # ---------------------------
 # API compatível com modelos legados
 # ---------------------------
@@ -173,24 +336,386 @@ def add_document(collection_name: str, data: dict):
     payload.setdefault("updated_at", _server_ts())
 
     ref = db.collection(collection_name).document()
-    ref.set(payload)
+    with track(WRITE, collection_name):
+        ref.set(payload)
+    doc_cache.invalidate(collection_name, ref.id)
     return ref.id, None
 
 
 def get_all_documents(collection_name: str):
+    cached = doc_cache.get(collection_name, ALL_KEY)
+    if cached is not MISSING:
+        return _copy_docs(cached)
+
     db = get_db()
-    snaps = db.collection(collection_name).get()
-    return [_doc_to_dict(s) for s in snaps] if snaps else []
+    with track(READ, collection_name) as op:
+        snaps = db.collection(collection_name).get()
+        docs = [_doc_to_dict(s) for s in snaps] if snaps else []
+        op.docs = len(docs)
+    doc_cache.set(collection_name, ALL_KEY, _copy_docs(docs))
+    return docs
 
 
 def get_document(collection_name: str, doc_id: str):
     if not doc_id:
         return None
+    cached = doc_cache.get(collection_name, doc_id)
+    if cached is not MISSING:
+        return _copy_docs(cached)
+
     db = get_db()
-    snap = db.collection(collection_name).document(doc_id).get()
+    with track(READ, collection_name):
+        snap = db.collection(collection_name).document(doc_id).get()
     if hasattr(snap, "exists") and not snap.exists:
+        doc = None
+    else:
+        doc = _doc_to_dict(snap)
+    doc_cache.set(collection_name, doc_id, _copy_docs(doc))
+    return doc
+
+
+class InvalidCursor(ValueError):
+    """Cursor de paginação que não aponta para um documento existente."""
+
+
+def get_documents_page(
+    collection_name: str,
+    limit: int = 100,
+    order_by: str = None,
+    descending: bool = False,
+    start_after: str = None,
+):
+    """
+    Variante paginada de get_all_documents.
+    - limit: tamanho da página
+    - order_by: campo de ordenação (None = ordem do id do documento).
+      Atenção: o Firestore exclui da consulta docs sem o campo ordenado.
+    - start_after: cursor (id do último doc da página anterior)
+    Retorna (docs, next_cursor); next_cursor é None na última página.
+    Não passa pelo cache.
+    """
+    db = get_db()
+    col = db.collection(collection_name)
+    query = col
+    if order_by:
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        query = query.order_by(order_by, direction=direction)
+    if start_after:
+        with track(READ, collection_name):
+            snap = col.document(start_after).get()
+        if not snap.exists:
+            raise InvalidCursor(start_after)
+        query = query.start_after(snap)
+
+    # busca 1 a mais para saber se existe próxima página
+    with track(READ, collection_name) as op:
+        snaps = list(query.limit(limit + 1).get())
+        op.docs = len(snaps)
+    docs = [_doc_to_dict(s) for s in snaps[:limit]]
+    next_cursor = docs[-1]["id"] if len(snaps) > limit and docs else None
+    return docs, next_cursor
+
+
+def _build_query(col, plan, limit=None):
+    query = col
+    for f in plan.pushed:
+        query = query.where(f.field, f.op, f.value)
+    for field, direction in plan.pushed_order:
+        query = query.order_by(
+            field,
+            direction=firestore.Query.DESCENDING if direction == DESCENDING else firestore.Query.ASCENDING,
+        )
+    if limit and plan.push_limit:
+        query = query.limit(limit)
+    return query
+
+
+def query_documents(collection_name: str, filters=None, order_by=None, limit: int = None):
+    """
+    Consulta declarativa.
+      filters:  [(campo, op, valor), ...]  ops: ==, !=, <, <=, >, >=, in, not-in,
+                array_contains, array_contains_any (Firestore) e
+                contains, icontains, ieq (só memória)
+      order_by: "campo" | "-campo" | lista
+      limit:    máximo de documentos
+    O planner (firestore_query) empurra para o Firestore o que os índices
+    declarados permitem e resolve o resto em memória. Se o Firestore recusar
+    a consulta por falta de índice, refaz tudo em memória (e loga).
+    Não passa pelo cache.
+    """
+    plan = plan_query(collection_name, filters, order_by)
+    col = get_db().collection(collection_name)
+    try:
+        with track(READ, collection_name) as op:
+            docs = [_doc_to_dict(s) for s in _build_query(col, plan, limit).stream()]
+            op.docs = len(docs)
+    except Exception as e:
+        if FailedPrecondition is None or not isinstance(e, FailedPrecondition):
+            raise
+        log.warning("query_documents(%s): índice ausente no Firestore, filtrando em memória: %s", collection_name, e)
+        plan = memory_plan(filters, order_by)
+        with track(READ, collection_name) as op:
+            docs = [_doc_to_dict(s) for s in col.stream()]
+            op.docs = len(docs)
+    return apply_memory(docs, plan, limit)
+
+
+def query_page(collection_name: str, filters=None, order_by=None, limit: int = 100,
+               start_after: str = None, match=None, scan_batch: int = None):
+    """
+    Página de uma consulta declarativa com cursor (id do último doc da página
+    anterior). A ordenação vai sempre para o Firestore (plan_page); filtros
+    sem índice e `match` (função doc -> bool, ex. busca textual) são
+    aplicados em blocos de scan_batch docs até completar a página, então a
+    memória fica limitada a uma página + um bloco, mesmo com filtro seletivo.
+    Retorna (docs, next_cursor); next_cursor é None na última página.
+    Não passa pelo cache.
+    """
+    plan = plan_page(collection_name, filters, order_by)
+    col = get_db().collection(collection_name)
+    if plan.memory_order:
+        # nem a ordenação sozinha tem índice declarado: tudo em memória
+        return _memory_page(collection_name, col, filters, order_by, limit, start_after, match)
+
+    query = _build_query(col, plan)
+    if start_after:
+        with track(READ, collection_name):
+            snap = col.document(start_after).get()
+        if not snap.exists:
+            raise InvalidCursor(start_after)
+        query = query.start_after(snap)
+
+    filtered = bool(plan.memory) or match is not None
+    batch = limit + 1 if not filtered else max(scan_batch or 0, (limit + 1) * 2, 50)
+    try:
+        docs = list(itertools.islice(_scan(collection_name, query, plan, match, batch), limit + 1))
+    except Exception as e:
+        if FailedPrecondition is None or not isinstance(e, FailedPrecondition):
+            raise
+        log.warning("query_page(%s): índice ausente no Firestore, paginando em memória: %s", collection_name, e)
+        return _memory_page(collection_name, col, filters, order_by, limit, start_after, match)
+
+    next_cursor = docs[limit - 1]["id"] if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def _scan(collection_name, query, plan, match, batch):
+    """Docs da consulta em blocos de `batch` (cursor no último lido), já filtrados."""
+    while True:
+        with track(READ, collection_name) as op:
+            snaps = list(query.limit(batch).get())
+            op.docs = len(snaps)
+        for s in snaps:
+            doc = _doc_to_dict(s)
+            if plan.memory and not all(match_filter(doc, f) for f in plan.memory):
+                continue
+            if match is not None and not match(doc):
+                continue
+            yield doc
+        if len(snaps) < batch:
+            return
+        query = query.start_after(snaps[-1])
+
+
+def iter_query(collection_name: str, filters=None, order_by=None, match=None, batch: int = 500):
+    """
+    Gerador com todos os docs da consulta, na ordem pedida, lidos em blocos
+    de `batch` por cursor: a memória fica limitada a um bloco (exportações).
+    Mesmo planejamento de query_page; sem índice para a ordenação, cai para
+    leitura completa em memória (e loga).
+    """
+    plan = plan_page(collection_name, filters, order_by)
+    col = get_db().collection(collection_name)
+    if not plan.memory_order:
+        scan = _scan(collection_name, _build_query(col, plan), plan, match, batch)
+        try:
+            first = next(scan)
+        except StopIteration:
+            return
+        except Exception as e:
+            if FailedPrecondition is None or not isinstance(e, FailedPrecondition):
+                raise
+            log.warning("iter_query(%s): índice ausente no Firestore, lendo em memória: %s", collection_name, e)
+        else:
+            yield first
+            yield from scan
+            return
+    else:
+        log.warning("iter_query(%s): ordenação sem índice declarado, lendo em memória", collection_name)
+    with track(READ, collection_name) as op:
+        docs = [_doc_to_dict(s) for s in col.stream()]
+        op.docs = len(docs)
+    for doc in apply_memory(docs, memory_plan(filters, order_by)):
+        if match is None or match(doc):
+            yield doc
+
+
+def _memory_page(collection_name, col, filters, order_by, limit, start_after, match):
+    """Fallback de query_page sem índice: lê a coleção e pagina em memória."""
+    with track(READ, collection_name) as op:
+        docs = [_doc_to_dict(s) for s in col.stream()]
+        op.docs = len(docs)
+    docs = apply_memory(docs, memory_plan(filters, order_by))
+    if match is not None:
+        docs = [d for d in docs if match(d)]
+    if start_after:
+        ids = [d["id"] for d in docs]
+        if start_after not in ids:
+            raise InvalidCursor(start_after)
+        docs = docs[ids.index(start_after) + 1:]
+    next_cursor = docs[limit - 1]["id"] if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def count_documents(collection_name: str, filters=None, order_by=None):
+    """
+    Total de docs que casam com os filtros via agregação count() do
+    Firestore (cobrada como ~1 leitura a cada 1000 entradas do índice, sem
+    trafegar os docs). order_by: o mesmo da listagem, para usar o mesmo
+    índice composto (e excluir os mesmos docs sem o campo ordenado).
+    Retorna None se algum filtro não puder ir para o Firestore: contar
+    exigiria ler tudo.
+    """
+    plan = plan_page(collection_name, filters, order_by) if order_by else plan_query(collection_name, filters)
+    if plan.memory or plan.memory_order:
+        return None
+    query = _build_query(get_db().collection(collection_name), plan)
+    try:
+        with track(READ, collection_name):
+            result = query.count(alias="total").get()
+    except Exception as e:
+        if FailedPrecondition is None or not isinstance(e, FailedPrecondition):
+            raise
+        log.warning("count_documents(%s): índice ausente no Firestore: %s", collection_name, e)
         return None
-    return _doc_to_dict(snap)
+    return int(result[0][0].value)
+
+
+def get_documents(collection_name: str, doc_ids):
+    """
+    Leitura em lote (db.get_all). Retorna {id: doc} só com os existentes.
+    Não passa pelo cache.
+    """
+    ids = [i for i in dict.fromkeys(doc_ids or []) if i]
+    if not ids:
+        return {}
+    db = get_db()
+    col = db.collection(collection_name)
+    out = {}
+    for i in range(0, len(ids), BATCH_LIMIT):
+        refs = [col.document(doc_id) for doc_id in ids[i:i + BATCH_LIMIT]]
+        with track(READ, collection_name, docs=len(refs)):
+            for snap in db.get_all(refs):
+                if getattr(snap, "exists", True):
+                    out[snap.id] = _doc_to_dict(snap)
+    return out
+
+
+def add_documents(collection_name: str, items):
+    """
+    Cria vários documentos em WriteBatches. Retorna a lista de ids (na ordem).
+    Em falha parcial, PartialWriteError.ids traz os ids que ficaram gravados.
+    """
+    items = list(items or [])
+    if not items:
+        return []
+    db = get_db()
+    col = db.collection(collection_name)
+    ops, ids = [], []
+    for data in items:
+        payload = dict(data or {})
+        payload.setdefault("created_at", _server_ts())
+        payload.setdefault("updated_at", _server_ts())
+        ref = col.document()
+        ids.append(ref.id)
+        ops.append(("set", ref, payload))
+    try:
+        with track(WRITE, collection_name, docs=len(ops)):
+            _commit_in_chunks(db, ops)
+    except PartialWriteError as e:
+        e.ids = [ids[j] for j in e.committed]
+        raise
+    finally:
+        doc_cache.invalidate(collection_name)
+    return ids
+
+
+def update_documents(collection_name: str, updates):
+    """
+    Atualiza (set merge) vários documentos em WriteBatches.
+    updates: {id: data} ou [(id, data), ...]. Retorna quantos foram escritos.
+    Assim como update_document, id inexistente vira documento novo:
+    quem chama deve validar a existência se isso importar.
+    """
+    pairs = list(updates.items()) if isinstance(updates, dict) else list(updates or [])
+    pairs = [(doc_id, data) for doc_id, data in pairs if doc_id]
+    if not pairs:
+        return 0
+    db = get_db()
+    col = db.collection(collection_name)
+    ops = []
+    for doc_id, data in pairs:
+        payload = dict(data or {})
+        payload["updated_at"] = _server_ts()
+        ops.append(("merge", col.document(doc_id), payload))
+    try:
+        with track(WRITE, collection_name, docs=len(ops)):
+            _commit_in_chunks(db, ops)
+    finally:
+        doc_cache.invalidate(collection_name)
+    return len(ops)
+
+
+def delete_documents(collection_name: str, doc_ids):
+    """Remove vários documentos em WriteBatches. Retorna quantos ids foram enviados."""
+    ids = [i for i in dict.fromkeys(doc_ids or []) if i]
+    if not ids:
+        return 0
+    db = get_db()
+    col = db.collection(collection_name)
+    try:
+        with track(WRITE, collection_name, docs=len(ids)):
+            _commit_in_chunks(db, [("delete", col.document(doc_id), None) for doc_id in ids])
+    finally:
+        doc_cache.invalidate(collection_name)
+    return len(ids)
+
+
+def run_transaction(fn):
+    """
+    Executa fn(transaction, db) numa transação e retorna o resultado.
+    Leituras dentro de fn: tx_get(transaction, ref_ou_consulta, coleção); escritas:
+    transaction.create/set/update/delete. No Firestore a função pode ser
+    repetida em caso de conflito, então não deve ter efeitos colaterais.
+    """
+    db = get_db()
+    if BACKEND == "memory":
+        # MemoryDB: o lock do banco serializa as transações
+        with db._lock:
+            tx = db.transaction()
+            result = fn(tx, db)
+            tx.commit()
+            return result
+
+    @firestore.transactional
+    def _run(tx):
+        return fn(tx, db)
+
+    return _run(db.transaction())
+
+
+def tx_get(tx, target, collection_name: str):
+    """
+    Leitura dentro de run_transaction, contada como leitura de collection_name.
+    target: DocumentReference (retorna o snapshot) ou consulta (lista de snapshots).
+    """
+    if hasattr(target, "stream"):
+        with track(READ, collection_name) as op:
+            snaps = list(target.stream(transaction=tx))
+            op.docs = len(snaps)
+        return snaps
+    with track(READ, collection_name):
+        return target.get(transaction=tx)
 
 
 def update_document(collection_name: str, doc_id: str, data: dict):
@@ -200,7 +725,9 @@ def update_document(collection_name: str, doc_id: str, data: dict):
     payload = dict(data or {})
     payload["updated_at"] = _server_ts()
     ref = db.collection(collection_name).document(doc_id)
-    _set_merge(ref, payload)
+    with track(WRITE, collection_name):
+        _set_merge(ref, payload)
+    doc_cache.invalidate(collection_name, doc_id)
     return True
 
 
@@ -208,28 +735,70 @@ def delete_document(collection_name: str, doc_id: str):
     if not doc_id:
         return False
     db = get_db()
-    db.collection(collection_name).document(doc_id).delete()
+    with track(WRITE, collection_name):
+        db.collection(collection_name).document(doc_id).delete()
+    doc_cache.invalidate(collection_name, doc_id)
     return True
 
 
+def invalidate_cache(collection_name: str, doc_id: str = None):
+    """Para escritas feitas fora desta fachada (ex.: cliente Firestore direto)."""
+    doc_cache.invalidate(collection_name, doc_id)
+
+
+def cache_stats() -> dict:
+    """Hits/misses/evictions por coleção cacheada."""
+    return doc_cache.stats()
+
+
 # Fachada no mesmo nome esperado nos imports antigos
 firestore_service = SimpleNamespace(
     add_document=add_document,
     get_all_documents=get_all_documents,
     get_document=get_document,
+    get_documents_page=get_documents_page,
+    query_documents=query_documents,
+    query_page=query_page,
+    iter_query=iter_query,
+    count_documents=count_documents,
     update_document=update_document,
     delete_document=delete_document,
+    get_documents=get_documents,
+    add_documents=add_documents,
+    update_documents=update_documents,
+    delete_documents=delete_documents,
+    run_transaction=run_transaction,
+    tx_get=tx_get,
+    invalidate_cache=invalidate_cache,
+    cache_stats=cache_stats,
 )
 
 
 __all__ = [
     "get_db",
+    "warm_up",
+    "warm_up_async",
     "get_firestore_client",
     "get_storage_bucket",
     "add_document",
     "get_all_documents",
     "get_document",
+    "get_documents_page",
+    "InvalidCursor",
+    "query_documents",
+    "query_page",
+    "iter_query",
+    "count_documents",
     "update_document",
     "delete_document",
+    "get_documents",
+    "add_documents",
+    "PartialWriteError",
+    "update_documents",
+    "delete_documents",
+    "run_transaction",
+    "tx_get",
+    "invalidate_cache",
+    "cache_stats",
     "firestore_service",
 ]
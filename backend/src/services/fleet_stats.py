@@ -0,0 +1,341 @@
+# backend/src/services/fleet_stats.py
+"""
+Totais de abastecimento por veículo, materializados (a tela de frota não
+lê o histórico de abastecimentos).
+
+fleet_vehicle_stats/<placa> = {"placa", "count", "litros", "valor_total",
+                               "last_data", "last_odometro", "last_log_id",
+                               "updated_at"}
+"Último" abastecimento = maior (data, odômetro).
+
+create_log / update_log / delete_log gravam o abastecimento e os stats da
+placa (das duas placas, se ela mudou) na mesma transação: somas por
+Increment e o último abastecimento lido na transação (se o último for
+apagado ou rebaixado, a transação consulta o próximo). O bulk aplica as
+somas em lote e reconsulta o último das placas afetadas.
+
+rebuild() recalcula tudo a partir de fleet_fuel_logs (corrige desvio de
+escritas feitas fora destas funções). Rodar quando necessário, ex.:
+
+    cd backend && python -m src.services.fleet_stats
+
+Escritas concorrentes com o rebuild podem se perder; rode fora do horário
+de uso.
+"""
+import logging
+from collections import defaultdict
+from urllib.parse import quote
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1 import Increment
+
+from .firestore_service import (
+    get_db, get_documents, run_transaction, tx_get, invalidate_cache, BATCH_LIMIT, _server_ts,
+)
+from .firestore_metrics import track, READ, WRITE
+
+log = logging.getLogger(__name__)
+
+FUEL_LOGS = "fleet_fuel_logs"
+STATS = "fleet_vehicle_stats"
+META = "_meta"
+# abastecimentos lidos para achar o último (desempate por odômetro no mesmo dia)
+LAST_CANDIDATES = 5
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+def stats_key(placa: str) -> str:
+    """Id do documento de stats (sem '/', que o Firestore não aceita)."""
+    return quote(str(placa), safe="")
+
+
+def stats_ref(db, placa: str):
+    return db.collection(STATS).document(stats_key(placa))
+
+
+def _num(v) -> float:
+    try:
+        return float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _odo(v) -> int:
+    try:
+        return int(v or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _rank(doc: dict):
+    return (str(doc.get("data") or ""), _odo(doc.get("odometro")))
+
+
+def _last_fields(doc_id, doc) -> dict:
+    if doc is None:
+        return {"last_data": None, "last_odometro": None, "last_log_id": None}
+    return {"last_data": doc.get("data") or None, "last_odometro": _odo(doc.get("odometro")), "last_log_id": doc_id}
+
+
+def _last_query(db, placa: str):
+    """
+    Abastecimentos mais recentes da placa (índice placa + data desc). Só
+    ordena por data (ordenar por odômetro excluiria docs sem o campo); o
+    desempate por odômetro é feito em memória entre os LAST_CANDIDATES lidos.
+    """
+    return (db.collection(FUEL_LOGS)
+            .where("placa", "==", placa)
+            .order_by("data", direction=firestore.Query.DESCENDING)
+            .limit(LAST_CANDIDATES))
+
+
+def _sums(old, new) -> dict:
+    """Variações de count/litros/valor_total da troca old -> new (mesma placa)."""
+    out = {"count": 0, "litros": 0.0, "valor_total": 0.0}
+    for doc, sign in ((old, -1), (new, +1)):
+        if doc is not None:
+            out["count"] += sign
+            out["litros"] += sign * _num(doc.get("litros"))
+            out["valor_total"] += sign * _num(doc.get("valor_total"))
+    return out
+
+
+def _payload(placa, sums) -> dict:
+    out = {"placa": placa, "updated_at": _server_ts()}
+    for k, v in sums.items():
+        if v:
+            out[k] = Increment(round(v, 6) if isinstance(v, float) else v)
+    return out
+
+
+def _split_by_placa(old, new):
+    """{placa: (old ou None, new ou None)} das placas tocadas pela troca."""
+    out = {}
+    for doc, slot in ((old, 0), (new, 1)):
+        placa = (doc or {}).get("placa")
+        if placa:
+            pair = out.setdefault(placa, [None, None])
+            pair[slot] = doc
+    return {p: tuple(pair) for p, pair in out.items()}
+
+
+# ---------------------------
+# Transação
+# ---------------------------
+def _tx_writes(tx, db, doc_id, old=None, new=None):
+    """
+    Lê (na transação) os stats das placas afetadas e devolve
+    [(ref, payload)] para tx.set(ref, payload, merge=True). Chamar antes de
+    qualquer escrita da transação (regra do Firestore).
+    """
+    out = []
+    for placa, (o, n) in _split_by_placa(old, new).items():
+        ref = stats_ref(db, placa)
+        snap = tx_get(tx, ref, STATS)
+        cur = (snap.to_dict() or {}) if snap.exists else {}
+        payload = _payload(placa, _sums(o, n))
+
+        last_id = cur.get("last_log_id")
+        cur_rank = (str(cur.get("last_data") or ""), _odo(cur.get("last_odometro")))
+        if n is not None and (not last_id or _rank(n) >= cur_rank):
+            payload.update(_last_fields(doc_id, n))  # vira (ou continua) o último
+        elif last_id == doc_id:
+            # o último foi apagado, mudou de placa ou foi rebaixado: compara com os próximos
+            payload.update(_next_last(tx, db, placa, doc_id, (doc_id, n) if n is not None else None))
+        out.append((ref, payload))
+    return out
+
+
+def _next_last(tx, db, placa, doc_id, candidate):
+    """Último da placa ignorando doc_id (estado antigo), comparado com candidate=(id, doc)."""
+    best = candidate
+    for snap in tx_get(tx, _last_query(db, placa), FUEL_LOGS):
+        if snap.id == doc_id:
+            continue
+        doc = snap.to_dict() or {}
+        if best is None or _rank(doc) > _rank(best[1]):
+            best = (snap.id, doc)
+    return _last_fields(*best) if best else _last_fields(None, None)
+
+
+def create_log(data: dict) -> str:
+    """Grava um abastecimento novo e os stats da placa. Retorna o id."""
+    db = get_db()
+    ref = db.collection(FUEL_LOGS).document()
+
+    def _create(tx, db):
+        writes = _tx_writes(tx, db, ref.id, None, data)
+        tx.create(ref, data)
+        for stats, payload in writes:
+            tx.set(stats, payload, merge=True)
+
+    with track(WRITE, FUEL_LOGS, docs=2):
+        run_transaction(_create)
+    invalidate_cache(STATS)
+    return ref.id
+
+
+def update_log(doc_id: str, patch: dict):
+    """Aplica patch e ajusta os stats. Retorna o doc atualizado ou None se não existir."""
+    def _update(tx, db):
+        ref = db.collection(FUEL_LOGS).document(doc_id)
+        snap = tx_get(tx, ref, FUEL_LOGS)
+        if not snap.exists:
+            return None
+        old = snap.to_dict() or {}
+        new = {**old, **patch}
+        writes = _tx_writes(tx, db, doc_id, old, new)
+        tx.update(ref, patch)
+        for stats, payload in writes:
+            tx.set(stats, payload, merge=True)
+        return new
+
+    with track(WRITE, FUEL_LOGS, docs=2):
+        new = run_transaction(_update)
+    invalidate_cache(STATS)
+    if new is not None:
+        new["id"] = doc_id
+    return new
+
+
+def delete_log(doc_id: str) -> bool:
+    def _delete(tx, db):
+        ref = db.collection(FUEL_LOGS).document(doc_id)
+        snap = tx_get(tx, ref, FUEL_LOGS)
+        if not snap.exists:
+            return False
+        writes = _tx_writes(tx, db, doc_id, snap.to_dict() or {}, None)
+        tx.delete(ref)
+        for stats, payload in writes:
+            tx.set(stats, payload, merge=True)
+        return True
+
+    with track(WRITE, FUEL_LOGS, docs=2):
+        ok = run_transaction(_delete)
+    invalidate_cache(STATS)
+    return ok
+
+
+# ---------------------------
+# Lotes
+# ---------------------------
+def apply_changes(changes):
+    """
+    changes: [(doc_id, antes, depois)] já gravados pelo bulk (None = não
+    existe). Soma as variações por placa num lote e reconsulta o último
+    abastecimento de cada placa afetada.
+    """
+    sums = defaultdict(lambda: {"count": 0, "litros": 0.0, "valor_total": 0.0})
+    for _, old, new in changes:
+        for placa, (o, n) in _split_by_placa(old, new).items():
+            for k, v in _sums(o, n).items():
+                sums[placa][k] += v
+    if not sums:
+        return
+    db = get_db()
+    writes = []
+    for placa, delta in sums.items():
+        payload = _payload(placa, delta)
+        with track(READ, FUEL_LOGS) as op:
+            snaps = list(_last_query(db, placa).get())
+            op.docs = len(snaps) or 1
+        best = max(((s.id, s.to_dict() or {}) for s in snaps), key=lambda it: _rank(it[1]), default=None)
+        payload.update(_last_fields(*best) if best else _last_fields(None, None))
+        writes.append((stats_ref(db, placa), payload))
+    for i in range(0, len(writes), BATCH_LIMIT):
+        batch = db.batch()
+        chunk = writes[i:i + BATCH_LIMIT]
+        for ref, payload in chunk:
+            batch.set(ref, payload, merge=True)
+        with track(WRITE, STATS, docs=len(chunk)):
+            batch.commit()
+    invalidate_cache(STATS)
+
+
+# ---------------------------
+# Rebuild / leitura
+# ---------------------------
+def rebuild() -> int:
+    """
+    Recalcula os stats de todas as placas a partir de fleet_fuel_logs
+    (placas sem abastecimento perdem o documento). Retorna quantas placas.
+    """
+    db = get_db()
+    stats = {}
+    with track(READ, FUEL_LOGS) as op:
+        n = 0
+        for snap in db.collection(FUEL_LOGS).stream():
+            doc = snap.to_dict() or {}
+            n += 1
+            placa = doc.get("placa")
+            if not placa:
+                continue
+            s = stats.setdefault(placa, {"placa": placa, "count": 0, "litros": 0.0, "valor_total": 0.0,
+                                         **_last_fields(None, None)})
+            s["count"] += 1
+            s["litros"] += _num(doc.get("litros"))
+            s["valor_total"] += _num(doc.get("valor_total"))
+            if s["last_log_id"] is None or _rank(doc) > (s["last_data"] or "", s["last_odometro"] or 0):
+                s.update(_last_fields(snap.id, doc))
+        op.docs = n
+    with track(READ, STATS) as op:
+        existing = [s.id for s in db.collection(STATS).stream()]
+        op.docs = len(existing)
+
+    keep = {stats_key(p) for p in stats}
+    ops = [(stats_ref(db, p), dict(s, updated_at=_server_ts())) for p, s in stats.items()]
+    ops.extend((db.collection(STATS).document(k), None) for k in existing if k not in keep)
+    ops.append((db.collection(META).document(STATS), {"rebuilt_at": _server_ts(), "vehicles": len(stats)}))
+    for i in range(0, len(ops), BATCH_LIMIT):
+        batch = db.batch()
+        chunk = ops[i:i + BATCH_LIMIT]
+        for ref, data in chunk:
+            if data is None:
+                batch.delete(ref)
+            else:
+                batch.set(ref, data)
+        with track(WRITE, STATS, docs=len(chunk)):
+            batch.commit()
+    invalidate_cache(STATS)
+    log.info("stats de frota recalculados: %d abastecimentos, %d placas", n, len(stats))
+    return len(stats)
+
+
+def ensure_built() -> bool:
+    """Primeiro rebuild (backfill da CLI: python -m src.migrations backfill). Depois disso custa uma leitura."""
+    with track(READ, META):
+        if get_db().collection(META).document(STATS).get().exists:
+            return False
+    rebuild()
+    return True
+
+
+def summarize(doc: dict) -> dict:
+    """Stats expostos na API a partir do documento (vazio = zeros)."""
+    doc = doc or {}
+    return {
+        "count": int(doc.get("count") or 0),
+        "litros": round(_num(doc.get("litros")), 2),
+        "valor_total": round(_num(doc.get("valor_total")), 2),
+        "last_data": doc.get("last_data"),
+        "last_odometro": doc.get("last_odometro"),
+    }
+
+
+def for_placas(placas) -> dict:
+    """{placa: stats} para as placas dadas (uma leitura por placa, em lote)."""
+    placas = [p for p in dict.fromkeys(placas) if p]
+    docs = get_documents(STATS, [stats_key(p) for p in placas])
+    return {placa: summarize(docs.get(stats_key(placa))) for placa in placas}
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    print(f"{rebuild()} placas")
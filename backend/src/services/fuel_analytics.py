@@ -0,0 +1,493 @@
+# backend/src/services/fuel_analytics.py
+"""
+Consumo e anomalias de abastecimento calculados sobre colunas NumPy em cache
+(GET /api/fleet/analytics).
+
+Cada worker guarda fleet_fuel_logs em colunas (placa, combustível e posto
+codificados, data como inteiro YYYYMMDD, odômetro, litros, preço e valor)
+e analisa com ordenação + operações por grupo, sem laço por abastecimento:
+
+- km/l por veículo: abastecimentos ordenados por (placa, data, odômetro);
+  os km entre duas leituras de odômetro são divididos pelos litros
+  abastecidos depois da primeira até a segunda (método do tanque cheio).
+  O odômetro usado é o máximo acumulado da placa, então uma leitura que
+  volta atrás não gera km negativos nem infla o trecho seguinte; os litros
+  e o valor dela seguem na conta, junto com os km até a próxima leitura.
+- odometer_regressions: leitura menor que a maior leitura anterior da
+  mesma placa (previous_* é a leitura que marcou esse máximo).
+- price_outliers: preço/litro longe da mediana do combustível
+  (|preço - mediana| / max(1,4826 * MAD, 1% da mediana) > PRICE_Z),
+  só em combustíveis com pelo menos PRICE_MIN_FILLS abastecimentos.
+  A mediana por (combustível, posto) sai em "postos".
+- value_mismatches: valor_total diferente de litros * preco_litro além
+  de max(VALUE_TOL_ABS, VALUE_TOL_REL * esperado).
+
+O resultado fica memorizado por filtro até a próxima escrita de
+abastecimento: as rotas de fleet chamam upsert()/remove() depois de gravar.
+Escritas feitas em outro worker aparecem quando as colunas são
+recarregadas, a cada FUEL_ANALYTICS_TTL segundos (padrão 300; 0 = nunca
+expira). Com período, o primeiro abastecimento da janela não tem trecho
+anterior (não entra no km/l nem nas regressões).
+"""
+import os
+import time
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .firestore_service import get_all_documents
+
+COLLECTION = "fleet_fuel_logs"
+TTL_S = float(os.getenv("FUEL_ANALYTICS_TTL", "300"))
+
+PRICE_Z = 3.5
+PRICE_MIN_FILLS = 5
+VALUE_TOL_ABS = 0.10
+VALUE_TOL_REL = 0.01
+# itens por lista de anomalias na resposta (as contagens são sempre completas)
+MAX_ANOMALIES = 500
+# filtros diferentes memorizados ao mesmo tempo
+MAX_MEMO = 64
+
+_COLUMNS = ("_placa", "_date", "_odo", "_litros", "_preco", "_valor", "_fuel", "_posto", "_alive")
+
+
+def _date_int(v) -> int:
+    """'YYYY-MM-DD' -> 20240315 (0 se vazio/ inválido)."""
+    s = str(v or "")
+    if len(s) >= 10 and s[4] == "-" and s[7] == "-":
+        try:
+            return int(s[:4]) * 10000 + int(s[5:7]) * 100 + int(s[8:10])
+        except ValueError:
+            return 0
+    return 0
+
+
+def _date_str(n) -> str:
+    n = int(n)
+    return f"{n // 10000:04d}-{n // 100 % 100:02d}-{n % 100:02d}" if n else ""
+
+
+def _number(v) -> float:
+    """float do campo (NaN se ausente ou inválido)."""
+    if v is None or v == "":
+        return np.nan
+    try:
+        n = float(v)
+    except (TypeError, ValueError):
+        return np.nan
+    return n if np.isfinite(n) else np.nan
+
+
+def _round(v, digits=2):
+    return round(float(v), digits) if np.isfinite(v) else None
+
+
+class _Codes:
+    """Texto livre -> código inteiro (mesma grafia sem caixa/espaços = mesmo código)."""
+
+    def __init__(self):
+        self.labels = []
+        self._code = {}
+
+    def get(self, value) -> int:
+        """Código já existente (-1 se o valor nunca apareceu)."""
+        return self._code.get(" ".join(str(value or "").split()).casefold(), -1)
+
+    def __call__(self, value) -> int:
+        label = " ".join(str(value or "").split())
+        key = label.casefold()
+        code = self._code.get(key)
+        if code is None:
+            code = len(self.labels)
+            self.labels.append(label)
+            self._code[key] = code
+        return code
+
+
+class FuelAnalytics:
+    def __init__(self, ttl: float = TTL_S):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._memo = {}
+        self._version = 0                    # muda a cada escrita/recarga
+        self._hits = 0
+        self._misses = 0
+        self._reset(0)
+
+    # ---------------------------
+    # Armazenamento
+    # ---------------------------
+    def _reset(self, capacity):
+        capacity = max(capacity, 64)
+        self._n = 0
+        self._row = {}                       # id -> linha
+        self._ids = [None] * capacity        # linha -> id
+        self._placa = np.zeros(capacity, dtype=np.int32)
+        self._date = np.zeros(capacity, dtype=np.int32)
+        self._odo = np.full(capacity, np.nan)
+        self._litros = np.full(capacity, np.nan)
+        self._preco = np.full(capacity, np.nan)
+        self._valor = np.full(capacity, np.nan)
+        self._fuel = np.zeros(capacity, dtype=np.int32)
+        self._posto = np.zeros(capacity, dtype=np.int32)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._placas = _Codes()
+        self._fuels = _Codes()
+        self._postos = _Codes()
+
+    def _grow(self):
+        capacity = len(self._date) * 2
+        for name in _COLUMNS:
+            old = getattr(self, name)
+            new = np.full(capacity, np.nan) if old.dtype == np.float64 else np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self._ids.extend([None] * (capacity - len(self._ids)))
+
+    def _write(self, doc_id, doc):
+        row = self._row.get(doc_id)
+        if row is None:
+            if self._n == len(self._date):
+                self._grow()
+            row = self._n
+            self._n += 1
+            self._row[doc_id] = row
+            self._ids[row] = doc_id
+        odo = _number(doc.get("odometro"))
+        self._placa[row] = self._placas(str(doc.get("placa") or "").upper())
+        self._date[row] = _date_int(doc.get("data"))
+        self._odo[row] = odo if odo > 0 else np.nan  # 0 = não informado
+        self._litros[row] = _number(doc.get("litros"))
+        self._preco[row] = _number(doc.get("preco_litro"))
+        self._valor[row] = _number(doc.get("valor_total"))
+        self._fuel[row] = self._fuels(doc.get("combustivel"))
+        self._posto[row] = self._postos(doc.get("posto"))
+        self._alive[row] = True
+
+    def _compact(self):
+        """Regrava só as linhas vivas quando as apagadas passam de 1/4."""
+        dead = self._n - len(self._row)
+        if dead < 64 or dead * 4 < self._n:
+            return
+        keep = np.flatnonzero(self._alive[:self._n])
+        ids = [self._ids[i] for i in keep]
+        for name in _COLUMNS:
+            col = getattr(self, name)
+            col[:len(keep)] = col[keep]
+        self._alive[len(keep):self._n] = False
+        self._ids[:self._n] = ids + [None] * (self._n - len(keep))
+        self._row = {doc_id: i for i, doc_id in enumerate(ids)}
+        self._n = len(keep)
+
+    # ---------------------------
+    # Manutenção
+    # ---------------------------
+    def load(self, docs=None):
+        """Recarrega a coleção inteira (ou a lista dada)."""
+        if docs is None:
+            docs = get_all_documents(COLLECTION) or []
+        with self._lock:
+            self._reset(len(docs) * 2)
+            for doc in docs:
+                if doc.get("id"):
+                    self._write(doc["id"], doc)
+            self._loaded_at = time.time()
+            self._changed()
+
+    def _changed(self):
+        self._version += 1
+        self._memo.clear()
+
+    def _ensure(self):
+        if self._loaded_at is not None and (self.ttl <= 0 or time.time() - self._loaded_at < self.ttl):
+            return
+        self.load()
+
+    def upsert(self, doc_id, doc):
+        """Chamado depois de gravar o abastecimento (doc completo). Descarta os resultados memorizados."""
+        with self._lock:
+            self._changed()
+            if self._loaded_at is not None and doc_id:
+                self._write(doc_id, doc)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._changed()
+            if self._loaded_at is None:
+                return
+            row = self._row.pop(doc_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._ids[row] = None
+                self._compact()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+            self._changed()
+
+    # ---------------------------
+    # Análise
+    # ---------------------------
+    def analytics(self, placa=None, date_from=None, date_to=None) -> dict:
+        """
+        placa: só essa placa; date_from/date_to: 'YYYY-MM-DD' (inclusive)
+        sobre data. Resultado memorizado até a próxima escrita.
+        """
+        key = ((placa or "").upper() or None, date_from or None, date_to or None)
+        with self._lock:
+            self._ensure()
+            cached = self._memo.get(key)
+            if cached is not None:
+                self._hits += 1
+                return cached
+            self._misses += 1
+            n = self._n
+            mask = self._alive[:n].copy()
+            if key[0] is not None:
+                mask &= self._placa[:n] == self._placas.get(key[0])
+            if date_from:
+                mask &= self._date[:n] >= _date_int(date_from)
+            if date_to:
+                mask &= self._date[:n] <= _date_int(date_to)
+            rows = np.flatnonzero(mask)
+            cols = {name[1:]: getattr(self, name)[rows] for name in _COLUMNS if name != "_alive"}
+            ids = [self._ids[i] for i in rows]
+            labels = {
+                "placa": list(self._placas.labels),
+                "fuel": list(self._fuels.labels),
+                "posto": list(self._postos.labels),
+            }
+            version = self._version
+
+        result = _analyze(cols, np.array(ids, dtype=object), labels)
+        result["filters"] = {"placa": key[0], "from": date_from or None, "to": date_to or None}
+        result["computed_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._lock:
+            # escrita durante o cálculo: o resultado já nasceu velho, não memoriza
+            if version == self._version:
+                if len(self._memo) >= MAX_MEMO:
+                    self._memo.clear()
+                self._memo[key] = result
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": len(self._row),
+                "capacity": len(self._date),
+                "placas": len(self._placas.labels),
+                "memo": len(self._memo),
+                "memo_hits": self._hits,
+                "memo_misses": self._misses,
+                "loaded_s_ago": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+                "ttl_s": self.ttl,
+            }
+
+
+# ---------------------------
+# Cálculo (arrays já filtrados)
+# ---------------------------
+def _group_median(keys, values):
+    """
+    Mediana de values por chave (keys inteiros). Retorna
+    (chaves únicas, medianas, contagens, índice da chave de cada elemento).
+    """
+    order = np.lexsort((values, keys))
+    k, v = keys[order], values[order]
+    uniq, start, counts = np.unique(k, return_index=True, return_counts=True)
+    lo = start + (counts - 1) // 2
+    hi = start + counts // 2
+    medians = (v[lo] + v[hi]) / 2.0
+    return uniq, medians, counts, np.searchsorted(uniq, keys)
+
+
+def _vehicles(c, ids, labels):
+    """km/l, custo por km e regressões de odômetro por placa."""
+    order = np.lexsort((np.nan_to_num(c["odo"], nan=np.inf), c["date"], c["placa"]))
+    placa, date, odo = c["placa"][order], c["date"][order], c["odo"][order]
+    litros = np.nan_to_num(c["litros"][order])
+    valor = np.nan_to_num(c["valor"][order])
+    sid = ids[order]
+
+    uniq, start, counts = np.unique(placa, return_index=True, return_counts=True)
+    end = start + counts - 1
+    group = np.repeat(np.arange(len(uniq)), counts)
+    size = len(uniq)
+
+    # trechos entre leituras de odômetro consecutivas da mesma placa
+    known = np.flatnonzero(np.isfinite(odo))
+    a, b = known[:-1], known[1:]
+    same = group[a] == group[b]
+    a, b = a[same], b[same]
+
+    # máximo acumulado por placa: o deslocamento por grupo mantém o cummax dentro da placa
+    span = (np.nanmax(odo) + 1.0) if len(known) else 1.0
+    g = group[known]
+    running = np.maximum.accumulate(odo[known] + g * span) - g * span
+    eff = np.full(len(odo), np.nan)
+    eff[known] = running
+    # leitura que marcou o máximo acumulado até cada posição
+    pos = np.arange(len(known))
+    top = np.full(len(odo), -1)
+    top[known] = known[np.maximum.accumulate(np.where(odo[known] >= running, pos, 0))]
+    cum_l = np.concatenate(([0.0], np.cumsum(litros)))
+    cum_v = np.concatenate(([0.0], np.cumsum(valor)))
+    km = eff[b] - eff[a]
+    seg_l = cum_l[b + 1] - cum_l[a + 1]  # litros depois da leitura a até a leitura b
+    seg_v = cum_v[b + 1] - cum_v[a + 1]
+    seg_group = group[a]
+
+    km_sum = np.bincount(seg_group, weights=km, minlength=size)
+    seg_l_sum = np.bincount(seg_group, weights=seg_l, minlength=size)
+    seg_v_sum = np.bincount(seg_group, weights=seg_v, minlength=size)
+    regress = odo[b] < eff[a]
+    reg_count = np.bincount(seg_group[regress], minlength=size)
+    litros_sum = np.bincount(group, weights=litros, minlength=size)
+    valor_sum = np.bincount(group, weights=valor, minlength=size)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        km_l = np.where((km_sum > 0) & (seg_l_sum > 0), km_sum / seg_l_sum, np.nan)
+        custo_km = np.where(km_sum > 0, seg_v_sum / km_sum, np.nan)
+
+    vehicles = [
+        {
+            "placa": labels["placa"][int(uniq[i])],
+            "fills": int(counts[i]),
+            "litros": round(float(litros_sum[i]), 2),
+            "valor_total": round(float(valor_sum[i]), 2),
+            "km": round(float(km_sum[i]), 1),
+            "km_l": _round(km_l[i]),
+            "custo_km": _round(custo_km[i], 3),
+            "first_data": _date_str(date[start[i]]),
+            "last_data": _date_str(date[end[i]]),
+            "odometer_regressions": int(reg_count[i]),
+        }
+        for i in range(size)
+    ]
+    ra, rb = top[a[regress]], b[regress]
+    regressions = [
+        {
+            "id": sid[rb[i]],
+            "placa": labels["placa"][int(placa[rb[i]])],
+            "data": _date_str(date[rb[i]]),
+            "odometro": int(odo[rb[i]]),
+            "previous_id": sid[ra[i]],
+            "previous_data": _date_str(date[ra[i]]),
+            "previous_odometro": int(odo[ra[i]]),
+        }
+        for i in range(min(len(rb), MAX_ANOMALIES))
+    ]
+    return vehicles, regressions, int(regress.sum())
+
+
+def _prices(c, ids, labels):
+    """Mediana de preço por combustível e por (combustível, posto) e os preços fora da curva."""
+    priced = np.flatnonzero(c["preco"] > 0)
+    if not len(priced):
+        return [], [], [], 0
+    preco, fuel, posto = c["preco"][priced], c["fuel"][priced], c["posto"][priced]
+
+    uniq, med, counts, inv = _group_median(fuel, preco)
+    _, mad, _, _ = _group_median(fuel, np.abs(preco - med[inv]))
+    scale = np.maximum(1.4826 * mad, 0.01 * med)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (preco - med[inv]) / scale[inv]
+    judged = counts[inv] >= PRICE_MIN_FILLS
+    flagged = np.flatnonzero(judged & (np.abs(z) > PRICE_Z))
+    # maiores desvios primeiro
+    flagged = flagged[np.argsort(-np.abs(z[flagged]), kind="stable")]
+
+    fuels = [
+        {
+            "combustivel": labels["fuel"][int(uniq[i])],
+            "fills": int(counts[i]),
+            "median_preco": round(float(med[i]), 3),
+            "mad": round(float(mad[i]), 3),
+        }
+        for i in range(len(uniq))
+    ]
+
+    pair = fuel.astype(np.int64) * (len(labels["posto"]) + 1) + posto
+    p_uniq, p_med, p_counts, _ = _group_median(pair, preco)
+    p_fuel = p_uniq // (len(labels["posto"]) + 1)
+    fuel_med = med[np.searchsorted(uniq, p_fuel)]
+    postos = [
+        {
+            "combustivel": labels["fuel"][int(p_fuel[i])],
+            "posto": labels["posto"][int(p_uniq[i] % (len(labels["posto"]) + 1))],
+            "fills": int(p_counts[i]),
+            "median_preco": round(float(p_med[i]), 3),
+            "vs_fuel_median_pct": round(float((p_med[i] / fuel_med[i] - 1) * 100), 1),
+        }
+        for i in range(len(p_uniq))
+    ]
+
+    sid = ids[priced]
+    outliers = [
+        {
+            "id": sid[j],
+            "placa": labels["placa"][int(c["placa"][priced[j]])],
+            "data": _date_str(c["date"][priced[j]]),
+            "combustivel": labels["fuel"][int(fuel[j])],
+            "posto": labels["posto"][int(posto[j])],
+            "preco_litro": round(float(preco[j]), 3),
+            "median_preco": round(float(med[inv[j]]), 3),
+            "z": round(float(z[j]), 1),
+        }
+        for j in flagged[:MAX_ANOMALIES]
+    ]
+    return fuels, postos, outliers, len(flagged)
+
+
+def _mismatches(c, ids, labels):
+    """Abastecimentos com valor_total diferente de litros * preco_litro."""
+    litros, preco, valor = c["litros"], c["preco"], c["valor"]
+    expected = litros * preco
+    valid = (litros > 0) & (preco > 0)
+    diff = np.nan_to_num(valor) - expected
+    tol = np.maximum(VALUE_TOL_ABS, VALUE_TOL_REL * expected)
+    flagged = np.flatnonzero(valid & (np.abs(diff) > tol))
+    flagged = flagged[np.argsort(-np.abs(diff[flagged]), kind="stable")]
+    out = [
+        {
+            "id": ids[j],
+            "placa": labels["placa"][int(c["placa"][j])],
+            "data": _date_str(c["date"][j]),
+            "litros": round(float(litros[j]), 3),
+            "preco_litro": round(float(preco[j]), 3),
+            "valor_total": _round(valor[j]),
+            "expected": round(float(expected[j]), 2),
+            "diff": round(float(diff[j]), 2),
+        }
+        for j in flagged[:MAX_ANOMALIES]
+    ]
+    return out, len(flagged)
+
+
+def _analyze(c, ids, labels) -> dict:
+    vehicles, regressions, n_reg = _vehicles(c, ids, labels)
+    fuels, postos, outliers, n_out = _prices(c, ids, labels)
+    mismatches, n_mis = _mismatches(c, ids, labels)
+    return {
+        "fills": int(len(ids)),
+        "vehicles": vehicles,
+        "fuels": fuels,
+        "postos": postos,
+        "anomaly_counts": {
+            "odometer_regressions": n_reg,
+            "price_outliers": n_out,
+            "value_mismatches": n_mis,
+        },
+        "anomalies": {
+            "odometer_regressions": regressions,
+            "price_outliers": outliers,
+            "value_mismatches": mismatches,
+        },
+    }
+
+
+fuel_analytics = FuelAnalytics()
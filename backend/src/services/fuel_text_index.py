@@ -0,0 +1,149 @@
+# backend/src/services/fuel_text_index.py
+"""
+Índice de trigramas dos campos de texto livre dos abastecimentos
+(motorista, posto, carro) para os filtros "contém" da listagem.
+
+Cada campo guarda, por trigrama do valor (sem caixa), o conjunto de ids
+que o contêm. Buscar "silva" intersecta os conjuntos de "sil", "ilv" e
+"lva" e confirma a substring só nesses candidatos, em vez de ler e
+comparar o histórico inteiro. Termos com menos de 3 caracteres comparam
+direto os valores guardados (em memória, sem leitura no Firestore).
+
+O índice é por processo: montado na primeira busca a partir de
+fleet_fuel_logs e atualizado pelas rotas de fleet em create/update/delete.
+Escritas feitas em outro worker só aparecem quando o índice é remontado, a
+cada FUEL_TEXT_INDEX_TTL segundos (padrão 300; 0 = nunca expira).
+"""
+import os
+import time
+import threading
+
+from .firestore_service import get_all_documents
+
+FUEL_LOGS = "fleet_fuel_logs"
+FIELDS = ("motorista", "posto", "carro")
+TTL_S = float(os.getenv("FUEL_TEXT_INDEX_TTL", "300"))
+
+
+def _norm(value) -> str:
+    return " ".join(str(value or "").split()).casefold()
+
+
+def trigrams(text: str):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class FuelTextIndex:
+    def __init__(self, ttl: float = TTL_S):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._values = {f: {} for f in FIELDS}     # campo -> {id: valor normalizado}
+        self._grams = {f: {} for f in FIELDS}      # campo -> {trigrama: {ids}}
+        self._built_at = None
+
+    # --- manutenção ---
+    def _ensure(self):
+        if self._built_at is not None and (self.ttl <= 0 or time.time() - self._built_at < self.ttl):
+            return
+        self.rebuild()
+
+    def rebuild(self, docs=None):
+        """Remonta a partir de fleet_fuel_logs (ou da lista dada)."""
+        if docs is None:
+            docs = get_all_documents(FUEL_LOGS) or []
+        with self._lock:
+            self._values = {f: {} for f in FIELDS}
+            self._grams = {f: {} for f in FIELDS}
+            for doc in docs:
+                if doc.get("id"):
+                    self._add(doc["id"], doc)
+            self._built_at = time.time()
+
+    def _add(self, doc_id, doc):
+        for field in FIELDS:
+            value = _norm(doc.get(field))
+            if not value:
+                continue
+            self._values[field][doc_id] = value
+            grams = self._grams[field]
+            for g in trigrams(value):
+                grams.setdefault(g, set()).add(doc_id)
+
+    def _drop(self, doc_id):
+        for field in FIELDS:
+            value = self._values[field].pop(doc_id, None)
+            if not value:
+                continue
+            grams = self._grams[field]
+            for g in trigrams(value):
+                ids = grams.get(g)
+                if ids is not None:
+                    ids.discard(doc_id)
+                    if not ids:
+                        del grams[g]
+
+    def upsert(self, doc_id, doc):
+        """
+        Chamado depois de gravar o abastecimento. doc pode ser parcial (patch):
+        campos ausentes mantêm o valor indexado. Sem índice montado, não faz nada.
+        """
+        with self._lock:
+            if self._built_at is None:
+                return
+            current = {f: self._values[f].get(doc_id) for f in FIELDS}
+            current.update({f: doc[f] for f in FIELDS if f in doc})
+            self._drop(doc_id)
+            self._add(doc_id, current)
+
+    def remove(self, doc_id):
+        with self._lock:
+            if self._built_at is not None:
+                self._drop(doc_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    # --- consultas ---
+    def _search(self, field, term):
+        values = self._values[field]
+        if len(term) < 3:
+            return {doc_id for doc_id, v in values.items() if term in v}
+        grams = self._grams[field]
+        candidates = None
+        # menor conjunto primeiro: as interseções seguintes ficam baratas
+        for ids in sorted((grams.get(g, set()) for g in trigrams(term)), key=len):
+            candidates = set(ids) if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+        return {doc_id for doc_id in candidates if term in values[doc_id]}
+
+    def search(self, terms: dict):
+        """
+        terms: {campo: termo} (termos vazios são ignorados). Retorna o
+        conjunto de ids que contêm todos os termos, ou None se não houver termo.
+        """
+        terms = {f: _norm(t) for f, t in (terms or {}).items() if f in FIELDS and _norm(t)}
+        if not terms:
+            return None
+        out = None
+        with self._lock:
+            self._ensure()
+            for field, term in sorted(terms.items(), key=lambda kv: -len(kv[1])):
+                ids = self._search(field, term)
+                out = ids if out is None else out & ids
+                if not out:
+                    return set()
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "docs": len(set().union(*(v.keys() for v in self._values.values()))),
+                "trigrams": {f: len(self._grams[f]) for f in FIELDS},
+                "built_s_ago": round(time.time() - self._built_at, 1) if self._built_at else None,
+                "ttl_s": self.ttl,
+            }
+
+
+fuel_text_index = FuelTextIndex()
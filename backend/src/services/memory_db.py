@@ -1,100 +1,556 @@
-import uuid
-from datetime import datetime
+# backend/src/services/memory_db.py
+"""
+Banco em memória que imita a superfície do cliente Firestore usada pelo app,
+para teste de carga e benchmark local (sem rede, sem credenciais).
 
+Selecionado em firestore_service.get_db() com FIRESTORE_BACKEND=memory.
+
+Suporta:
+  - coleções criadas sob demanda; ids de 20 caracteres como no Firestore
+  - document(): get/set(merge)/update (caminhos com ponto)/delete/create
+  - consultas: where (==, !=, <, <=, >, >=, in, not-in, array_contains,
+    array_contains_any; posicional ou filter=FieldFilter), order_by,
+    limit, limit_to_last, offset, start_at/start_after/end_at/end_before
+    (snapshot, dict ou lista), select, count(), stream/get
+  - batch(), get_all(), transaction() (ver firestore_service.run_transaction);
+    commit atômico como no Firestore: se uma escrita falha, nenhuma vale
+  - sentinelas: SERVER_TIMESTAMP, DELETE_FIELD, Increment, ArrayUnion, ArrayRemove
+  - latência simulada por RPC: MEMORY_DB_LATENCY_MS (+ MEMORY_DB_JITTER_MS)
+
+Semântica de filtros/ordenação igual à de firestore_query (campo ausente
+não casa; ordem entre tipos do Firestore; order_by exclui docs sem o campo).
+"""
+import os
+import copy
+import time
+import random
+import string
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from .firestore_query import Filter, match_filter, sort_key, get_field, RANGE_OPS
+from .firestore_query import _ABSENT as _FIELD_ABSENT
+
+try:
+    from google.cloud.firestore_v1 import transforms as _transforms
+except Exception:  # pragma: no cover - sem google-cloud-firestore instalado
+    _transforms = None
+
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+_ID_CHARS = string.ascii_letters + string.digits
+_DELETE = object()
+
+
+def _new_id():
+    return "".join(random.choice(_ID_CHARS) for _ in range(20))
+
+
+def _clone(v):
+    """Cópia de dicts/listas aninhados (valores escalares são imutáveis)."""
+    if isinstance(v, dict):
+        return {k: _clone(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_clone(x) for x in v]
+    return v
+
+
+# ---------------------------
+# Sentinelas / transforms
+# ---------------------------
+def _kind(v):
+    if _transforms is not None:
+        if v is _transforms.SERVER_TIMESTAMP:
+            return "server_timestamp"
+        if v is _transforms.DELETE_FIELD:
+            return "delete"
+        if isinstance(v, _transforms.Increment):
+            return "increment"
+        if isinstance(v, _transforms.ArrayUnion):
+            return "array_union"
+        if isinstance(v, _transforms.ArrayRemove):
+            return "array_remove"
+    return None
+
+
+def _apply_value(current, v):
+    """Resolve sentinelas contra o valor atual. Retorna _DELETE para apagar."""
+    k = _kind(v)
+    if k is None:
+        return _clone(v)
+    if k == "server_timestamp":
+        return datetime.now(timezone.utc)
+    if k == "delete":
+        return _DELETE
+    if k == "increment":
+        base = current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0
+        return base + v.value
+    if k == "array_union":
+        out = list(current) if isinstance(current, list) else []
+        for x in v.values:
+            if x not in out:
+                out.append(_clone(x))
+        return out
+    if k == "array_remove":
+        out = list(current) if isinstance(current, list) else []
+        return [x for x in out if x not in v.values]
+    return _clone(v)
+
+
+def _set_path(doc, path, v):
+    parts = path.split(".")
+    cur = doc
+    for p in parts[:-1]:
+        nxt = cur.get(p)
+        if not isinstance(nxt, dict):
+            nxt = {}
+            cur[p] = nxt
+        cur = nxt
+    new = _apply_value(cur.get(parts[-1]), v)
+    if new is _DELETE:
+        cur.pop(parts[-1], None)
+    else:
+        cur[parts[-1]] = new
+
+
+def _merge(doc, data):
+    """set(..., merge=True): mescla dicts aninhados."""
+    for k, v in data.items():
+        if isinstance(v, dict) and _kind(v) is None:
+            # mapa: mescla campo a campo (sentinelas aninhadas valem mesmo sem o mapa existir)
+            if not isinstance(doc.get(k), dict):
+                doc[k] = {}
+            _merge(doc[k], v)
+        else:
+            new = _apply_value(doc.get(k), v)
+            if new is _DELETE:
+                doc.pop(k, None)
+            else:
+                doc[k] = new
+
+
+def _resolve(data):
+    """set() sem merge: resolve sentinelas num documento novo."""
+    out = {}
+    _merge(out, data or {})
+    return out
+
+
+# ---------------------------
+# Banco
+# ---------------------------
 class MemoryDB:
-    def __init__(self):
-        self.collections = {
-            'users': {},
-            'clients': {},
-            'materials': {},
-            'actions': {},
-            'job_vacancies': {},
-            'finance_transactions': {}
-        }
-    
+    def __init__(self, latency_ms=None, jitter_ms=None):
+        self.collections = {}
+        self._lock = threading.RLock()
+        self.latency_ms = float(os.getenv("MEMORY_DB_LATENCY_MS", "0") if latency_ms is None else latency_ms)
+        self.jitter_ms = float(os.getenv("MEMORY_DB_JITTER_MS", "0") if jitter_ms is None else jitter_ms)
+        self.project = "memory"
+
+    # latência simulada (uma vez por RPC)
+    def _rpc(self):
+        if self.latency_ms or self.jitter_ms:
+            time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000.0)
+
+    def _data(self, name):
+        data = self.collections.get(name)
+        if data is None:
+            with self._lock:
+                data = self.collections.setdefault(name, {})
+        return data
+
     def collection(self, name):
-        return MemoryCollection(self.collections[name])
+        return MemoryCollection(self, name)
 
-class MemoryCollection:
-    def __init__(self, data):
-        self.data = data
-    
-    def document(self, doc_id=None):
-        if doc_id is None:
-            doc_id = str(uuid.uuid4())
-        return MemoryDocument(self.data, doc_id)
-    
-    def where(self, field, operator, value):
-        return MemoryQuery(self.data, field, operator, value)
-    
-    def stream(self):
-        for doc_id, doc_data in self.data.items():
-            yield MemoryDocumentSnapshot(doc_id, doc_data)
-    
-    def add(self, data):
-        doc_id = str(uuid.uuid4())
-        self.data[doc_id] = data
-        return (None, MemoryDocumentSnapshot(doc_id, data))
+    def collections_list(self):
+        return [MemoryCollection(self, n) for n in self.collections]
+
+    def batch(self):
+        return MemoryBatch(self)
+
+    def transaction(self, **kwargs):
+        return MemoryTransaction(self)
 
+    def get_all(self, refs, field_paths=None, transaction=None):
+        self._rpc()
+        with self._lock:
+            return [ref._snapshot(field_paths) for ref in refs]
+
+    # utilitários para seed/benchmark
+    def load(self, collection, docs):
+        """Insere docs (dicts; 'id' opcional) sem latência simulada. Retorna os ids."""
+        data = self._data(collection)
+        ids = []
+        with self._lock:
+            for d in docs:
+                d = dict(d)
+                doc_id = str(d.pop("id", "") or _new_id())
+                data[doc_id] = _resolve(d)
+                ids.append(doc_id)
+        return ids
+
+    def reset(self, collection=None):
+        with self._lock:
+            if collection is None:
+                self.collections.clear()
+            else:
+                self.collections.pop(collection, None)
+
+
+# ---------------------------
+# Documentos
+# ---------------------------
 class MemoryDocument:
-    def __init__(self, collection_data, doc_id):
-        self.collection_data = collection_data
+    def __init__(self, db, collection, doc_id):
+        self._db = db
+        self._collection = collection
         self.id = doc_id
-    
-    def set(self, data):
-        self.collection_data[self.id] = data
-    
-    def get(self):
-        if self.id in self.collection_data:
-            return MemoryDocumentSnapshot(self.id, self.collection_data[self.id])
-        return MemoryDocumentSnapshot(self.id, None)
-    
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    @property
+    def parent(self):
+        return MemoryCollection(self._db, self._collection)
+
+    def __eq__(self, other):
+        return isinstance(other, MemoryDocument) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def _snapshot(self, field_paths=None):
+        data = self._db._data(self._collection).get(self.id)
+        if data is not None:
+            data = _project(data, field_paths)
+        return MemoryDocumentSnapshot(self.id, data, self)
+
+    def get(self, field_paths=None, transaction=None):
+        self._db._rpc()
+        with self._db._lock:
+            return self._snapshot(field_paths)
+
+    def _write_set(self, data, merge=False):
+        col = self._db._data(self._collection)
+        if merge and self.id in col:
+            _merge(col[self.id], data or {})
+        else:
+            col[self.id] = _resolve(data)
+
+    def _write_update(self, data):
+        col = self._db._data(self._collection)
+        if self.id not in col:
+            raise KeyError(f"No document to update: {self.path}")
+        for k, v in (data or {}).items():
+            _set_path(col[self.id], k, v)
+
+    def _write_create(self, data):
+        col = self._db._data(self._collection)
+        if self.id in col:
+            raise KeyError(f"Document already exists: {self.path}")
+        col[self.id] = _resolve(data)
+
+    def _write_delete(self):
+        self._db._data(self._collection).pop(self.id, None)
+
+    def set(self, data, merge=False):
+        self._db._rpc()
+        with self._db._lock:
+            self._write_set(data, merge)
+
+    def create(self, data):
+        self._db._rpc()
+        with self._db._lock:
+            self._write_create(data)
+
     def update(self, data):
-        if self.id in self.collection_data:
-            self.collection_data[self.id].update(data)
-    
+        self._db._rpc()
+        with self._db._lock:
+            self._write_update(data)
+
     def delete(self):
-        if self.id in self.collection_data:
-            del self.collection_data[self.id]
+        self._db._rpc()
+        with self._db._lock:
+            self._write_delete()
+
 
 class MemoryDocumentSnapshot:
-    def __init__(self, doc_id, data):
+    def __init__(self, doc_id, data, reference=None):
         self.id = doc_id
-        self.data = data
-    
+        self._data = data
+        self.reference = reference
+
     @property
     def exists(self):
-        return self.data is not None
-    
+        return self._data is not None
+
     def to_dict(self):
-        return self.data or {}
+        return _clone(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        v = get_field(self._data or {}, field_path)
+        if v is _FIELD_ABSENT:
+            raise KeyError(field_path)
+        return _clone(v)
+
+
 
+def _project(data, field_paths):
+    if not field_paths:
+        return data
+    out = {}
+    for path in field_paths:
+        v = get_field(data, path)
+        if v is not _FIELD_ABSENT:
+            _set_path(out, path, v)
+    return out
+
+
+# ---------------------------
+# Consultas
+# ---------------------------
 class MemoryQuery:
-    def __init__(self, collection_data, field, operator, value):
-        self.collection_data = collection_data
-        self.field = field
-        self.operator = operator
-        self.value = value
-    
+    def __init__(self, db, collection, filters=(), orders=(), limit=None, limit_to_last=False,
+                 offset=0, start=None, end=None, projection=None):
+        self._db = db
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._limit_to_last = limit_to_last
+        self._offset = offset
+        self._start = start  # (valores, inclusivo)
+        self._end = end
+        self._projection = projection
+
+    def _copy(self, **changes):
+        kw = dict(
+            filters=self._filters, orders=self._orders, limit=self._limit,
+            limit_to_last=self._limit_to_last, offset=self._offset,
+            start=self._start, end=self._end, projection=self._projection,
+        )
+        kw.update(changes)
+        return MemoryQuery(self._db, self._collection, **kw)
+
+    # --- construção ---
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            if not hasattr(filter, "field_path"):
+                raise NotImplementedError("MemoryDB: filtros compostos (Or/And) não suportados")
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + (Filter(field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
     def limit(self, count):
+        return self._copy(limit=count, limit_to_last=False)
+
+    def limit_to_last(self, count):
+        return self._copy(limit=count, limit_to_last=True)
+
+    def offset(self, num_to_skip):
+        return self._copy(offset=num_to_skip)
+
+    def select(self, field_paths):
+        return self._copy(projection=list(field_paths))
+
+    def start_at(self, document_fields_or_snapshot):
+        return self._copy(start=(document_fields_or_snapshot, True))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(start=(document_fields_or_snapshot, False))
+
+    def end_at(self, document_fields_or_snapshot):
+        return self._copy(end=(document_fields_or_snapshot, True))
+
+    def end_before(self, document_fields_or_snapshot):
+        return self._copy(end=(document_fields_or_snapshot, False))
+
+    def count(self, alias=None):
+        return MemoryAggregateQuery(self, alias or "field_1")
+
+    # --- execução ---
+    def _effective_orders(self):
+        orders = list(self._orders)
+        if not orders:
+            # como no Firestore: desigualdade sem order_by ordena pelo campo dela
+            for f in self._filters:
+                if f.op in RANGE_OPS:
+                    orders.append((f.field, ASCENDING))
+                    break
+        last_dir = orders[-1][1] if orders else ASCENDING
+        return orders, last_dir
+
+    def _cursor_values(self, cursor, orders):
+        """snapshot | dict | lista -> lista de valores (+ id no caso de snapshot)."""
+        if isinstance(cursor, MemoryDocumentSnapshot):
+            data = cursor._data or {}
+            return [get_field(data, f) for f, _ in orders] + [cursor.id]
+        if isinstance(cursor, dict):
+            return [cursor.get(f, _FIELD_ABSENT) for f, _ in orders]
+        return list(cursor)
+
+    @staticmethod
+    def _cmp(doc_vals, cursor_vals, dirs):
+        """-1/0/1 na ordem da consulta, comparando só os componentes do cursor."""
+        for dv, cv, d in zip(doc_vals, cursor_vals, dirs):
+            a, b = sort_key(dv), sort_key(cv)
+            if a == b:
+                continue
+            res = -1 if a < b else 1
+            return -res if d == DESCENDING else res
+        return 0
+
+    def _run(self):
+        data = self._db._data(self._collection)
+        orders, last_dir = self._effective_orders()
+        rows = []
+        for doc_id, doc in data.items():
+            if any(get_field(doc, f) is _FIELD_ABSENT for f, _ in orders):
+                continue
+            if all(match_filter(doc, f) for f in self._filters):
+                rows.append((doc_id, doc))
+
+        # ordena do critério menos significativo (id) para o mais significativo
+        rows.sort(key=lambda r: r[0], reverse=(last_dir == DESCENDING))
+        for field, direction in reversed(orders):
+            rows.sort(key=lambda r: sort_key(get_field(r[1], field)), reverse=(direction == DESCENDING))
+
+        dirs = [d for _, d in orders] + [last_dir]
+
+        def vals(r):
+            return [get_field(r[1], f) for f, _ in orders] + [r[0]]
+
+        if self._start is not None:
+            cursor, inclusive = self._start
+            cv = self._cursor_values(cursor, orders)
+            rows = [r for r in rows if self._cmp(vals(r), cv, dirs) > (-1 if inclusive else 0)]
+        if self._end is not None:
+            cursor, inclusive = self._end
+            cv = self._cursor_values(cursor, orders)
+            rows = [r for r in rows if self._cmp(vals(r), cv, dirs) < (1 if inclusive else 0)]
+
+        if self._offset:
+            rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[-self._limit:] if self._limit_to_last else rows[:self._limit]
+        return rows
+
+    def get(self, transaction=None):
+        self._db._rpc()
+        with self._db._lock:
+            return [
+                MemoryDocumentSnapshot(doc_id, _project(doc, self._projection),
+                                       MemoryDocument(self._db, self._collection, doc_id))
+                for doc_id, doc in self._run()
+            ]
+
+    def stream(self, transaction=None):
+        yield from self.get(transaction)
+
+
+class MemoryCollection(MemoryQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return MemoryDocument(self._db, self._collection, doc_id or _new_id())
+
+    def add(self, data, document_id=None):
+        ref = self.document(document_id)
+        ref.create(data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self):
+        with self._db._lock:
+            return [self.document(i) for i in list(self._db._data(self._collection))]
+
+
+class MemoryAggregateQuery:
+    def __init__(self, query, alias):
+        self._query = query
+        self._alias = alias
+
+    def get(self, transaction=None):
+        self._query._db._rpc()
+        with self._query._db._lock:
+            n = len(self._query._run())
+        return [[SimpleNamespace(alias=self._alias, value=n)]]
+
+    def stream(self, transaction=None):
+        yield from self.get(transaction)
+
+
+# ---------------------------
+# Escritas em lote / transações
+# ---------------------------
+class MemoryBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, reference, document_data, merge=False):
+        self._ops.append((reference, lambda: reference._write_set(document_data, merge)))
+        return self
+
+    def create(self, reference, document_data):
+        self._ops.append((reference, lambda: reference._write_create(document_data)))
+        return self
+
+    def update(self, reference, field_updates, option=None):
+        self._ops.append((reference, lambda: reference._write_update(field_updates)))
         return self
-    
-    def get(self):
-        results = []
-        for doc_id, doc_data in self.collection_data.items():
-            if self._matches(doc_data):
-                results.append(MemoryDocumentSnapshot(doc_id, doc_data))
-        return results
-    
-    def _matches(self, doc_data):
-        if self.field not in doc_data:
-            return False
-        
-        if self.operator == '==':
-            return doc_data[self.field] == self.value
-        # Adicionar outros operadores conforme necessário
-        return False
+
+    def delete(self, reference, option=None):
+        self._ops.append((reference, lambda: reference._write_delete()))
+        return self
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        self._db._rpc()
+        with self._db._lock:
+            # estado anterior dos docs tocados: desfaz tudo se uma escrita falhar
+            before = {}
+            for ref, _ in self._ops:
+                if ref.path not in before:
+                    data = self._db._data(ref._collection).get(ref.id)
+                    before[ref.path] = (ref, copy.deepcopy(data))
+            try:
+                for _, op in self._ops:
+                    op()
+            except Exception:
+                for ref, data in before.values():
+                    col = self._db._data(ref._collection)
+                    if data is None:
+                        col.pop(ref.id, None)
+                    else:
+                        col[ref.id] = data
+                raise
+        ops, self._ops = self._ops, []
+        return [SimpleNamespace(update_time=datetime.now(timezone.utc)) for _ in ops]
+
+
+class MemoryTransaction(MemoryBatch):
+    """
+    Lê dentro do lock do banco; as escritas ficam pendentes até commit.
+    firestore_service.run_transaction segura o lock durante a função inteira,
+    o que serializa as transações (equivalente ao isolamento do Firestore).
+    """
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, MemoryDocument):
+            return ref_or_query.get()
+        return ref_or_query.stream()
+
+    def get_all(self, references):
+        return self._db.get_all(references)
+
 
 # Instância global do banco em memória
 memory_db = MemoryDB()
-
@@ -0,0 +1,195 @@
+# backend/src/services/password_hasher.py
+"""
+bcrypt fora da thread da requisição.
+
+hash/verify rodam num pool limitado (por processo/worker):
+  - BCRYPT_POOL        -> "process" (padrão), "thread" ou "inline"
+  - BCRYPT_WORKERS     -> tamanho do pool (padrão 2)
+  - BCRYPT_MAX_PENDING -> máximo de hashes na fila + em execução; acima disso
+                          PasswordHasherBusy (o login responde 503 na hora,
+                          em vez de empilhar requisições atrás do bcrypt).
+                          A vaga só volta quando o job termina, mesmo que a
+                          requisição tenha desistido por timeout
+  - BCRYPT_ROUNDS      -> custo dos hashes novos (padrão 12); hashes com outro
+                          custo são refeitos no próximo login bem-sucedido
+  - BCRYPT_TIMEOUT_S   -> espera máxima por um resultado (padrão 10)
+
+Com uma rajada de logins, no máximo BCRYPT_WORKERS núcleos ficam no bcrypt
+e o resto das requisições do worker segue andando.
+
+O pool de processos usa forkserver (spawn onde não houver): ele é recriado
+se quebrar, e aí as threads do gRPC já existem (fork com threads vivas pode
+deixar o filho travado num lock). start() sobe os processos no boot do
+worker. Os filhos só rodam as funções de bcrypt_worker (sem Firestore nem
+app). O multiprocessing ainda reimporta neles o script de entrada
+(python src/main.py); para que isso não suba outro pool em cascata, dentro
+de um processo filho do multiprocessing o hash roda inline. Em
+desenvolvimento, prefira python -m src (um __main__ de pacote não é
+reimportado).
+"""
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from . import bcrypt_worker
+
+log = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+POOL_KIND = os.getenv("BCRYPT_POOL", "process").strip().lower()
+WORKERS = max(1, int(os.getenv("BCRYPT_WORKERS", "2")))
+MAX_PENDING = max(1, int(os.getenv("BCRYPT_MAX_PENDING", "32")))
+TIMEOUT_S = float(os.getenv("BCRYPT_TIMEOUT_S", "10"))
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Fila do bcrypt cheia (ou resultado não chegou a tempo)."""
+
+
+# ---------------------------
+# Pool (um por processo; recriado após fork)
+# ---------------------------
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(MAX_PENDING)
+_stats_lock = threading.Lock()
+_stats = {"submitted": 0, "rejected": 0, "timeouts": 0, "rehashed": 0, "in_flight": 0}
+
+
+def _count(key, delta=1):
+    with _stats_lock:
+        _stats[key] += delta
+
+
+def _pool_kind() -> str:
+    # filho do multiprocessing (inclusive enquanto reimporta o script de entrada): nada de pool próprio
+    if multiprocessing.current_process().name != "MainProcess":
+        return "inline"
+    return POOL_KIND
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            if _pool_kind() == "process":
+                _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=_mp_context())
+            else:
+                _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="bcrypt")
+            _pool_pid = pid
+    return _pool
+
+
+def start():
+    """
+    Cria o pool e já sobe os WORKERS processos (chamar no boot, antes do
+    warm-up do Firestore). Sem isso o pool nasce no primeiro login.
+    """
+    if _pool_kind() == "inline":
+        return
+    pool = _get_pool()
+    for f in [pool.submit(bcrypt_worker.ping) for _ in range(WORKERS)]:
+        f.result(timeout=TIMEOUT_S)
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, None
+    if old is not None:
+        old.shutdown(wait=False, cancel_futures=True)
+
+
+def _release(_future=None):
+    _count("in_flight", -1)
+    _pending.release()
+
+
+def _submit(fn, *args):
+    try:
+        return _get_pool().submit(fn, *args)
+    except RuntimeError:
+        # pool morto (processo filho caiu / shutdown): recria uma vez
+        _reset_pool()
+        return _get_pool().submit(fn, *args)
+
+
+def _run(fn, *args):
+    if _pool_kind() == "inline":
+        return fn(*args)
+    if not _pending.acquire(blocking=False):
+        _count("rejected")
+        raise PasswordHasherBusy("fila do bcrypt cheia")
+    _count("submitted")
+    _count("in_flight")
+    try:
+        future = _submit(fn, *args)
+    except Exception:
+        _release()
+        raise
+    # a vaga volta quando o job termina (ou é cancelado), não quando a requisição desiste
+    future.add_done_callback(_release)
+    try:
+        return future.result(timeout=TIMEOUT_S)
+    except FutureTimeout:
+        _count("timeouts")
+        future.cancel()  # só tira da fila; um job já rodando segue ocupando a vaga
+        raise PasswordHasherBusy("bcrypt não respondeu a tempo")
+    except BrokenProcessPool:
+        _reset_pool()
+        log.warning("pool do bcrypt quebrou; executando inline")
+        return fn(*args)
+
+
+# ---------------------------
+# API
+# ---------------------------
+def hash_password(password: str) -> str:
+    return _run(bcrypt_worker.hashpw, password, BCRYPT_ROUNDS)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    if not password_hash:
+        return False
+    return _run(bcrypt_worker.checkpw, password, password_hash)
+
+
+def hash_rounds(password_hash: str):
+    """Custo de um hash "$2b$12$..." (None se o formato não for reconhecido)."""
+    parts = (password_hash or "").split("$")
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash: str) -> bool:
+    return hash_rounds(password_hash) != BCRYPT_ROUNDS
+
+
+def mark_rehashed():
+    _count("rehashed")
+
+
+def stats() -> dict:
+    with _stats_lock:
+        counters = dict(_stats)
+    return {
+        "pool": _pool_kind(),
+        "workers": WORKERS,
+        "rounds": BCRYPT_ROUNDS,
+        "max_pending": MAX_PENDING,
+        **counters,
+    }
@@ -0,0 +1,316 @@
+# backend/src/services/schedule_index.py
+"""
+Índice de agenda por pessoa (supervisor e membros da equipe) para achar
+conflitos de horário entre ações.
+
+Cada pessoa tem uma árvore de intervalos (treap ordenada pelo início, com
+o maior fim da subárvore em cada nó): inserir/remover custa O(log n) e
+buscar as ações que cruzam um intervalo custa O(log n + k), sem varrer a
+agenda inteira.
+
+Intervalo de uma ação: [start_datetime, end_datetime) em 'YYYY-MM-DDTHH:MM:SS';
+sem datetime, vale o dia inteiro (start_date 00:00 até end_date 23:59:59).
+Nomes são comparados sem caixa e sem espaços repetidos.
+
+O índice é por processo: montado na primeira consulta a partir de
+"actions" e atualizado pelo modelo Action em create/update/delete. Escritas
+feitas em outro worker só aparecem quando o índice é remontado, a cada
+SCHEDULE_INDEX_TTL segundos (padrão 300; 0 = nunca expira).
+"""
+import os
+import time
+import random
+import threading
+
+from .firestore_service import get_all_documents
+
+ACTIONS = "actions"
+TTL_S = float(os.getenv("SCHEDULE_INDEX_TTL", "300"))
+
+_DAY_START = "T00:00:00"
+_DAY_END = "T23:59:59"
+
+
+# ---------------------------
+# Árvore de intervalos (treap aumentada)
+# ---------------------------
+class _Node:
+    __slots__ = ("key", "end", "prio", "left", "right", "max_end")
+
+    def __init__(self, key, end):
+        self.key = key          # (início, action_id): único
+        self.end = end
+        self.prio = random.random()
+        self.left = None
+        self.right = None
+        self.max_end = end
+
+
+def _fix(node):
+    m = node.end
+    if node.left is not None and node.left.max_end > m:
+        m = node.left.max_end
+    if node.right is not None and node.right.max_end > m:
+        m = node.right.max_end
+    node.max_end = m
+    return node
+
+
+def _split(node, key):
+    """(< key, >= key)"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        return _fix(node), right
+    left, right = _split(node.left, key)
+    node.left = right
+    return left, _fix(node)
+
+
+def _merge(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prio > b.prio:
+        a.right = _merge(a.right, b)
+        return _fix(a)
+    b.left = _merge(a, b.left)
+    return _fix(b)
+
+
+def _remove(node, key):
+    if node is None:
+        return None
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    return _fix(node)
+
+
+def _overlapping(node, start, end, out):
+    """Nós com início < end e fim > start."""
+    if node is None or node.max_end <= start:
+        return
+    _overlapping(node.left, start, end, out)
+    if node.key[0] < end:
+        if node.end > start:
+            out.append(node)
+        _overlapping(node.right, start, end, out)
+
+
+class IntervalTree:
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, start, end, action_id):
+        left, right = _split(self._root, (start, action_id))
+        self._root = _merge(_merge(left, _Node((start, action_id), end)), right)
+        self._size += 1
+
+    def remove(self, start, action_id):
+        self._root = _remove(self._root, (start, action_id))
+        self._size -= 1
+
+    def overlapping(self, start, end):
+        """[(início, fim, action_id)] que cruzam [start, end), em ordem de início."""
+        out = []
+        _overlapping(self._root, start, end, out)
+        return [(n.key[0], n.end, n.key[1]) for n in out]
+
+
+# ---------------------------
+# Normalização
+# ---------------------------
+def person_key(name) -> str:
+    return " ".join(str(name or "").split()).casefold()
+
+
+def _dt(value, fallback_time):
+    """'YYYY-MM-DD[THH:MM[:SS]]' -> 'YYYY-MM-DDTHH:MM:SS' (None se não reconhecer)."""
+    if not isinstance(value, str) or len(value) < 10:
+        return None
+    day = value[:10]
+    if len(value) == 10:
+        return day + fallback_time
+    clock = value[11:19]
+    if len(clock) == 5:
+        clock += ":00"
+    return f"{day}T{clock}"
+
+
+def action_interval(doc: dict):
+    """(início, fim) da ação ou None se não tiver data."""
+    start = _dt(doc.get("start_datetime"), _DAY_START) or _dt(doc.get("start_date"), _DAY_START)
+    end = (_dt(doc.get("end_datetime"), _DAY_END) or _dt(doc.get("end_date"), _DAY_END)
+           or _dt(doc.get("start_date"), _DAY_END) or start)
+    if not start:
+        return None
+    return start, max(start, end)
+
+
+def action_people(doc: dict) -> dict:
+    """{chave: nome exibido} do supervisor e da equipe."""
+    names = [doc.get("supervisor")]
+    members = doc.get("team_members") or []
+    if isinstance(members, str):
+        members = members.split(",")
+    names.extend(members)
+    out = {}
+    for name in names:
+        key = person_key(name)
+        if key:
+            out.setdefault(key, " ".join(str(name).split()))
+    return out
+
+
+# ---------------------------
+# Índice
+# ---------------------------
+class ScheduleIndex:
+    def __init__(self, ttl: float = TTL_S):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._trees = {}     # pessoa -> IntervalTree
+        self._names = {}     # pessoa -> nome exibido
+        self._actions = {}   # action_id -> (início, fim, {pessoa: nome}, client_name)
+        self._built_at = None
+
+    # --- manutenção ---
+    def _ensure(self):
+        if self._built_at is not None and (self.ttl <= 0 or time.time() - self._built_at < self.ttl):
+            return
+        self.rebuild()
+
+    def rebuild(self, docs=None):
+        """Remonta a partir de "actions" (ou da lista dada)."""
+        if docs is None:
+            docs = get_all_documents(ACTIONS) or []
+        with self._lock:
+            self._trees, self._names, self._actions = {}, {}, {}
+            for doc in docs:
+                if doc.get("id"):
+                    self._add(doc["id"], doc)
+            self._built_at = time.time()
+
+    def _add(self, action_id, doc):
+        interval = action_interval(doc)
+        people = action_people(doc)
+        if not interval or not people:
+            return
+        start, end = interval
+        for key, name in people.items():
+            self._trees.setdefault(key, IntervalTree()).add(start, end, action_id)
+            self._names.setdefault(key, name)
+        self._actions[action_id] = (start, end, people, doc.get("client_name") or "")
+
+    def _drop(self, action_id):
+        entry = self._actions.pop(action_id, None)
+        if not entry:
+            return
+        start, _, people, _ = entry
+        for key in people:
+            tree = self._trees.get(key)
+            if tree is None:
+                continue
+            tree.remove(start, action_id)
+            if not len(tree):
+                del self._trees[key]
+
+    def upsert(self, action_id, doc):
+        """Chamado depois de gravar a ação. Sem índice montado, não faz nada."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._drop(action_id)
+            self._add(action_id, doc)
+
+    def remove(self, action_id):
+        with self._lock:
+            if self._built_at is not None:
+                self._drop(action_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    # --- consultas ---
+    def _entry(self, key, start, end, action_id):
+        _, _, _, client = self._actions.get(action_id, (None, None, None, ""))
+        return {
+            "person": self._names.get(key, key),
+            "action_id": action_id,
+            "client_name": client,
+            "start": start,
+            "end": end,
+        }
+
+    def conflicts_for(self, doc: dict, exclude_id=None) -> list:
+        """
+        Ações já agendadas que colidem com doc (mesma pessoa, horário
+        sobreposto). exclude_id: a própria ação, numa edição.
+        """
+        interval = action_interval(doc)
+        people = action_people(doc)
+        if not interval or not people:
+            return []
+        start, end = interval
+        out = []
+        with self._lock:
+            self._ensure()
+            for key in people:
+                tree = self._trees.get(key)
+                if tree is None:
+                    continue
+                for s, e, action_id in tree.overlapping(start, end):
+                    if action_id != exclude_id:
+                        out.append(self._entry(key, s, e, action_id))
+        return out
+
+    def all_conflicts(self, date_from=None, date_to=None, person=None) -> list:
+        """
+        Pares de ações sobrepostas por pessoa, opcionalmente só os que
+        cruzam [date_from, date_to] ('YYYY-MM-DD') e/ou de uma pessoa.
+        """
+        lo = (date_from or "0000-01-01") + _DAY_START
+        hi = (date_to or "9999-12-31") + _DAY_END
+        only = person_key(person) if person else None
+        out = []
+        with self._lock:
+            self._ensure()
+            for key, tree in self._trees.items():
+                if only and key != only:
+                    continue
+                for s, e, a in tree.overlapping(lo, hi):
+                    for s2, e2, b in tree.overlapping(s, e):
+                        # cada par uma vez: o segundo começa depois (ou empata com id maior)
+                        if (s2, b) <= (s, a):
+                            continue
+                        out.append({
+                            "person": self._names.get(key, key),
+                            "actions": [self._entry(key, s, e, a), self._entry(key, s2, e2, b)],
+                            "overlap": {"start": max(s, s2), "end": min(e, e2)},
+                        })
+        out.sort(key=lambda c: (c["overlap"]["start"], c["person"]))
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "people": len(self._trees),
+                "actions": len(self._actions),
+                "built_s_ago": round(time.time() - self._built_at, 1) if self._built_at else None,
+                "ttl_s": self.ttl,
+            }
+
+
+schedule_index = ScheduleIndex()
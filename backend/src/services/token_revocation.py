@@ -0,0 +1,154 @@
+# backend/src/services/token_revocation.py
+"""
+Revogação de JWT (logout, rotação do refresh, usuário desativado/alterado).
+
+Fonte da verdade: coleção auth_revocations
+  "jti:<jti>"   -> {"kind": "jti", "jti", "expires_at"}
+  "user:<id>"   -> {"kind": "user", "user_id", "revoked_before" (epoch s), "expires_at"}
+Um token é recusado se o jti estiver revogado ou se foi emitido antes de
+revoked_before do usuário. Os tokens emitidos pelo app levam iat_ms
+(issued_claims()), comparado com a fração de segundo; tokens sem ele só
+têm iat em segundos e, no mesmo segundo da revogação, contam como
+revogados. expires_at é quando a entrada deixa de importar (o token mais
+longo já teria expirado); depois disso é ignorada.
+
+Cada worker guarda um conjunto compacto em memória e relê as entradas
+ainda válidas a cada REVOCATION_REFRESH_S (padrão 30 s): checar um token
+não custa leitura. Revogações feitas neste worker valem na hora; nos
+outros, em até REVOCATION_REFRESH_S.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from .firestore_service import get_db
+from .firestore_metrics import track, READ, WRITE
+
+log = logging.getLogger(__name__)
+
+COLLECTION = "auth_revocations"
+REFRESH_S = float(os.getenv("REVOCATION_REFRESH_S", "30"))
+
+_lock = threading.Lock()
+_jtis = {}    # jti -> expires_at (epoch s)
+_users = {}   # user_id -> revoked_before (epoch s)
+_loaded_at = 0.0
+# validade máxima de um token emitido (define por quanto tempo a entrada importa)
+_max_token_s = 7 * 24 * 3600
+
+
+def configure(max_token_seconds: float):
+    """Chamado no boot com a maior validade de token (refresh)."""
+    global _max_token_s
+    _max_token_s = max(_max_token_s, float(max_token_seconds))
+
+
+def _refresh(force=False):
+    global _loaded_at
+    now = time.time()
+    if not force and now - _loaded_at < REFRESH_S:
+        return
+    with _lock:
+        if not force and now - _loaded_at < REFRESH_S:
+            return
+        _loaded_at = now  # mesmo se falhar: não martela o Firestore a cada requisição
+    try:
+        cutoff = datetime.fromtimestamp(now, tz=timezone.utc)
+        with track(READ, COLLECTION) as op:
+            snaps = list(get_db().collection(COLLECTION).where("expires_at", ">", cutoff).stream())
+            op.docs = len(snaps)
+    except Exception as e:
+        log.warning("recarga das revogações falhou (mantendo as atuais): %s", e)
+        return
+
+    jtis, users = {}, {}
+    for snap in snaps:
+        d = snap.to_dict() or {}
+        exp = d.get("expires_at")
+        exp = exp.timestamp() if hasattr(exp, "timestamp") else float(exp or 0)
+        if d.get("kind") == "jti" and d.get("jti"):
+            jtis[d["jti"]] = exp
+        elif d.get("kind") == "user" and d.get("user_id"):
+            users[d["user_id"]] = max(users.get(d["user_id"], 0.0), float(d.get("revoked_before") or 0))
+    with _lock:
+        # mantém o que foi revogado aqui e ainda não apareceu na leitura
+        for jti, exp in _jtis.items():
+            if exp > now:
+                jtis.setdefault(jti, exp)
+        for user_id, before in _users.items():
+            users[user_id] = max(users.get(user_id, 0.0), before)
+        _jtis.clear()
+        _jtis.update(jtis)
+        _users.clear()
+        _users.update(users)
+
+
+def issued_claims() -> dict:
+    """Claim extra dos tokens emitidos: instante de emissão em ms (iat só tem segundos)."""
+    return {"iat_ms": int(time.time() * 1000)}
+
+
+def is_revoked(payload: dict) -> bool:
+    """token_in_blocklist_loader: sem leitura no Firestore (salvo a recarga periódica)."""
+    _refresh()
+    jti = payload.get("jti")
+    if jti and jti in _jtis:
+        return True
+    before = _users.get(str(payload.get("sub")))
+    if before is None:
+        return False
+    if payload.get("iat_ms") is not None:
+        return float(payload["iat_ms"]) / 1000.0 < before
+    return int(payload.get("iat") or 0) <= before
+
+
+def revoke_token(payload: dict):
+    """Revoga um token decodificado (usa jti e exp)."""
+    jti = payload.get("jti")
+    if not jti:
+        return
+    exp = float(payload.get("exp") or time.time() + _max_token_s)
+    with _lock:
+        _jtis[jti] = exp
+    with track(WRITE, COLLECTION):
+        get_db().collection(COLLECTION).document(f"jti:{jti}").set({
+            "kind": "jti",
+            "jti": jti,
+            "expires_at": datetime.fromtimestamp(exp, tz=timezone.utc),
+        })
+
+
+def revoke_user(user_id: str):
+    """Invalida todos os tokens já emitidos para o usuário."""
+    if not user_id:
+        return
+    now = time.time()
+    with _lock:
+        _users[str(user_id)] = now
+    with track(WRITE, COLLECTION):
+        get_db().collection(COLLECTION).document(f"user:{user_id}").set({
+            "kind": "user",
+            "user_id": str(user_id),
+            "revoked_before": now,
+            "expires_at": datetime.fromtimestamp(now, tz=timezone.utc) + timedelta(seconds=_max_token_s),
+        })
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "jtis": len(_jtis),
+            "users": len(_users),
+            "loaded_s_ago": round(time.time() - _loaded_at, 1) if _loaded_at else None,
+            "refresh_s": REFRESH_S,
+        }
+
+
+def reset():
+    global _loaded_at
+    with _lock:
+        _jtis.clear()
+        _users.clear()
+        _loaded_at = 0.0
@@ -1,17 +1,43 @@
 # backend/src/services/user_service.py
 from __future__ import annotations
 
-import bcrypt
+import os
+import logging
 from typing import Optional, Dict, Any
+from urllib.parse import quote
 
+from . import password_hasher, token_revocation
+from .password_hasher import PasswordHasherBusy
+from .doc_cache import LRUCache, MISSING
+from .firestore_metrics import track, READ, WRITE
 from .firestore_service import (
     get_db,
     get_document,
     get_all_documents,
-    add_document,
     update_document,
+    update_documents,
+    run_transaction,
+    tx_get,
+    invalidate_cache,
+    _server_ts,
 )
 
+log = logging.getLogger(__name__)
+
+USERS = "users"
+# Índice único de username: doc id "u:<username>" -> {"user_id", "username"}
+USERNAME_INDEX = "users_by_username"
+META = "_meta"
+# campos que, se alterados, invalidam os tokens já emitidos do usuário
+_CLAIM_FIELDS = {"role", "active", "username", "password_hash"}
+_CLAIM_DEFAULTS = {"active": True}
+
+# Cache (por processo) do usuário autenticado, usado pelo auth_middleware.
+# Guarda o usuário sem password_hash; update_user/delete_user invalidam.
+# Em outro worker a mudança só aparece depois do TTL.
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+_auth_cache = LRUCache(ttl=AUTH_USER_CACHE_TTL, maxsize=int(os.getenv("AUTH_USER_CACHE_SIZE", "1000")))
+
 # ---------------------------
 # Helpers
 # ---------------------------
@@ -28,13 +54,11 @@ def _doc_to_obj(doc) -> Dict[str, Any]:
     return dict(doc)
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    """bcrypt no pool de password_hasher (PasswordHasherBusy se a fila estiver cheia)."""
+    return password_hasher.hash_password(password)
 
 def verify_password(password: str, password_hash: str) -> bool:
-    try:
-        return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
-    except Exception:
-        return False
+    return password_hasher.verify_password(password, password_hash)
 
 # ---------------------------
 # CRUD básico de usuário
@@ -46,43 +70,122 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     """
     return get_document("users", user_id)
 
+def get_auth_user(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Usuário (sem password_hash) para checagem de sessão/perfil.
+    Cacheado por AUTH_USER_CACHE_TTL segundos, inclusive "não encontrado".
+    """
+    if not user_id:
+        return None
+    if AUTH_USER_CACHE_TTL > 0:
+        cached = _auth_cache.get(user_id, MISSING)
+        if cached is not MISSING:
+            return dict(cached) if cached else None
+    user = get_user_by_id(user_id)
+    if user:
+        user = dict(user)
+        user.pop("password_hash", None)
+    if AUTH_USER_CACHE_TTL > 0:
+        _auth_cache.set(user_id, user)
+    return dict(user) if user else None
+
+def invalidate_auth_user(user_id: Optional[str] = None) -> None:
+    """Remove o usuário do cache de autenticação (sem id, limpa tudo)."""
+    if user_id is None:
+        _auth_cache.clear()
+    else:
+        _auth_cache.pop(user_id)
+
+def auth_cache_stats() -> Dict[str, Any]:
+    return _auth_cache.stats()
+
+def _username_key(username: str) -> str:
+    """Id do documento em users_by_username (sem '/', que o Firestore não aceita)."""
+    return "u:" + quote(str(username), safe="")
+
+def _index_ref(db, username: str):
+    return db.collection(USERNAME_INDEX).document(_username_key(username))
+
+def _index_owner(db, tx, index_snap, username: str) -> Optional[str]:
+    """
+    Id do usuário dono do username. Confere o dono apontado pelo índice
+    (índice órfão de usuário apagado fora do app não bloqueia o nome); sem
+    dono válido, consulta users por username, como _find_unindexed: a base
+    pode não ter passado pelo backfill do índice.
+    """
+    user_id = (index_snap.to_dict() or {}).get("user_id") if index_snap.exists else None
+    if user_id:
+        snap = tx_get(tx, db.collection(USERS).document(user_id), USERS)
+        if snap.exists and (snap.to_dict() or {}).get("username") == username:
+            return user_id
+    query = db.collection(USERS).where("username", "==", username).limit(1)
+    snaps = tx_get(tx, query, USERS)
+    return snaps[0].id if snaps else None
+
 def find_user_by_username(username: str) -> Optional[Dict[str, Any]]:
     """
-    Busca usuário por username.
-    Tenta query Firestore; se indisponível (memory_db), faz filtro em Python.
-    IMPORTANTE: tudo dentro do try para não chamar db.collection() fora do Firestore.
+    Busca usuário por username: leitura do índice users_by_username + leitura
+    do usuário (duas leituras pontuais, independente da quantidade de usuários).
+    Sem entrada válida no índice (usuário criado fora do app depois do
+    backfill), consulta users por username e grava a entrada que faltava.
+    O usuário é lido direto do Firestore (sem cache) porque o login usa o hash.
     """
-    try:
-        db = get_db()
-        col = db.collection("users")
-        results = col.where("username", "==", username).limit(1).get()
-        for snap in results:
-            return _doc_to_obj(snap)
+    if not username:
         return None
-    except Exception:
-        # Fallback (memory_db): varre todos e filtra
-        for u in get_all_documents("users"):
-            if u.get("username") == username:
-                return u
+    db = get_db()
+    with track(READ, USERNAME_INDEX):
+        index_snap = _index_ref(db, username).get()
+    user_id = (index_snap.to_dict() or {}).get("user_id") if index_snap.exists else None
+    if user_id:
+        with track(READ, USERS):
+            snap = db.collection(USERS).document(user_id).get()
+        if snap.exists:
+            user = _doc_to_obj(snap)
+            if user.get("username") == username:
+                return user
+    return _find_unindexed(db, username)
+
+def _find_unindexed(db, username: str) -> Optional[Dict[str, Any]]:
+    """Consulta por username (caminho antigo) e corrige o índice."""
+    with track(READ, USERS) as op:
+        snaps = list(db.collection(USERS).where("username", "==", username).limit(1).stream())
+        op.docs = len(snaps)
+    if not snaps:
         return None
+    user = _doc_to_obj(snaps[0])
+    with track(WRITE, USERNAME_INDEX):
+        _index_ref(db, username).set({"user_id": user["id"], "username": username})
+    log.info("users_by_username: entrada de %r recriada no login", username)
+    return user
 
 def create_user(username: str, password: str, role: str = "supervisor", name: str = "") -> Dict[str, Any]:
     """
-    Cria usuário novo. Garante unicidade por username.
+    Cria usuário novo. Garante unicidade por username: o usuário e a entrada
+    de users_by_username são gravados na mesma transação.
     Retorna o objeto salvo (sem expor o hash).
     """
-    existing = find_user_by_username(username)
-    if existing:
-        raise ValueError("Username já existe")
-
     data = {
         "username": username,
         "password_hash": hash_password(password),
         "role": role,
         "name": name or username,
         "active": True,
+        "created_at": _server_ts(),
+        "updated_at": _server_ts(),
     }
-    user_id, _ = add_document("users", data)
+
+    def _create(tx, db):
+        index = _index_ref(db, username)
+        if _index_owner(db, tx, tx_get(tx, index, USERNAME_INDEX), username):
+            raise ValueError("Username já existe")
+        ref = db.collection(USERS).document()
+        tx.create(ref, data)
+        tx.set(index, {"user_id": ref.id, "username": username})
+        return ref.id
+
+    with track(WRITE, USERS, docs=2):
+        user_id = run_transaction(_create)
+    invalidate_cache(USERS, user_id)
     created = get_user_by_id(user_id) or {}
     created.pop("password_hash", None)
     return created
@@ -90,13 +193,94 @@ def create_user(username: str, password: str, role: str = "supervisor", name: st
 def update_user(user_id: str, payload: Dict[str, Any]) -> bool:
     """
     Atualiza campos do usuário. Se vier 'password', converte para 'password_hash'.
+    Troca de username move a entrada de users_by_username na mesma transação
+    (ValueError se o novo nome já for de outro usuário).
+    Retorna False se o usuário não existir.
     """
     data = dict(payload)
+    data.pop("id", None)
     if data.get("password"):
         data["password_hash"] = hash_password(data.pop("password"))
     # Nunca escreva o campo em claro
     data.pop("password", None)
-    return update_document("users", user_id, data)
+    new_username = data.get("username")
+    if new_username is not None:
+        new_username = str(new_username).strip()
+        if not new_username:
+            raise ValueError("Username inválido")
+        data["username"] = new_username
+    data["updated_at"] = _server_ts()
+    claims_changed = []
+
+    def _update(tx, db):
+        ref = db.collection(USERS).document(user_id)
+        snap = tx_get(tx, ref, USERS)
+        if not snap.exists:
+            return False
+        old = snap.to_dict() or {}
+        old_username = old.get("username")
+        # o front manda username/role/active em toda edição: só conta o que mudou
+        claims_changed[:] = [f for f in _CLAIM_FIELDS if f in data and data[f] != old.get(f, _CLAIM_DEFAULTS.get(f))]
+        renaming = new_username is not None and new_username != old_username
+        if renaming:
+            new_index = _index_ref(db, new_username)
+            owner = _index_owner(db, tx, tx_get(tx, new_index, USERNAME_INDEX), new_username)
+            if owner and owner != user_id:
+                raise ValueError("Username já existe")
+            old_index = _index_ref(db, old_username) if old_username else None
+            old_snap = tx_get(tx, old_index, USERNAME_INDEX) if old_index else None
+        # (no Firestore todas as leituras da transação vêm antes das escritas)
+        tx.set(ref, data, merge=True)
+        if renaming:
+            if old_snap is not None and old_snap.exists and (old_snap.to_dict() or {}).get("user_id") == user_id:
+                tx.delete(old_index)
+            tx.set(new_index, {"user_id": user_id, "username": new_username})
+        return True
+
+    with track(WRITE, USERS):
+        ok = run_transaction(_update)
+    invalidate_cache(USERS, user_id)
+    invalidate_auth_user(user_id)
+    # tokens já emitidos carregam role/active/username: mudou, revoga
+    if ok and claims_changed:
+        token_revocation.revoke_user(user_id)
+    return ok
+
+def ensure_username_index(force: bool = False) -> int:
+    """
+    Backfill único de users_by_username a partir da coleção users (para bases
+    criadas antes do índice). Marca _meta/users_by_username ao terminar;
+    nas próximas chamadas custa uma leitura (force=True refaz). Retorna
+    quantas entradas gravou. Rodar pela CLI: python -m src.migrations backfill
+    """
+    db = get_db()
+    marker = db.collection(META).document(USERNAME_INDEX)
+    if not force:
+        with track(READ, META):
+            if marker.get().exists:
+                return 0
+
+    with track(READ, USERS) as op:
+        snaps = list(db.collection(USERS).stream())
+        op.docs = len(snaps)
+    # usernames duplicados (anteriores ao índice): fica o mais antigo
+    users = sorted((_doc_to_obj(s) for s in snaps), key=lambda u: str(u.get("created_at") or ""))
+    entries = {}
+    for u in users:
+        username = u.get("username")
+        if not username:
+            continue
+        key = _username_key(username)
+        if key in entries:
+            log.warning("username duplicado %r: usuário %s fica fora do índice", username, u["id"])
+            continue
+        entries[key] = {"user_id": u["id"], "username": username}
+
+    written = update_documents(USERNAME_INDEX, entries)
+    with track(WRITE, META):
+        marker.set({"backfilled_at": _server_ts(), "entries": written})
+    log.info("users_by_username: %d entradas criadas", written)
+    return written
 
 # ---------------------------
 # Autenticação
@@ -114,6 +298,15 @@ def authenticate_user(username: str, password: str) -> Optional[Dict[str, Any]]:
     if not password_hash or not verify_password(password, password_hash):
         return None
 
+    # BCRYPT_ROUNDS mudou desde que o hash foi gerado: refaz com a senha recebida
+    if password_hasher.needs_rehash(password_hash):
+        try:
+            update_document(USERS, user["id"], {"password_hash": hash_password(password)})
+            invalidate_auth_user(user["id"])
+            password_hasher.mark_rehashed()
+        except Exception as e:
+            log.warning("rehash da senha de %s falhou: %s", user["id"], e)
+
     user = dict(user)
     user.pop("password_hash", None)
     return user
@@ -142,13 +335,18 @@ def create_admin_user():
 
 __all__ = [
     "get_user_by_id",
+    "get_auth_user",
+    "invalidate_auth_user",
+    "auth_cache_stats",
     "find_user_by_username",
+    "ensure_username_index",
     "create_user",
     "update_user",
     "authenticate_user",
     "ensure_admin_seed",
     "create_admin_user",   # importante pro main.py
     "verify_password",
+    "PasswordHasherBusy",
 ]
 
 
@@ -163,9 +361,26 @@ def get_all_users() -> list[Dict[str, Any]]:
 
 def delete_user(user_id: str) -> bool:
     """
-    Deleta um usuário pelo ID.
+    Deleta um usuário pelo ID (e a sua entrada em users_by_username).
+    Retorna False se o usuário não existir.
     """
-    return delete_document("users", user_id)
-
-
+    def _delete(tx, db):
+        ref = db.collection(USERS).document(user_id)
+        snap = tx_get(tx, ref, USERS)
+        if not snap.exists:
+            return False
+        username = (snap.to_dict() or {}).get("username")
+        index = _index_ref(db, username) if username else None
+        index_snap = tx_get(tx, index, USERNAME_INDEX) if index else None
+        tx.delete(ref)
+        if index_snap is not None and index_snap.exists and (index_snap.to_dict() or {}).get("user_id") == user_id:
+            tx.delete(index)
+        return True
 
+    with track(WRITE, USERS, docs=2):
+        ok = run_transaction(_delete)
+    invalidate_cache(USERS, user_id)
+    invalidate_auth_user(user_id)
+    if ok:
+        token_revocation.revoke_user(user_id)
+    return ok
@@ -0,0 +1,47 @@
+import os
+
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+
+from src.routes.finance import _import_row  # noqa: E402
+from src.services import finance_import  # noqa: E402
+from src.services.firestore_service import get_document  # noqa: E402
+
+OFX = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105<TRNAMT>-150,25<MEMO>Posto
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240106<TRNAMT>12x,00<MEMO>Valor quebrado
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240107<TRNAMT>300.00<MEMO>Cliente
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def test_bad_trnamt_is_a_row_error(tmp_path):
+    path = tmp_path / "extrato.ofx"
+    path.write_text(OFX, encoding="cp1252")
+    job_id = finance_import.create_job("ofx", "extrato.ofx", path.stat().st_size)
+
+    finance_import.run_import(job_id, str(path), "ofx", _import_row)
+
+    job = finance_import.get_job(job_id)
+    assert job["status"] == "done"
+    assert (job["rows"], job["created"], job["error_count"]) == (3, 2, 1)
+    assert job["errors"] == [{"row": 2, "error": "Campo 'valor' ausente ou inválido."}]
+
+
+def test_import_row_accepts_zero_and_rejects_missing_amount():
+    data, error = _import_row({"date": "2024-01-05", "valor": 0.0})
+    assert error is None and data["amount"] == 0.0
+    assert _import_row({"date": "2024-01-05"}) == (None, "Campo 'valor' ausente ou inválido.")
+    assert _import_row({"date": "2024-01-05", "valor": "abc"})[0] is None
+
+
+def test_created_rows_keep_their_amount(tmp_path):
+    path = tmp_path / "extrato.ofx"
+    path.write_text(OFX, encoding="cp1252")
+    job_id = finance_import.create_job("ofx", "extrato.ofx", path.stat().st_size)
+    created = []
+
+    finance_import.run_import(job_id, str(path), "ofx", _import_row, lambda doc_id, _: created.append(doc_id))
+
+    amounts = sorted(get_document(finance_import.COLLECTION, doc_id)["amount"] for doc_id in created)
+    assert amounts == [150.25, 300.0]
@@ -0,0 +1,46 @@
+import os
+
+os.environ.setdefault("FIRESTORE_BACKEND", "memory")
+
+from src.services.fuel_analytics import FuelAnalytics  # noqa: E402
+
+
+def _fill(doc_id, data, odometro, litros, preco=5.0):
+    return {
+        "id": doc_id, "placa": "ABC1234", "data": data, "odometro": odometro,
+        "litros": litros, "preco_litro": preco, "valor_total": litros * preco,
+        "combustivel": "Gasolina", "posto": "Posto A",
+    }
+
+
+def test_regressed_reading_keeps_its_fuel_in_km_l():
+    fa = FuelAnalytics(ttl=0)
+    fa.load([
+        _fill("a", "2024-01-01", 1000, 40),
+        _fill("b", "2024-01-02", 900, 50),
+        _fill("c", "2024-01-03", 2000, 50),
+    ])
+    result = fa.analytics()
+    vehicle = result["vehicles"][0]
+    # 1000 km (a -> c) rodados com os 100 l abastecidos depois de a
+    assert vehicle["km"] == 1000.0
+    assert vehicle["km_l"] == 10.0
+    assert vehicle["custo_km"] == 0.5
+    assert vehicle["odometer_regressions"] == 1
+    (reg,) = result["anomalies"]["odometer_regressions"]
+    assert (reg["id"], reg["previous_id"]) == ("b", "a")
+
+
+def test_regression_is_measured_against_running_max():
+    fa = FuelAnalytics(ttl=0)
+    fa.load([
+        _fill("a", "2024-01-01", 1000, 40),
+        _fill("b", "2024-01-02", 900, 50),
+        _fill("c", "2024-01-03", 950, 50),
+        _fill("d", "2024-01-04", 2000, 50),
+    ])
+    result = fa.analytics()
+    assert result["vehicles"][0]["odometer_regressions"] == 2
+    assert [(r["id"], r["previous_id"], r["previous_odometro"])
+            for r in result["anomalies"]["odometer_regressions"]] == [("b", "a", 1000), ("c", "a", 1000)]
+    assert result["vehicles"][0]["km_l"] == round(1000 / 150, 2)
@@ -198,7 +198,7 @@ const Dashboard = () => {
         api.get('/materials').catch(() => ({ data: [] })),
         api.get('/actions').catch(() => ({ data: [] })),
         api.get('/job-vacancies').catch(() => ({ data: [] })),
-        Promise.resolve({ data: [] })
+        api.get(`/metrics/monthly-campaigns?months=${monthsDates.length}`).catch(() => ({ data: [] }))
       ]);
 
       const clients = Array.isArray(clientsRes.data) ? clientsRes.data : [];
@@ -230,7 +230,10 @@ const Dashboard = () => {
 
       if (Array.isArray(monthlyRes.data) && monthlyRes.data.length) {
         const normalized = monthlyRes.data.map((row, i) => ({
-          month: row.month ?? row.label ?? monthLabelPT(monthsDates[i] || new Date()),
+          // rollups do backend vêm com month = "YYYY-MM"
+          month: /^\d{4}-\d{2}$/.test(row.month ?? '')
+            ? monthLabelPT(new Date(Number(row.month.slice(0, 4)), Number(row.month.slice(5, 7)) - 1, 1))
+            : (row.month ?? row.label ?? monthLabelPT(monthsDates[i] || new Date())),
           campanhas: Number(row.campaigns ?? row.total ?? row.campanhas ?? 0),
           receita: Number(row.revenue ?? row.receita ?? 0),
         }));
@@ -51,6 +51,33 @@ async function meRequest(token) {
   });
 }
 
+async function refreshRequest(refreshToken) {
+  return api('/auth/refresh', {
+    method: 'POST',
+    token: refreshToken,
+  });
+}
+
+function clearSession() {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refresh_token');
+  localStorage.removeItem('user');
+}
+
+// /auth/me com o token salvo; se o access token (curto) expirou, renova uma vez
+async function meWithRefresh(token) {
+  try {
+    return await meRequest(token);
+  } catch (error) {
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (error?.status !== 401 || !refreshToken) throw error;
+    const data = await refreshRequest(refreshToken);
+    localStorage.setItem('token', data.access_token);
+    if (data.refresh_token) localStorage.setItem('refresh_token', data.refresh_token);
+    return meRequest(data.access_token);
+  }
+}
+
 export const useAuth = () => {
   const context = useContext(AuthContext);
   if (!context) {
@@ -71,15 +98,14 @@ export const AuthProvider = ({ children }) => {
 
       if (token && savedUser) {
         try {
-          // opcional: revalidar com /auth/me
-          const fresh = await meRequest(token);
+          // revalida com /auth/me (renovando o access token se preciso)
+          const fresh = await meWithRefresh(token);
           const userData = fresh?.user || fresh || JSON.parse(savedUser);
           setUser(userData);
           localStorage.setItem('user', JSON.stringify(userData));
         } catch (error) {
           console.error('Token inválido:', error);
-          localStorage.removeItem('token');
-          localStorage.removeItem('user');
+          clearSession();
           setUser(null);
         }
       }
@@ -137,6 +163,8 @@ export const AuthProvider = ({ children }) => {
       }
 
       localStorage.setItem('token', String(accessToken));
+      if (data?.refresh_token) localStorage.setItem('refresh_token', String(data.refresh_token));
+      else localStorage.removeItem('refresh_token');
       if (userData) localStorage.setItem('user', JSON.stringify(userData));
       setUser(userData);
 
@@ -152,11 +180,14 @@ export const AuthProvider = ({ children }) => {
 
   const logout = () => {
     try {
-      // se a API tiver uma rota /auth/logout baseada em token, poderíamos chamá-la aqui.
-      // api('/auth/logout', { method: 'POST', token: localStorage.getItem('token') }).catch(() => {});
+      // revoga access + refresh no backend (sem esperar a resposta)
+      const token = localStorage.getItem('token');
+      const refreshToken = localStorage.getItem('refresh_token');
+      if (token) {
+        api('/auth/logout', { method: 'POST', token, body: { refresh_token: refreshToken } }).catch(() => {});
+      }
     } finally {
-      localStorage.removeItem('token');
-      localStorage.removeItem('user');
+      clearSession();
       setUser(null);
     }
   };
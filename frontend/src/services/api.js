@@ -47,15 +47,59 @@ api.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
+/* ============ Refresh do access token ============ */
+// Access token dura poucos minutos; em 401 tentamos UMA vez renovar com o
+// refresh token (uma única chamada compartilhada entre requisições paralelas).
+let refreshing = null;
+
+function clearSession() {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refresh_token');
+  localStorage.removeItem('user');
+}
+
+export function refreshAccessToken() {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) return Promise.reject(new Error('Sem refresh token'));
+  if (!refreshing) {
+    refreshing = axios
+      .post(`${baseURL}/auth/refresh`, null, {
+        headers: { Authorization: `Bearer ${refreshToken}` },
+      })
+      .then(({ data }) => {
+        localStorage.setItem('token', data.access_token);
+        if (data.refresh_token) localStorage.setItem('refresh_token', data.refresh_token);
+        return data.access_token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+}
+
+const isAuthCall = (url = '') => /\/auth\/(login|refresh|logout)/.test(url);
+
 api.interceptors.response.use(
   (resp) => resp,
-  (error) => {
+  async (error) => {
     const status = error?.response?.status;
     const message = error?.response?.data?.message || error?.message || 'Erro desconhecido';
+    const original = error?.config;
+
+    if (status === 401 && original && !original._retry && !isAuthCall(original.url)) {
+      original._retry = true;
+      try {
+        const token = await refreshAccessToken();
+        original.headers = { ...(original.headers || {}), Authorization: `Bearer ${token}` };
+        return api(original);
+      } catch {
+        // refresh falhou: cai no tratamento de 401 abaixo
+      }
+    }
 
     if (status === 401) {
-      localStorage.removeItem('token');
-      localStorage.removeItem('user');
+      clearSession();
       if (!location.pathname.includes('/login')) location.href = '/login';
     } else if (status === 403) {
       console.warn('Acesso negado:', message);
@@ -107,9 +151,18 @@ export const authService = {
     const { data } = await api.get('/auth/me');
     return data;
   },
-  logout: () => {
-    localStorage.removeItem('token');
-    localStorage.removeItem('user');
+  refresh: refreshAccessToken,
+  logout: async () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    try {
+      if (localStorage.getItem('token')) {
+        await api.post('/auth/logout', { refresh_token: refreshToken });
+      }
+    } catch {
+      // token já inválido: basta limpar a sessão local
+    } finally {
+      clearSession();
+    }
   },
 };
 